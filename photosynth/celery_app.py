@@ -39,6 +39,7 @@ app.conf.update(
     # 🚨 Optional: Define specific queues for explicit routing
     task_routes={
         'photosynth.tasks.run_detection_pass': {'queue': 'detection_queue'},
+        'photosynth.tasks.run_detection_batch': {'queue': 'detection_queue'},
         'photosynth.tasks.run_vlm_captioning': {'queue': 'vlm_queue'},
         'photosynth.tasks.finalize_file': {'queue': 'detection_queue'},
 
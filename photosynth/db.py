@@ -1,12 +1,19 @@
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
+import psycopg2.pool
+import socket
+import struct
+import threading
 import time
+from contextlib import contextmanager
 import os
 import numpy as np
 import io
 import json
-import psycopg2
-import psycopg2.extras
+import yaml
+
+from photosynth.migrations import migrate, PROGRESS_CHANNEL
 
 # --- CONFIGURATION ---
 DB_HOST = "10.0.0.230"
@@ -14,63 +21,250 @@ DB_NAME = "photosynth"
 DB_USER = "photosynth"
 DB_PASS = "secure_password_123"
 
-class PhotoSynthDB:
-    def __init__(self):
-        self._init_db()
+SETTINGS_PATH = os.path.join(os.path.dirname(__file__), '../settings.yaml')
+with open(SETTINGS_PATH, 'r') as f:
+    config = yaml.safe_load(f)
 
-    def get_connection(self):
-        return psycopg2.connect(
+_db_cfg = config.get('database', {})
+POOL_TIMEOUT = _db_cfg.get('pool_timeout_seconds', 30)      # max wait for a free connection
+HEALTHCHECK_IDLE = _db_cfg.get('healthcheck_idle_seconds', 30)  # ping connections idle longer than this
+
+
+def _node_pool_size():
+    """Per-node cap from database.pool_max (hostname substring -> size, 'default' otherwise)."""
+    sizes = _db_cfg.get('pool_max') or {}
+    hostname = socket.gethostname()
+    for key, size in sizes.items():
+        if key != 'default' and str(key) in hostname:
+            return int(size)
+    return int(sizes.get('default', 8))
+
+
+POOL_MAX = _node_pool_size()
+EMBEDDING_BATCH = 10000  # rows per server-side cursor fetch
+EMBEDDING_DTYPE = _db_cfg.get('embedding_dtype', 'float32')  # faces.embedding storage; 'float16' halves it
+
+
+def encode_embedding(embedding, dtype=EMBEDDING_DTYPE):
+    """Embedding -> raw bytes for faces.embedding (stored with its dtype in faces.embedding_dtype)."""
+    return np.asarray(embedding, dtype=dtype).tobytes()
+
+
+def decode_embedding(buf, dtype='float32'):
+    """faces.embedding bytes -> float32 vector (float16 rows are upcast)."""
+    return np.frombuffer(buf, dtype=dtype).astype(np.float32, copy=False)
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """psycopg2 connection whose close() hands it back to its pool instead of hanging up."""
+    pool = None
+    checked_out = False
+
+    def close(self):
+        if self.pool is not None and self.checked_out:
+            self.pool.putconn(self)
+        elif self.pool is None:
+            super().close()
+
+    def hang_up(self):
+        psycopg2.extensions.connection.close(self)
+
+
+class ConnectionPool:
+    """
+    Blocking, thread-safe Postgres pool (one per process).
+    - At most `maxconn` connections; getconn() waits up to POOL_TIMEOUT for one.
+    - Connections idle longer than HEALTHCHECK_IDLE are pinged before reuse.
+    - Returned connections are rolled back if a transaction was left open.
+    """
+
+    def __init__(self, maxconn=POOL_MAX):
+        self.maxconn = maxconn
+        self._idle = []  # [(conn, returned_at)]
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.checkouts = 0
+        self.health_failures = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.checkout_total = 0.0
+        self.checkout_max = 0.0
+
+    def _connect(self):
+        conn = psycopg2.connect(
             host=DB_HOST,
             database=DB_NAME,
             user=DB_USER,
-            password=DB_PASS
+            password=DB_PASS,
+            connection_factory=PooledConnection
         )
+        conn.pool = self
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    def _discard(self, conn):
+        with self._lock:
+            self.opened -= 1
+        try:
+            conn.hang_up()
+        except psycopg2.Error:
+            pass
+
+    def _take_healthy(self):
+        while True:
+            with self._lock:
+                conn, returned_at = self._idle.pop() if self._idle else (None, None)
+            if conn is None:
+                return self._connect()
+            if conn.closed:
+                self._discard(conn)
+                continue
+            if time.time() - returned_at > HEALTHCHECK_IDLE:
+                try:
+                    with conn.cursor() as c:
+                        c.execute("SELECT 1")
+                    conn.rollback()
+                except psycopg2.Error:
+                    with self._lock:
+                        self.health_failures += 1
+                    self._discard(conn)
+                    continue
+            return conn
+
+    def getconn(self, timeout=POOL_TIMEOUT):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=timeout):
+            raise psycopg2.pool.PoolError(f"No free DB connection after {timeout}s (pool max {self.maxconn})")
+        waited = time.perf_counter() - start
+        try:
+            conn = self._take_healthy()
+        except Exception:
+            self._slots.release()
+            raise
+        conn.checked_out = True
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self.checkout_total += elapsed
+            self.checkout_max = max(self.checkout_max, elapsed)
+        return conn
+
+    def putconn(self, conn):
+        conn.checked_out = False
+        try:
+            if conn.closed:
+                self._discard(conn)
+                return
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            with self._lock:
+                self._idle.append((conn, time.time()))
+        except psycopg2.Error:
+            self._discard(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """with get_pool().connection() as conn: ... (returned to the pool on exit)"""
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def metrics(self):
+        """Pool size plus wait (semaphore) and checkout (wait + health check/connect) latency."""
+        with self._lock:
+            n = self.checkouts or 1
+            return {
+                "max": self.maxconn,
+                "open": self.opened,
+                "idle": len(self._idle),
+                "checkouts": self.checkouts,
+                "health_check_failures": self.health_failures,
+                "wait_ms_avg": 1000 * self.wait_total / n,
+                "wait_ms_max": 1000 * self.wait_max,
+                "checkout_ms_avg": 1000 * self.checkout_total / n,
+                "checkout_ms_max": 1000 * self.checkout_max,
+            }
+
+
+pool_instance = None
+pool_pid = None
+_inherited_pools = []  # Pools copied by fork: never touched, never garbage-collected (would hang up the parent's sockets)
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide pool. A forked child (Celery prefork) gets its own pool."""
+    global pool_instance, pool_pid
+    with _pool_lock:
+        if pool_instance is None or pool_pid != os.getpid():
+            if pool_instance is not None:
+                _inherited_pools.append(pool_instance)
+            pool_instance = ConnectionPool()
+            pool_pid = os.getpid()
+        return pool_instance
+
+
+PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+PGCOPY_TRAILER = struct.pack('!h', -1)
+
+
+# One (face_id INTEGER, cluster_id INTEGER) binary COPY tuple, encoded with numpy in bulk
+CLUSTER_COPY_ROW = np.dtype([
+    ('fields', '>i2'), ('face_len', '>i4'), ('face_id', '>i4'), ('cluster_len', '>i4'), ('cluster_id', '>i4')
+])
+
+
+def binary_copy_buffer(rows):
+    """
+    Encodes rows for COPY ... FROM STDIN WITH (FORMAT binary).
+    Each row is a tuple of already-encoded field bytes (None for NULL); the caller
+    must match the column types exactly (e.g. struct '!i' for INTEGER, '!q' for BIGINT).
+    """
+    buf = io.BytesIO()
+    buf.write(PGCOPY_HEADER)
+    for row in rows:
+        buf.write(struct.pack('!h', len(row)))
+        for field in row:
+            if field is None:
+                buf.write(struct.pack('!i', -1))
+            else:
+                buf.write(struct.pack('!i', len(field)))
+                buf.write(field)
+    buf.write(PGCOPY_TRAILER)
+    buf.seek(0)
+    return buf
+
+
+schema_checked = False  # Migrations are checked once per process (and inherited by forks), not per PhotoSynthDB()
+
+
+class PhotoSynthDB:
+    def __init__(self):
+        global schema_checked
+        if not schema_checked:
+            self._init_db()
+            schema_checked = True
+
+    def get_connection(self):
+        """Borrows a pooled connection; conn.close() returns it to the pool."""
+        return get_pool().getconn()
 
     def _init_db(self):
+        """Applies pending schema migrations (see photosynth/migrations.py)."""
         conn = self.get_connection()
-        c = conn.cursor()
-        
-        # Media Files Table
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS media_files (
-                file_hash TEXT PRIMARY KEY,
-                file_path TEXT,
-                status TEXT DEFAULT 'PENDING',
-                
-                -- Granular Status Tracking
-                detection_status TEXT DEFAULT 'PENDING',
-                caption_status TEXT DEFAULT 'PENDING',
-                
-                -- Intermediate Results (JSON)
-                detection_data JSONB,
-                caption_data JSONB,
-                
-                vlm_narrative TEXT,
-                search_concepts JSONB,
-                last_updated REAL
-            )
-        ''')
-
-        # People Table
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS people (
-                cluster_id INTEGER PRIMARY KEY,
-                name TEXT DEFAULT 'Unknown'
-            )
-        ''')
-
-        # Faces Table
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS faces (
-                face_id SERIAL PRIMARY KEY,
-                file_hash TEXT,
-                embedding BYTEA,
-                cluster_id INTEGER DEFAULT -1,
-                FOREIGN KEY(file_hash) REFERENCES media_files(file_hash)
-            )
-        ''')
-        conn.commit()
-        conn.close()
+        try:
+            migrate(conn)
+        finally:
+            conn.close()
 
     def register_file(self, file_hash, file_path):
         from photosynth.utils.paths import make_relative
@@ -125,46 +319,207 @@ class PhotoSynthDB:
 
     def update_status(self, file_hash, status, narrative=None, concepts=None):
         conn = self.get_connection()
-        updates = ["status=%s", "last_updated=%s"]
-        params = [status, time.time()]
+        try:
+            updates = ["status=%s", "last_updated=%s"]
+            params = [status, time.time()]
         
-        if narrative:
-            updates.append("vlm_narrative=%s")
-            params.append(narrative)
-        if concepts:
-            updates.append("search_concepts=%s")
-            params.append(json.dumps(concepts))
+            if narrative:
+                updates.append("vlm_narrative=%s")
+                params.append(narrative)
+            if concepts:
+                updates.append("search_concepts=%s")
+                params.append(json.dumps(concepts))
             
-        params.append(file_hash)
+            params.append(file_hash)
         
-        with conn.cursor() as c:
-            c.execute(f"UPDATE media_files SET {', '.join(updates)} WHERE file_hash=%s", params)
-        conn.commit()
-        conn.close()
+            with conn.cursor() as c:
+                c.execute(f"UPDATE media_files SET {', '.join(updates)} WHERE file_hash=%s", params)
+            conn.commit()
+        finally:
+            conn.close()
 
-    def update_detection_result(self, file_hash, status, data=None):
+    def update_detection_result(self, file_hash, status, data=None, source=None):
+        """`source` is the near-duplicate hash the results were copied from, if any."""
         conn = self.get_connection()
-        json_data = json.dumps(data) if data else None
-        with conn.cursor() as c:
-            c.execute('''
-                UPDATE media_files 
-                SET detection_status=%s, detection_data=%s, last_updated=%s 
-                WHERE file_hash=%s
-            ''', (status, json_data, time.time(), file_hash))
-        conn.commit()
-        conn.close()
+        try:
+            json_data = json.dumps(data) if data else None
+            with conn.cursor() as c:
+                c.execute('''
+                    UPDATE media_files
+                    SET detection_status=%s, detection_data=%s, detection_source=%s, last_updated=%s
+                    WHERE file_hash=%s
+                ''', (status, json_data, source, time.time(), file_hash))
+            conn.commit()
+        finally:
+            conn.close()
 
-    def update_caption_result(self, file_hash, status, data=None):
+    def update_caption_result(self, file_hash, status, data=None, source=None):
+        """`source` is the near-duplicate hash the results were copied from, if any."""
         conn = self.get_connection()
-        json_data = json.dumps(data) if data else None
-        with conn.cursor() as c:
-            c.execute('''
-                UPDATE media_files 
-                SET caption_status=%s, caption_data=%s, last_updated=%s 
-                WHERE file_hash=%s
-            ''', (status, json_data, time.time(), file_hash))
-        conn.commit()
-        conn.close()
+        try:
+            json_data = json.dumps(data) if data else None
+            with conn.cursor() as c:
+                c.execute('''
+                    UPDATE media_files
+                    SET caption_status=%s, caption_data=%s, caption_source=%s, last_updated=%s
+                    WHERE file_hash=%s
+                ''', (status, json_data, source, time.time(), file_hash))
+            conn.commit()
+        finally:
+            conn.close()
+
+    # --- STAGE STATE MACHINE ---
+    # PENDING/PROCESSING -> COMPLETED per stage ('detection', 'caption'); each call is one
+    # statement, so concurrent workers are serialized by the row lock.
+
+    def begin_stage(self, file_hash, stage):
+        """
+        Marks `stage` PROCESSING unless it is already COMPLETED.
+        Returns {'detection_data': ...} (context for captioning), or None if the stage is
+        already done or the file is not registered.
+        """
+        column = {'detection': 'detection', 'caption': 'caption'}[stage]
+        conn = self.get_connection()
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as c:
+                c.execute(f'''
+                    UPDATE media_files
+                    SET {column}_status='PROCESSING', last_updated=%s
+                    WHERE file_hash=%s AND {column}_status IS DISTINCT FROM 'COMPLETED'
+                    RETURNING detection_data
+                ''', (time.time(), file_hash))
+                row = c.fetchone()
+            conn.commit()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+
+    def complete_stage(self, file_hash, stage, data=None, source=None):
+        """
+        Stores `stage` results as COMPLETED and reports whether the file is now ready to finalize.
+        - True for exactly one caller per file: whichever stage completes second.
+        - Completing an already COMPLETED stage is a no-op that returns False, so a
+          duplicate or retried task never enqueues finalize_file twice.
+        - `source` is the near-duplicate hash the results were copied from, if any.
+        """
+        column, other = {'detection': ('detection', 'caption'), 'caption': ('caption', 'detection')}[stage]
+        conn = self.get_connection()
+        try:
+            json_data = json.dumps(data) if data else None
+            with conn.cursor() as c:
+                c.execute(f'''
+                    UPDATE media_files
+                    SET {column}_status='COMPLETED', {column}_data=%s, {column}_source=%s, last_updated=%s
+                    WHERE file_hash=%s AND {column}_status IS DISTINCT FROM 'COMPLETED'
+                    RETURNING {other}_status = 'COMPLETED'
+                ''', (json_data, source, time.time(), file_hash))
+                row = c.fetchone()
+            conn.commit()
+            return bool(row and row[0])
+        finally:
+            conn.close()
+
+    def begin_stages(self, file_hashes, stage):
+        """begin_stage for many files in one statement. Returns the set of hashes claimed."""
+        column = {'detection': 'detection', 'caption': 'caption'}[stage]
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as c:
+                c.execute(f'''
+                    UPDATE media_files
+                    SET {column}_status='PROCESSING', last_updated=%s
+                    WHERE file_hash = ANY(%s) AND {column}_status IS DISTINCT FROM 'COMPLETED'
+                    RETURNING file_hash
+                ''', (time.time(), list(file_hashes)))
+                claimed = {r[0] for r in c.fetchall()}
+            conn.commit()
+            return claimed
+        finally:
+            conn.close()
+
+    def complete_detections(self, results):
+        """
+        Batched store_face_embeddings + complete_stage('detection') in one transaction.
+        results: [(file_hash, data, embeddings, source)]; each data dict gets its 'face_ids'
+        (existing faces are kept, as in store_face_embeddings).
+        Returns the hashes now ready to finalize (caption already COMPLETED).
+        """
+        if not results: return []
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as c:
+                with_faces = [h for h, _, embeddings, _ in results if len(embeddings)]
+                c.execute("SELECT file_hash, face_id FROM faces WHERE file_hash = ANY(%s) ORDER BY face_id", (with_faces,))
+                face_ids = {}
+                for file_hash, face_id in c.fetchall():
+                    face_ids.setdefault(file_hash, []).append(face_id)
+
+                new_faces = [
+                    (file_hash, encode_embedding(emb), EMBEDDING_DTYPE)
+                    for file_hash, _, embeddings, _ in results if file_hash not in face_ids
+                    for emb in embeddings
+                ]
+                if new_faces:
+                    rows = psycopg2.extras.execute_values(
+                        c, "INSERT INTO faces (file_hash, embedding, embedding_dtype) VALUES %s RETURNING file_hash, face_id",
+                        new_faces, page_size=1000, fetch=True
+                    )
+                    for file_hash, face_id in sorted(rows, key=lambda r: r[1]):
+                        face_ids.setdefault(file_hash, []).append(face_id)
+
+                now = time.time()
+                rows = []
+                for file_hash, data, embeddings, source in results:
+                    if len(embeddings):
+                        data['face_ids'] = face_ids[file_hash]
+                    rows.append((file_hash, json.dumps(data) if data else None, source, now))
+                ready = psycopg2.extras.execute_values(c, '''
+                    UPDATE media_files m
+                    SET detection_status='COMPLETED', detection_data=v.data::jsonb, detection_source=v.source,
+                        last_updated=v.ts
+                    FROM (VALUES %s) AS v(file_hash, data, source, ts)
+                    WHERE m.file_hash = v.file_hash AND m.detection_status IS DISTINCT FROM 'COMPLETED'
+                    RETURNING m.file_hash, m.caption_status = 'COMPLETED'
+                ''', rows, page_size=1000, fetch=True)
+            conn.commit()
+            return [file_hash for file_hash, is_ready in ready if is_ready]
+        finally:
+            conn.close()
+
+    def get_completed_hashes_since(self, since):
+        """
+        (file_hash, last_updated) for files with any COMPLETED stage, updated at or after `since`.
+        Inclusive: last_updated is REAL (128 s steps at today's epoch), so rows written later in
+        the watermark's step compare equal to it. Callers get those rows again and must dedupe.
+        """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as c:
+                c.execute('''
+                    SELECT file_hash, last_updated FROM media_files
+                    WHERE last_updated >= %s
+                      AND (detection_status='COMPLETED' OR caption_status='COMPLETED')
+                ''', (since,))
+                return c.fetchall()
+        finally:
+            conn.close()
+
+    def get_completed_results(self, file_hashes, stage):
+        """
+        Returns {file_hash: {'file_hash', 'file_path', 'data'}} for the given hashes
+        whose `stage` ('detection' or 'caption') is COMPLETED.
+        """
+        column = {'detection': 'detection', 'caption': 'caption'}[stage]
+        conn = self.get_connection()
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as c:
+                c.execute(f'''
+                    SELECT file_hash, file_path, {column}_data AS data FROM media_files
+                    WHERE file_hash = ANY(%s) AND {column}_status='COMPLETED'
+                ''', (list(file_hashes),))
+                return {row['file_hash']: dict(row) for row in c.fetchall()}
+        finally:
+            conn.close()
 
     def get_file_data(self, file_hash):
         conn = self.get_connection()
@@ -176,6 +531,37 @@ class PhotoSynthDB:
         finally:
             conn.close()
 
+    def get_counters(self):
+        """
+        Pipeline counts kept by triggers (migration 004): {metric: {value: count}}.
+        e.g. {'files': {'': 120}, 'status': {'COMPLETED': 80, 'PENDING': 40}, 'faces': {'': 900}}.
+        Reads a few dozen rows regardless of table size.
+        """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as c:
+                c.execute("SELECT metric, value, SUM(count) FROM pipeline_counters GROUP BY metric, value HAVING SUM(count) <> 0")
+                rows = c.fetchall()
+        finally:
+            conn.close()
+        counters = {}
+        for metric, value, count in rows:
+            counters.setdefault(metric, {})[value] = int(count)
+        return counters
+
+    def publish_progress(self, file_hash, **fields):
+        """
+        Sends a progress event for state that isn't a media_files/faces write (those notify
+        via triggers), e.g. harvest results. Subscribers: photosynth/progress.py.
+        """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as c:
+                c.execute("SELECT pg_notify(%s, %s)", (PROGRESS_CHANNEL, json.dumps({'file_hash': file_hash, **fields})))
+            conn.commit()
+        finally:
+            conn.close()
+
     def check_status(self, file_hash):
         conn = self.get_connection()
         try:
@@ -188,46 +574,293 @@ class PhotoSynthDB:
 
     def add_face(self, file_hash, embedding):
         # Convert numpy to bytes
-        emb_bytes = embedding.tobytes()
+        emb_bytes = encode_embedding(embedding)
         conn = self.get_connection()
-        with conn.cursor() as c:
-            c.execute('INSERT INTO faces (file_hash, embedding) VALUES (%s, %s)', (file_hash, emb_bytes))
-        conn.commit()
-        conn.close()
+        try:
+            with conn.cursor() as c:
+                c.execute('INSERT INTO faces (file_hash, embedding, embedding_dtype) VALUES (%s, %s, %s)',
+                          (file_hash, emb_bytes, EMBEDDING_DTYPE))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def add_faces_bulk(self, faces):
+        """
+        Streams [(file_hash, embedding)] into `faces` with one binary COPY.
+        One round trip and one transaction for the whole batch (all rows or none).
+        """
+        if not faces: return 0
+        dtype = EMBEDDING_DTYPE.encode()
+        buf = binary_copy_buffer(
+            (file_hash.encode(), encode_embedding(emb), dtype)
+            for file_hash, emb in faces
+        )
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as c:
+                c.copy_expert("COPY faces (file_hash, embedding, embedding_dtype) FROM STDIN WITH (FORMAT binary)", buf)
+            conn.commit()
+        finally:
+            conn.close()
+        return len(faces)
+
+    def store_face_embeddings(self, file_hash, embeddings):
+        """
+        Writes a file's face embeddings once and returns their face_ids (the references
+        kept in detection_data). If the file already has faces (retried task, or the
+        scan_faces harvest got there first) their ids are returned and nothing is inserted.
+        """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as c:
+                c.execute("SELECT face_id FROM faces WHERE file_hash=%s ORDER BY face_id", (file_hash,))
+                face_ids = [r[0] for r in c.fetchall()]
+                if not face_ids and len(embeddings):
+                    rows = psycopg2.extras.execute_values(
+                        c,
+                        "INSERT INTO faces (file_hash, embedding, embedding_dtype) VALUES %s RETURNING face_id",
+                        [(file_hash, encode_embedding(emb), EMBEDDING_DTYPE) for emb in embeddings],
+                        fetch=True
+                    )
+                    face_ids = [r[0] for r in rows]
+            conn.commit()
+            return face_ids
+        finally:
+            conn.close()
 
     def get_all_embeddings(self):
         conn = self.get_connection()
-        with conn.cursor() as c:
-            c.execute('SELECT face_id, embedding FROM faces')
-            rows = c.fetchall()
-        conn.close()
+        try:
+            with conn.cursor() as c:
+                c.execute('SELECT face_id, embedding, embedding_dtype FROM faces')
+                rows = c.fetchall()
+        finally:
+            conn.close()
         # Convert bytes back to numpy
-        return [(r[0], np.frombuffer(r[1], dtype=np.float32)) for r in rows]
+        return [(r[0], decode_embedding(r[1], r[2])) for r in rows]
 
-    def update_clusters(self, cluster_map):
+    def count_faces(self, cluster_ids=None, since=None):
+        where, params = self._face_filter(cluster_ids, since)
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as c:
+                c.execute(f"SELECT COUNT(*) FROM faces f {where}", params)
+                return c.fetchone()[0]
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _face_filter(cluster_ids=None, since=None, face_ids=None, after_face_id=None):
+        clauses, params = [], []
+        if cluster_ids is not None:
+            clauses.append("f.cluster_id = ANY(%s)")
+            params.append([int(c) for c in cluster_ids])
+        if since is not None:
+            clauses.append("f.file_hash IN (SELECT file_hash FROM media_files WHERE last_updated >= %s)")
+            params.append(since)
+        if face_ids is not None:
+            clauses.append("f.face_id = ANY(%s)")
+            params.append([int(i) for i in face_ids])
+        if after_face_id is not None:
+            clauses.append("f.face_id > %s")
+            params.append(int(after_face_id))
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def load_embedding_matrix(self, cluster_ids=None, since=None, face_ids=None, after_face_id=None,
+                              batch_size=EMBEDDING_BATCH):
+        """
+        Streams face embeddings into one preallocated float32 matrix.
+        Returns (face_ids int64[n], embeddings float32[n, d]); empty arrays if no faces.
+        - Named server-side cursor: only `batch_size` rows are client-side at a time,
+          so peak memory is ~1x the matrix instead of rows + list + np.array copies.
+        - COUNT and cursor run in one REPEATABLE READ snapshot, so n is exact.
+        - Optional filters: cluster_ids (iterable), since (media_files.last_updated epoch),
+          face_ids (iterable) and after_face_id (face_id > it).
+        """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as c:
+                c.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+            result = self._stream_embeddings(conn, cluster_ids, since, face_ids, after_face_id, batch_size)
+            conn.commit()
+            return result
+        finally:
+            conn.close()
+
+    def load_faces_after(self, after_face_id, batch_size=EMBEDDING_BATCH):
+        """
+        Incremental index sync: (face_ids, embeddings, total_faces) in one snapshot, where the
+        arrays hold faces with face_id > after_face_id and total_faces is the trigger-kept
+        count of all faces. A caller whose index then holds != total_faces vectors has missed
+        a delete or a late-committing insert at or below the watermark.
+        """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as c:
+                c.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+                c.execute("SELECT COALESCE(SUM(count), 0) FROM pipeline_counters WHERE metric = 'faces'")
+                total = int(c.fetchone()[0])
+            face_ids, embeddings = self._stream_embeddings(conn, after_face_id=after_face_id, batch_size=batch_size)
+            conn.commit()
+            return face_ids, embeddings, total
+        finally:
+            conn.close()
+
+    def get_face_ids(self, max_face_id=None):
+        """All face_ids (<= max_face_id if given) as a sorted int64 array; ids only, no embeddings."""
         conn = self.get_connection()
+        try:
+            with conn.cursor() as c:
+                if max_face_id is None:
+                    c.execute("SELECT face_id FROM faces ORDER BY face_id")
+                else:
+                    c.execute("SELECT face_id FROM faces WHERE face_id <= %s ORDER BY face_id", (int(max_face_id),))
+                return np.fromiter((r[0] for r in c), dtype=np.int64)
+        finally:
+            conn.close()
+
+    def _stream_embeddings(self, conn, cluster_ids=None, since=None, face_ids=None, after_face_id=None,
+                           batch_size=EMBEDDING_BATCH):
+        """load_embedding_matrix body, on a connection whose transaction the caller owns."""
+        where, params = self._face_filter(cluster_ids, since, face_ids, after_face_id)
         with conn.cursor() as c:
-            # Batch update
-            psycopg2.extras.execute_batch(c, 
-                'UPDATE faces SET cluster_id = %s WHERE face_id = %s',
-                cluster_map
-            )
-            
-            unique = set(c_id for c_id, f_id in cluster_map if c_id != -1)
-            for c_id in unique:
-                c.execute('INSERT INTO people (cluster_id) VALUES (%s) ON CONFLICT (cluster_id) DO NOTHING', (c_id,))
-        conn.commit()
-        conn.close()
+            c.execute(f"SELECT COUNT(*) FROM faces f {where}", params)
+            n = c.fetchone()[0]
+        if n == 0:
+            return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+
+        ids = np.empty(n, dtype=np.int64)
+        embeddings = None
+        row = 0
+        with conn.cursor(name="embedding_stream") as c:
+            c.itersize = batch_size
+            c.execute(f"SELECT f.face_id, f.embedding, f.embedding_dtype FROM faces f {where} ORDER BY f.face_id", params)
+            while True:
+                rows = c.fetchmany(batch_size)
+                if not rows: break
+                if embeddings is None:
+                    dim = len(rows[0][1]) // np.dtype(rows[0][2]).itemsize
+                    embeddings = np.empty((n, dim), dtype=np.float32)
+                for face_id, emb, dtype in rows:
+                    ids[row] = face_id
+                    embeddings[row] = np.frombuffer(emb, dtype=dtype)  # float16 upcasts on assignment
+                    row += 1
+        return ids[:row], embeddings[:row]
+
+    def get_cluster_version(self):
+        """Bumped by every statement that changes faces.cluster_id or people (migrations 006, 007)."""
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as c:
+                c.execute("SELECT version FROM cluster_version")
+                row = c.fetchone()
+            conn.commit()
+            return row[0] if row else 0
+        finally:
+            conn.close()
+
+    def get_cluster_assignments(self):
+        """
+        (face_ids int32[n], cluster_ids int32[n], version) for all faces, in one snapshot.
+        Binary COPY decoded in bulk with CLUSTER_COPY_ROW: no per-row Python objects.
+        """
+        buf = io.BytesIO()
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as c:
+                c.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+                c.execute("SELECT version FROM cluster_version")
+                row = c.fetchone()
+                c.copy_expert(
+                    "COPY (SELECT face_id, COALESCE(cluster_id, -1) FROM faces) TO STDOUT WITH (FORMAT binary)", buf
+                )
+            conn.commit()
+        finally:
+            conn.close()
+
+        data = buf.getbuffer()
+        body = data[len(PGCOPY_HEADER):len(data) - len(PGCOPY_TRAILER)]
+        rows = np.frombuffer(body, dtype=CLUSTER_COPY_ROW)
+        return rows['face_id'].astype(np.int32), rows['cluster_id'].astype(np.int32), (row[0] if row else 0)
+
+    def update_clusters(self, cluster_map):
+        """cluster_map: [(cluster_id, face_id)]. See assign_clusters."""
+        if not cluster_map: return
+        cluster_ids, face_ids = zip(*cluster_map)
+        self.assign_clusters(face_ids, cluster_ids)
+
+    def assign_clusters(self, face_ids, cluster_ids):
+        """
+        Set-based cluster write for a whole k-means result (arrays or sequences, same length).
+        - One binary COPY into a temp table, one UPDATE ... FROM, one INSERT ... SELECT DISTINCT
+          into people, instead of a statement per face and per cluster.
+        - Faces already in their cluster are not rewritten (no dead tuples for them).
+        """
+        if len(face_ids) == 0: return
+        rows = np.empty(len(face_ids), dtype=CLUSTER_COPY_ROW)
+        rows['fields'] = 2
+        rows['face_len'] = rows['cluster_len'] = 4
+        rows['face_id'] = face_ids
+        rows['cluster_id'] = cluster_ids
+
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as c:
+                c.execute("CREATE TEMP TABLE cluster_assign (face_id INTEGER, cluster_id INTEGER) ON COMMIT DROP")
+                c.copy_expert(
+                    "COPY cluster_assign FROM STDIN WITH (FORMAT binary)",
+                    io.BytesIO(PGCOPY_HEADER + rows.tobytes() + PGCOPY_TRAILER)
+                )
+                c.execute("ANALYZE cluster_assign")
+                c.execute('''
+                    UPDATE faces f SET cluster_id = a.cluster_id
+                    FROM cluster_assign a
+                    WHERE f.face_id = a.face_id AND f.cluster_id IS DISTINCT FROM a.cluster_id
+                ''')
+                c.execute('''
+                    INSERT INTO people (cluster_id)
+                    SELECT DISTINCT cluster_id FROM cluster_assign WHERE cluster_id != -1
+                    ON CONFLICT (cluster_id) DO NOTHING
+                ''')
+            conn.commit()
+        finally:
+            conn.close()
 
     def get_known_faces(self):
         conn = self.get_connection()
-        with conn.cursor() as c:
-            c.execute('''
-                SELECT f.cluster_id, p.name, f.embedding 
-                FROM faces f
-                JOIN people p ON f.cluster_id = p.cluster_id
-                WHERE f.cluster_id != -1
-            ''')
-            rows = c.fetchall()
-        conn.close()
-        return [(r[0], r[1], np.frombuffer(r[2], dtype=np.float32)) for r in rows]
\ No newline at end of file
+        try:
+            with conn.cursor() as c:
+                c.execute('''
+                    SELECT f.cluster_id, p.name, f.embedding, f.embedding_dtype
+                    FROM faces f
+                    JOIN people p ON f.cluster_id = p.cluster_id
+                    WHERE f.cluster_id != -1
+                ''')
+                rows = c.fetchall()
+        finally:
+            conn.close()
+        return [(r[0], r[1], decode_embedding(r[2], r[3])) for r in rows]
+
+    def load_known_faces(self):
+        """
+        Faces of every person (cluster in people), for the known-face gallery, in one snapshot.
+        Unnamed clusters ('Unknown' or NULL) are included, as in get_known_faces: a face closest
+        to one of them must not take a lookalike's name.
+        Returns ({cluster_id: name}, cluster_ids int32[n], embeddings float32[n, d], cluster_version).
+        """
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as c:
+                c.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+                c.execute("SELECT version FROM cluster_version")
+                version = c.fetchone()[0]
+                c.execute("SELECT cluster_id, name FROM people WHERE cluster_id != -1")
+                names = dict(c.fetchall())
+                c.execute("SELECT cluster_id FROM faces WHERE cluster_id = ANY(%s) ORDER BY face_id", (list(names),))
+                cluster_ids = np.fromiter((r[0] for r in c.fetchall()), dtype=np.int32)
+            # Same snapshot and face_id order as cluster_ids
+            _, embeddings = self._stream_embeddings(conn, cluster_ids=list(names))
+            conn.commit()
+        finally:
+            conn.close()
+        return names, cluster_ids, embeddings, version
\ No newline at end of file
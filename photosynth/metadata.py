@@ -1,6 +1,6 @@
 import subprocess
 import os
-from photosynth.utils.paths import heal_path
+from photosynth.utils.paths import heal_path, get_path_resolver
 
 class MetadataWriter:
     def __init__(self):
@@ -21,7 +21,7 @@ class MetadataWriter:
 
     def write_metadata(self, file_path, full_narrative, search_concepts):
         file_path = heal_path(file_path)
-        if not os.path.exists(file_path):
+        if not get_path_resolver().exists(file_path):
             print(f"❌ Metadata Error: File not found {file_path}")
             return False
 
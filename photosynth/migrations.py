@@ -0,0 +1,312 @@
+"""
+Versioned Postgres schema migrations.
+
+Each migration is (version, name, [statements]) and runs once, in its own transaction,
+recorded in schema_migrations. Append new migrations to the end of MIGRATIONS; never
+edit one that has shipped.
+"""
+import time
+
+# Serializes concurrent migrators (several workers starting at once); any constant works
+MIGRATION_LOCK_ID = 0x50534D47
+COUNTER_SLOTS = 16  # pipeline_counters rows per key (see migration 004)
+PROGRESS_CHANNEL = "photosynth_progress"  # NOTIFY channel for progress events (migration 005, photosynth/progress.py)
+
+
+def _media_files_counter_upsert(changes, order_by=''):
+    """SQL adding the status deltas of `changes` (media_files rows plus a +1/-1 column d) to this backend's slot."""
+    return f'''
+                WITH changes AS ({changes}),
+                deltas AS (
+                    SELECT 'files' AS metric, '' AS value, d FROM changes
+                    UNION ALL SELECT 'status', COALESCE(status, ''), d FROM changes
+                    UNION ALL SELECT 'detection_status', COALESCE(detection_status, ''), d FROM changes
+                    UNION ALL SELECT 'caption_status', COALESCE(caption_status, ''), d FROM changes
+                )
+                INSERT INTO pipeline_counters (metric, value, slot, count)
+                SELECT metric, value, mod(pg_backend_pid(), {COUNTER_SLOTS}), SUM(d) FROM deltas
+                GROUP BY metric, value HAVING SUM(d) <> 0{order_by}
+                ON CONFLICT (metric, value, slot) DO UPDATE SET count = pipeline_counters.count + EXCLUDED.count;
+    '''
+
+
+def _media_files_counters_function(order_by=''):
+    """The media_files_counters() trigger function (migrations 004, 008)."""
+    return f'''
+        CREATE OR REPLACE FUNCTION media_files_counters() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {_media_files_counter_upsert("SELECT *, 1 AS d FROM new_rows", order_by)}
+            ELSIF TG_OP = 'DELETE' THEN
+                {_media_files_counter_upsert("SELECT *, -1 AS d FROM old_rows", order_by)}
+            ELSE
+                {_media_files_counter_upsert("SELECT *, 1 AS d FROM new_rows UNION ALL SELECT *, -1 FROM old_rows", order_by)}
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        '''
+
+
+MIGRATIONS = [
+    (1, "baseline", [
+        '''
+        CREATE TABLE IF NOT EXISTS media_files (
+            file_hash TEXT PRIMARY KEY,
+            file_path TEXT,
+            status TEXT DEFAULT 'PENDING',
+
+            -- Granular Status Tracking
+            detection_status TEXT DEFAULT 'PENDING',
+            caption_status TEXT DEFAULT 'PENDING',
+
+            -- Intermediate Results (JSON)
+            detection_data JSONB,
+            caption_data JSONB,
+
+            vlm_narrative TEXT,
+            search_concepts JSONB,
+            last_updated REAL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS people (
+            cluster_id INTEGER PRIMARY KEY,
+            name TEXT DEFAULT 'Unknown'
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS faces (
+            face_id SERIAL PRIMARY KEY,
+            file_hash TEXT,
+            embedding BYTEA,
+            cluster_id INTEGER DEFAULT -1,
+            FOREIGN KEY(file_hash) REFERENCES media_files(file_hash)
+        )
+        ''',
+        # Near-duplicate reuse: hash of the file whose results were copied
+        "ALTER TABLE media_files ADD COLUMN IF NOT EXISTS detection_source TEXT",
+        "ALTER TABLE media_files ADD COLUMN IF NOT EXISTS caption_source TEXT",
+    ]),
+    (2, "hot_path_indexes", [
+        # Faces per file (scan_faces monitor, FK checks) and per cluster (/clusters, merges)
+        "CREATE INDEX IF NOT EXISTS idx_faces_file_hash ON faces (file_hash)",
+        "CREATE INDEX IF NOT EXISTS idx_faces_cluster_id ON faces (cluster_id)",
+        # Pipeline status counts and work queues
+        "CREATE INDEX IF NOT EXISTS idx_media_files_status ON media_files (status)",
+        "CREATE INDEX IF NOT EXISTS idx_media_files_detection_status ON media_files (detection_status)",
+        "CREATE INDEX IF NOT EXISTS idx_media_files_caption_status ON media_files (caption_status)",
+        "CREATE INDEX IF NOT EXISTS idx_media_files_file_path ON media_files (file_path)",
+        # Tag / merge lookup by name
+        "CREATE INDEX IF NOT EXISTS idx_people_name ON people (name)",
+    ]),
+    (3, "embedding_dtype", [
+        # faces.embedding is raw bytes of this numpy dtype ('float32', or 'float16' for half size)
+        "ALTER TABLE faces ADD COLUMN IF NOT EXISTS embedding_dtype TEXT NOT NULL DEFAULT 'float32'",
+    ]),
+    (4, "pipeline_counters", [
+        # Sharded counters: writers add to slot (backend pid mod COUNTER_SLOTS) so concurrent
+        # transactions don't queue on one row; readers SUM the few slots per key.
+        '''
+        CREATE TABLE IF NOT EXISTS pipeline_counters (
+            metric TEXT,    -- files | status | detection_status | caption_status | faces
+            value TEXT,     -- status value ('' for totals)
+            slot SMALLINT,
+            count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (metric, value, slot)
+        )
+        ''',
+        # Statement-level triggers with transition tables: one counter upsert per statement,
+        # so COPY / batch writes pay once, not per row.
+        # One static statement per operation (not EXECUTE) so plpgsql caches the plans
+        _media_files_counters_function(),
+        f'''
+        CREATE OR REPLACE FUNCTION faces_counters() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO pipeline_counters (metric, value, slot, count)
+                SELECT 'faces', '', mod(pg_backend_pid(), {COUNTER_SLOTS}), COUNT(*) FROM new_rows HAVING COUNT(*) > 0
+                ON CONFLICT (metric, value, slot) DO UPDATE SET count = pipeline_counters.count + EXCLUDED.count;
+            ELSE
+                INSERT INTO pipeline_counters (metric, value, slot, count)
+                SELECT 'faces', '', mod(pg_backend_pid(), {COUNTER_SLOTS}), -COUNT(*) FROM old_rows HAVING COUNT(*) > 0
+                ON CONFLICT (metric, value, slot) DO UPDATE SET count = pipeline_counters.count + EXCLUDED.count;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        ''',
+        # Recount from scratch (migration seed and reconcile_counters.py --fix). Callers
+        # must hold SHARE ROW EXCLUSIVE on both tables so no writer slips in between.
+        '''
+        CREATE OR REPLACE FUNCTION rebuild_pipeline_counters() RETURNS void AS $$
+            DELETE FROM pipeline_counters;
+            INSERT INTO pipeline_counters (metric, value, slot, count)
+                SELECT 'files', '', 0, COUNT(*) FROM media_files
+                UNION ALL SELECT 'status', COALESCE(status, ''), 0, COUNT(*) FROM media_files GROUP BY 2
+                UNION ALL SELECT 'detection_status', COALESCE(detection_status, ''), 0, COUNT(*) FROM media_files GROUP BY 2
+                UNION ALL SELECT 'caption_status', COALESCE(caption_status, ''), 0, COUNT(*) FROM media_files GROUP BY 2
+                UNION ALL SELECT 'faces', '', 0, COUNT(*) FROM faces;
+        $$ LANGUAGE sql
+        ''',
+        "LOCK TABLE media_files, faces IN SHARE ROW EXCLUSIVE MODE",
+        "DROP TRIGGER IF EXISTS media_files_counters_ins ON media_files",
+        "DROP TRIGGER IF EXISTS media_files_counters_upd ON media_files",
+        "DROP TRIGGER IF EXISTS media_files_counters_del ON media_files",
+        "DROP TRIGGER IF EXISTS faces_counters_ins ON faces",
+        "DROP TRIGGER IF EXISTS faces_counters_del ON faces",
+        '''CREATE TRIGGER media_files_counters_ins AFTER INSERT ON media_files
+           REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION media_files_counters()''',
+        '''CREATE TRIGGER media_files_counters_upd AFTER UPDATE ON media_files
+           REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION media_files_counters()''',
+        '''CREATE TRIGGER media_files_counters_del AFTER DELETE ON media_files
+           REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION media_files_counters()''',
+        '''CREATE TRIGGER faces_counters_ins AFTER INSERT ON faces
+           REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION faces_counters()''',
+        '''CREATE TRIGGER faces_counters_del AFTER DELETE ON faces
+           REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION faces_counters()''',
+        "SELECT rebuild_pipeline_counters()",
+    ]),
+    (5, "progress_events", [
+        # NOTIFY (delivered on commit) a JSON event per file whose statuses changed, so
+        # monitors subscribe instead of polling. Face inserts send per-file deltas tagged
+        # with the writer's xid, which lets a subscriber skip those its snapshot already counted.
+        f'''
+        CREATE OR REPLACE FUNCTION media_files_progress() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM pg_notify('{PROGRESS_CHANNEL}', json_build_object(
+                    'file_hash', n.file_hash, 'status', n.status, 'detection_status', n.detection_status,
+                    'caption_status', n.caption_status, 'last_updated', n.last_updated)::text)
+                FROM new_rows n;
+            ELSE
+                PERFORM pg_notify('{PROGRESS_CHANNEL}', json_build_object(
+                    'file_hash', n.file_hash, 'status', n.status, 'detection_status', n.detection_status,
+                    'caption_status', n.caption_status, 'last_updated', n.last_updated)::text)
+                FROM new_rows n JOIN old_rows o USING (file_hash)
+                WHERE (n.status, n.detection_status, n.caption_status)
+                      IS DISTINCT FROM (o.status, o.detection_status, o.caption_status);
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        ''',
+        f'''
+        CREATE OR REPLACE FUNCTION faces_progress() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{PROGRESS_CHANNEL}', json_build_object(
+                'file_hash', file_hash, 'faces_added', COUNT(*), 'xid', txid_current())::text)
+            FROM new_rows GROUP BY file_hash;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        ''',
+        "DROP TRIGGER IF EXISTS media_files_progress_ins ON media_files",
+        "DROP TRIGGER IF EXISTS media_files_progress_upd ON media_files",
+        "DROP TRIGGER IF EXISTS faces_progress_ins ON faces",
+        '''CREATE TRIGGER media_files_progress_ins AFTER INSERT ON media_files
+           REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION media_files_progress()''',
+        '''CREATE TRIGGER media_files_progress_upd AFTER UPDATE ON media_files
+           REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION media_files_progress()''',
+        '''CREATE TRIGGER faces_progress_ins AFTER INSERT ON faces
+           REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION faces_progress()''',
+    ]),
+    (6, "cluster_version", [
+        # Bumped (transactionally) by every statement that updates faces.cluster_id, so
+        # in-memory face -> cluster maps (FAISSManager) know when to reload
+        '''
+        CREATE TABLE IF NOT EXISTS cluster_version (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            version BIGINT NOT NULL DEFAULT 0
+        )
+        ''',
+        "INSERT INTO cluster_version (id, version) VALUES (TRUE, 0) ON CONFLICT DO NOTHING",
+        '''
+        CREATE OR REPLACE FUNCTION bump_cluster_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE cluster_version SET version = version + 1;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        ''',
+        "DROP TRIGGER IF EXISTS faces_cluster_version ON faces",
+        '''CREATE TRIGGER faces_cluster_version AFTER UPDATE OF cluster_id ON faces
+           FOR EACH STATEMENT EXECUTE FUNCTION bump_cluster_version()''',
+    ]),
+    (7, "people_cluster_version", [
+        # Renames in the face tagger change who a cluster is without touching faces, so
+        # people writes bump the same stamp (known-face galleries reload on it)
+        "DROP TRIGGER IF EXISTS people_cluster_version ON people",
+        '''CREATE TRIGGER people_cluster_version AFTER INSERT OR UPDATE OR DELETE ON people
+           FOR EACH STATEMENT EXECUTE FUNCTION bump_cluster_version()''',
+    ]),
+    (8, "counter_upsert_order", [
+        # Upsert counter rows in key order: two backends sharing a slot otherwise lock the
+        # same (metric, value, slot) rows in different orders and can deadlock.
+        # (faces_counters() writes a single row per statement, so it has no order to fix.)
+        _media_files_counters_function(order_by="\n                ORDER BY metric, value"),
+    ]),
+    (9, "media_files_last_updated_index", [
+        # Incremental near-duplicate refresh (get_completed_hashes_since: last_updated >= watermark)
+        "CREATE INDEX IF NOT EXISTS idx_media_files_last_updated ON media_files (last_updated)",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    """Highest applied version (0 for a fresh database)."""
+    with conn.cursor() as c:
+        c.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+        if not c.fetchone()[0]:
+            conn.rollback()
+            return 0
+        c.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+        version = c.fetchone()[0]
+    conn.rollback()
+    return version
+
+
+def migrate(conn):
+    """
+    Applies pending migrations. Returns the list of versions applied (empty when up to date).
+    - Up to date costs two cheap queries and takes no lock.
+    - Otherwise an advisory lock makes concurrent callers wait; each migration commits
+      together with its schema_migrations row, so a failure leaves a consistent version.
+    """
+    if current_version(conn) >= LATEST_VERSION:
+        return []
+
+    applied = []
+    with conn.cursor() as c:
+        c.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        try:
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT,
+                    applied_at REAL
+                )
+            ''')
+            conn.commit()
+            c.execute("SELECT version FROM schema_migrations")
+            done = {row[0] for row in c.fetchall()}
+
+            for version, name, statements in MIGRATIONS:
+                if version in done: continue
+                print(f"🗄️ Applying migration {version:03d}_{name}...")
+                for statement in statements:
+                    c.execute(statement)
+                c.execute("INSERT INTO schema_migrations (version, name, applied_at) VALUES (%s, %s, %s)",
+                          (version, name, time.time()))
+                conn.commit()
+                applied.append(version)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            c.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+            conn.commit()
+    return applied
+
@@ -15,6 +15,7 @@ from transformers import (
 from qwen_vl_utils import process_vision_info 
 from PIL import Image
 from photosynth.utils.paths import heal_path
+from photosynth.utils.video import is_video, sample_video_frames
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 SECRETS_PATH = os.path.join(BASE_DIR, ".secretsenv")
@@ -59,15 +60,11 @@ class Captioner:
         """Extracts a frame from video or loads image (With Path Auto-Correction)."""
         file_path = heal_path(file_path)
 
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext in ['.mp4', '.mov', '.avi', '.mkv', '.m4v']:
-            cap = cv2.VideoCapture(file_path)
-            if not cap.isOpened(): return Image.new('RGB', (224, 224), 'black')
-            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            cap.set(cv2.CAP_PROP_POS_FRAMES, total // 2)
-            ret, frame = cap.read()
-            cap.release()
-            return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)) if ret else Image.new('RGB', (224, 224), 'black')
+        if is_video(file_path):
+            # Same keyframe the hasher sampled (served from the frame cache)
+            frames = sample_video_frames(file_path)
+            if not frames: return Image.new('RGB', (224, 224), 'black')
+            return Image.fromarray(cv2.cvtColor(frames[0], cv2.COLOR_BGR2RGB))
         else:
             return Image.open(file_path)
 
@@ -75,7 +72,8 @@ class Captioner:
         if det_results is None: det_results = {}
         
         # 1. Build Context
-        faces = det_results.get('faces', [])
+        # face_ids can be a subset (faces saved earlier by the harvest); legacy rows have only 'faces'
+        face_count = det_results.get('face_count', len(det_results.get('faces', [])))
         objects = det_results.get('objects', [])
         known_people = det_results.get('known_people', []) # e.g. ['Aditya']
         
@@ -85,8 +83,8 @@ class Captioner:
         if known_people:
             names = ", ".join(known_people)
             context_parts.append(f"This image contains specific people you know: {names}. You MUST refer to them by name in the caption.")
-        elif faces:
-            context_parts.append(f"Contains {len(faces)} unidentified people.")
+        elif face_count:
+            context_parts.append(f"Contains {face_count} unidentified people.")
             
         if objects:
             context_parts.append(f"Key objects present: {', '.join(objects[:7])}.")
@@ -5,8 +5,12 @@ import json
 import numpy as np
 from PIL import Image
 from insightface.app import FaceAnalysis
+from insightface.app.common import Face
+from insightface.utils import face_align
 from ultralytics import YOLOWorld
-from photosynth.utils.paths import heal_path
+from photosynth.utils.face_gallery import get_face_gallery
+from photosynth.utils.media import MediaFrame
+from photosynth.utils.video import SceneSampler
 
 class Detector:
     def __init__(self, enable_yolo=True):
@@ -40,32 +44,14 @@ class Detector:
 
 
     def _identify_faces(self, faces):
-        """Returns list of names ['Aditya', 'Ankita'] found in the image."""
-        from photosynth.db import PhotoSynthDB
+        """Returns list of names ['Aditya', 'Ankita'] found in the image (one gallery matmul for all faces)."""
+        if not faces: return []
         try:
-            db = PhotoSynthDB()
-            known_faces = db.get_known_faces()
-        except: return []
+            return get_face_gallery().identify(np.stack([f.embedding for f in faces]))
+        except Exception: return []
 
-        if not known_faces: return []
-
-        found_names = set()
-        for face in faces:
-            curr_emb = face.embedding
-            best_score = 0.0
-            best_name = None
-            
-            for _, name, known_emb in known_faces:
-                score = np.dot(curr_emb, known_emb) / (np.linalg.norm(curr_emb) * np.linalg.norm(known_emb))
-                if score > 0.55 and score > best_score: 
-                    best_score = score
-                    best_name = name
-            
-            if best_name and best_name != "Unknown":
-                found_names.add(best_name)
-        return list(found_names)
-
-    def run_detection(self, file_path):
+    def run_detection(self, file_path, frame=None):
+        """frame: the task's MediaFrame for an image, so the file is not read and decoded again."""
         print(f"Processing {os.path.basename(file_path)}...")
         ext = os.path.splitext(file_path)[1].lower()
         
@@ -74,14 +60,18 @@ class Detector:
             return self._process_video(file_path)
         # IMAGE extensions (Added .webp)
         elif ext in ['.jpg', '.jpeg', '.png', '.arw', '.webp', '.heic']:
-            return self._process_image(file_path)
+            return self._process_image(file_path, frame)
         else:
             return {"status": "SKIPPED", "reason": "Unsupported format"}
 
-    def _process_image(self, image_path):
-        image_path = heal_path(image_path)
-        image_cv = cv2.imread(image_path)
-        if image_cv is None: return {}
+    def _process_image(self, image_path, frame=None):
+        # One read + decode, shared by InsightFace and YOLO (and by hashing, via the caller's frame)
+        frame = frame or MediaFrame.load(image_path)
+        try:
+            image_cv = frame.bgr
+        except Exception as e:
+            print(f"⚠️ Could not decode {image_path}: {e}")
+            return {}
         
         # 1. Faces
         faces = self.face_app.get(image_cv)
@@ -91,65 +81,85 @@ class Detector:
         # 2. Objects
         objs = []
         if self.enable_yolo:
-            results = self.yolo_model.predict(image_path, conf=0.05, verbose=False)
+            results = self.yolo_model.predict(image_cv, conf=0.05, verbose=False)
             for r in results:
                 for c in r.boxes.cls:
                     objs.append(self.yolo_model.names[int(c)])
         
         return {
             "status": "SUCCESS",
-            "faces": [f.embedding.tolist() for f in faces], # Embeddings present
+            "faces": [f.embedding.astype(np.float32) for f in faces], # Embeddings present (stored as face refs by run_detection_pass)
             "face_count": len(faces),
             "known_people": known_people,
             "objects": list(set(objs)),
             "is_video": False
         }
 
+    def detect_images(self, frames):
+        """
+        _process_image for a batch of MediaFrames (same result dicts, in order), via _detect_batch.
+        Frames that fail to decode yield {} as in _process_image.
+        """
+        images = []
+        for frame in frames:
+            try:
+                images.append(frame.bgr)
+            except Exception as e:
+                print(f"⚠️ Could not decode {frame.path}: {e}")
+                images.append(None)
+        decoded = [i for i, image in enumerate(images) if image is not None]
+        detections = dict(zip(decoded, self._detect_batch([images[i] for i in decoded])))
+
+        return [{
+            "status": "SUCCESS",
+            "faces": [f.embedding.astype(np.float32) for f in detections[i][0]],
+            "face_count": len(detections[i][0]),
+            "known_people": self._identify_faces(detections[i][0]),
+            "objects": list(detections[i][1]),
+            "is_video": False
+        } if i in detections else {} for i in range(len(frames))]
+
+    def _detect_batch(self, images):
+        """
+        (faces, objects) per BGR image:
+        - SCRFD face detection per image, then one recognition forward pass over the
+          aligned crops of all images (FaceAnalysis.get runs it per face, plus attribute
+          models whose outputs the pipeline never reads);
+        - one YOLO-World predict call over the whole batch.
+        """
+        recognizer = self.face_app.models['recognition']
+        faces, crops = [], []
+        for image in images:
+            bboxes, kpss = self.face_app.det_model.detect(image, max_num=0, metric='default')
+            faces.append([Face(bbox=b[:4], kps=k, det_score=b[4]) for b, k in zip(bboxes, kpss)])
+            crops.extend(face_align.norm_crop(image, landmark=f.kps, image_size=recognizer.input_size[0]) for f in faces[-1])
+        embeddings = recognizer.get_feat(crops) if crops else np.empty((0, 512), dtype=np.float32)
+        for face, embedding in zip((f for image_faces in faces for f in image_faces), embeddings):
+            face.embedding = embedding
+
+        objects = [set() for _ in images]
+        if self.enable_yolo and images:
+            results = self.yolo_model.predict(images, conf=0.05, verbose=False)
+            for image_objects, r in zip(objects, results):
+                image_objects.update(self.yolo_model.names[int(c)] for c in r.boxes.cls)
+        return list(zip(faces, objects))
+
     def _process_video(self, video_path):
         print(f"🎬 Video detected. Sampling...")
-        video_path = heal_path(video_path)
-        cap = cv2.VideoCapture(video_path)
-        
-        if not cap.isOpened(): return {"status": "ERROR"}
-
-        raw_fps = cap.get(cv2.CAP_PROP_FPS)
-        fps = raw_fps if raw_fps > 0 else 30.0
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        duration = total_frames / fps
-        
-        if duration > 30: interval_sec = 5
-        elif duration > 5: interval_sec = 2
-        else: interval_sec = 1
-            
-        frame_interval = int(fps * interval_sec)
-        if frame_interval < 1: frame_interval = 1
-        
         all_objects = set()
         all_people = set()
         max_faces_seen_in_frame = 0
-        
-        frame_idx = 0
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret: break
-            
-            if frame_idx % frame_interval == 0:
-                # Faces
-                faces = self.face_app.get(frame)
-                max_faces_seen_in_frame = max(max_faces_seen_in_frame, len(faces))
-                names = self._identify_faces(faces)
-                all_people.update(names)
-                
-                # Objects
-                if self.enable_yolo:
-                    results = self.yolo_model.predict(frame, conf=0.05, verbose=False)
-                    for r in results:
-                        for c in r.boxes.cls:
-                            all_objects.add(self.yolo_model.names[int(c)])
-            frame_idx += 1
-            
-        cap.release()
-        
+
+        # Only sampled frames are decoded, only visually new ones detected (see SceneSampler), in batches
+        with SceneSampler(video_path) as sampler:
+            if not sampler.is_opened(): return {"status": "ERROR"}
+            for batch in sampler.batches():
+                detections = self._detect_batch(batch)
+                for faces, objects in detections:
+                    max_faces_seen_in_frame = max(max_faces_seen_in_frame, len(faces))
+                    all_objects.update(objects)
+                all_people.update(self._identify_faces([f for faces, _ in detections for f in faces]))
+
         return {
             "status": "SUCCESS",
             "faces": [], # Empty for video to avoid DB bloat
@@ -0,0 +1,96 @@
+import json
+import select
+
+import psycopg2
+
+from photosynth.db import DB_HOST, DB_NAME, DB_USER, DB_PASS
+from photosynth.migrations import PROGRESS_CHANNEL
+
+# --- CONFIGURATION ---
+SNAPSHOT_CHUNK = 5000  # hashes per snapshot query
+
+
+# ---------------------
+
+class ProgressSubscriber:
+    """
+    Push-based pipeline progress for monitors (events come from migration 005's triggers
+    and PhotoSynthDB.publish_progress).
+    - LISTENs on its own connection (not the pool) from construction, so create it before
+      queuing work: events for files tracked later are buffered, not lost.
+    - track(hashes) loads their current state in one query per SNAPSHOT_CHUNK; after that,
+      wait() applies events as workers commit them. Nothing is polled per file.
+    - files: {file_hash: {'status', 'detection_status', 'caption_status', 'last_updated',
+      'faces', plus any published fields such as 'harvest'}}.
+    """
+
+    def __init__(self):
+        self.conn = psycopg2.connect(host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASS)
+        self.conn.autocommit = True
+        self.files = {}
+        self._snapshots = {}  # file_hash -> (xmin, xmax, xip) of the snapshot its state came from
+        with self.conn.cursor() as c:
+            c.execute(f"LISTEN {PROGRESS_CHANNEL}")
+
+    def track(self, file_hashes):
+        """Starts following `file_hashes` (unregistered files start as {'faces': 0})."""
+        file_hashes = [h for h in file_hashes if h not in self.files]
+        for i in range(0, len(file_hashes), SNAPSHOT_CHUNK):
+            chunk = file_hashes[i:i + SNAPSHOT_CHUNK]
+            with self.conn.cursor() as c:
+                c.execute("BEGIN ISOLATION LEVEL REPEATABLE READ READ ONLY")
+                c.execute("SELECT txid_current_snapshot()::text")
+                xmin, xmax, xip = c.fetchone()[0].split(':')
+                snapshot = (int(xmin), int(xmax), {int(x) for x in xip.split(',') if x})
+                c.execute('''
+                    SELECT m.file_hash, m.status, m.detection_status, m.caption_status, m.last_updated,
+                           (SELECT COUNT(*) FROM faces f WHERE f.file_hash = m.file_hash) AS faces
+                    FROM media_files m WHERE m.file_hash = ANY(%s)
+                ''', (chunk,))
+                rows = {r[0]: r for r in c.fetchall()}
+                c.execute("COMMIT")
+            for file_hash in chunk:
+                self._snapshots[file_hash] = snapshot
+                row = rows.get(file_hash)
+                self.files[file_hash] = {'faces': 0} if row is None else {
+                    'status': row[1], 'detection_status': row[2], 'caption_status': row[3],
+                    'last_updated': row[4], 'faces': row[5],
+                }
+
+    def wait(self, timeout=1.0):
+        """Blocks up to `timeout` seconds for events, applies them, returns the set of tracked hashes that changed."""
+        if not self.conn.notifies:
+            if select.select([self.conn], [], [], timeout) == ([], [], []):
+                return set()
+            self.conn.poll()
+
+        changed = set()
+        while self.conn.notifies:
+            event = json.loads(self.conn.notifies.pop(0).payload)
+            if self._apply(event):
+                changed.add(event['file_hash'])
+        return changed
+
+    def _apply(self, event):
+        state = self.files.get(event['file_hash'])
+        if state is None:
+            return False
+        if 'faces_added' in event:
+            # A delta: skip it if the snapshot this file was loaded from already counted it
+            xmin, xmax, xip = self._snapshots[event['file_hash']]
+            xid = event['xid']
+            if xid < xmin or (xid < xmax and xid not in xip):
+                return False
+            state['faces'] += event['faces_added']
+            return True
+        state.update((k, v) for k, v in event.items() if k != 'file_hash')
+        return True
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
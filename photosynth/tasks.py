@@ -2,6 +2,7 @@ import faiss
 
 from .celery_app import app
 import os
+from concurrent.futures import ThreadPoolExecutor
 import torch
 import numpy as np
 from .pipeline.detector import Detector
@@ -9,8 +10,22 @@ from .pipeline.captioner import Captioner
 from .metadata import MetadataWriter
 from .db import PhotoSynthDB
 from .utils.hashing import calculate_content_hash # <--- NEW IMPORT
+from .utils.media import MediaFrame
+from .utils.video import is_video
 from .utils.paths import heal_path
 from .utils.faiss_manager import get_faiss_manager # <--- NEW IMPORT
+from .utils.near_dup import find_reusable_result, get_near_duplicate_index
+from .utils import face_buffer
+from .utils.face_buffer import get_face_buffer
+from celery.signals import worker_process_shutdown
+
+# --- CONFIGURATION ---
+DETECT_BATCH_SIZE = 16  # files per run_detection_batch message (producers group by this)
+DECODE_THREADS = 4      # read + hash + decode a batch in parallel (cv2/PIL release the GIL)
+
+
+# ---------------------
+
 # Singletons
 detector_instance = None
 captioner_instance = None
@@ -44,32 +59,101 @@ def run_detection_pass(file_path):
     print(f"🔍 DAILY DETECT: {os.path.basename(file_path)}")
     
     db = get_db()
-    file_hash = calculate_content_hash(file_path)
+    # Images are read and decoded once for hashing (on a cache miss) and detection
+    frame = None if is_video(file_path) else MediaFrame.load(file_path)
+    file_hash = calculate_content_hash(file_path, frame=frame)
     
     if not file_hash: return "ERROR_HASH"
     
-    # Check if already done
-    data = db.get_file_data(file_hash)
-    if data and data.get('detection_status') == 'COMPLETED':
-        return "SKIPPED_DONE"
-
     db.register_file(file_hash, file_path)
-    db.update_detection_result(file_hash, 'PROCESSING')
 
-    detector = get_detector()
-    det_results = detector.run_detection(file_path)
+    # Claim the stage (None if already done)
+    if db.begin_stage(file_hash, 'detection') is None:
+        return "SKIPPED_DONE"
 
-    # Save Results
-    db.update_detection_result(file_hash, 'COMPLETED', det_results)
-    
-    # Check if we can finalize (if captioning is already done)
-    # Re-fetch to get latest status
-    data = db.get_file_data(file_hash)
-    if data.get('caption_status') == 'COMPLETED':
+    # Burst shot / re-export / light edit of an analyzed file? Copy its results.
+    donor = find_reusable_result(db, file_hash, file_path, 'detection')
+    if donor:
+        print(f"♻️ Reusing detection of near-duplicate {donor['file_hash']} (distance {donor['distance']})")
+        det_results = donor['data'] or {}
+        ready = db.complete_stage(file_hash, 'detection', det_results, source=donor['file_hash'])
+    else:
+        detector = get_detector()
+        det_results = detector.run_detection(file_path, frame)
+
+        # Embeddings are written once, in binary, to the faces table; detection_data keeps their ids
+        embeddings = det_results.pop('faces', [])
+        if len(embeddings):
+            det_results['face_ids'] = db.store_face_embeddings(file_hash, embeddings)
+
+        # Save Results (True if captioning already finished)
+        ready = db.complete_stage(file_hash, 'detection', det_results)
+    get_near_duplicate_index(db).add(file_hash)
+
+    if ready:
         finalize_file.delay(file_hash)
         
     return f"Detected {len(det_results.get('objects', []))} objects"
 
+def _load_for_detection(file_path):
+    """(file_path, file_hash, frame): images read, hashed and decoded once; frame is None for videos."""
+    frame = None if is_video(file_path) else MediaFrame.load(file_path)
+    file_hash = calculate_content_hash(file_path, frame=frame)
+    if file_hash and frame is not None:
+        try:
+            frame.bgr  # decode now, on this pool thread
+        except Exception:
+            pass  # detect_images reports it
+    return file_path, file_hash, frame
+
+
+@app.task(name='photosynth.tasks.run_detection_batch')
+def run_detection_batch(file_paths):
+    """
+    run_detection_pass for a group of files (up to DETECT_BATCH_SIZE), so the GPU sees batches:
+    - reads, hashes and decodes images on DECODE_THREADS threads;
+    - one YOLO call and one face-recognition pass over all crops (Detector.detect_images);
+      videos still go through the per-file frame sampler;
+    - registration, stage claims and all results (faces + detection_data) are written
+      in a handful of statements, the results in one transaction.
+    """
+    print(f"🔍 BATCH DETECT: {len(file_paths)} files")
+    db = get_db()
+    with ThreadPoolExecutor(DECODE_THREADS) as pool:
+        loaded = {}
+        for file_path, file_hash, frame in pool.map(_load_for_detection, file_paths):
+            if file_hash: loaded.setdefault(file_hash, (file_path, frame))  # same content twice: once
+    if not loaded: return "ERROR_HASH"
+
+    db.batch_register_files([(file_hash, file_path) for file_hash, (file_path, _) in loaded.items()])
+    claimed = db.begin_stages(loaded, 'detection')
+
+    results, images, videos = [], [], []
+    for file_hash in claimed:
+        file_path, frame = loaded[file_hash]
+        # Burst shot / re-export / light edit of an analyzed file? Copy its results.
+        donor = find_reusable_result(db, file_hash, file_path, 'detection')
+        if donor:
+            results.append((file_hash, donor['data'] or {}, [], donor['file_hash']))
+        elif frame is None:
+            videos.append(file_hash)
+        else:
+            images.append(file_hash)
+
+    detector = get_detector()
+    detections = detector.detect_images([loaded[h][1] for h in images])
+    detections += [detector.run_detection(loaded[h][0]) for h in videos]
+    for file_hash, det_results in zip(images + videos, detections):
+        # Embeddings are written once, in binary, to the faces table; detection_data keeps their ids
+        results.append((file_hash, det_results, det_results.pop('faces', []), None))
+
+    ready = db.complete_detections(results)
+    get_near_duplicate_index(db).add_many(claimed)
+    for file_hash in ready:
+        finalize_file.delay(file_hash)
+    return f"Detected {len(images) + len(videos)} files, reused {len(results) - len(images) - len(videos)}, skipped {len(loaded) - len(claimed)}"
+
+
 @app.task(name='photosynth.tasks.run_vlm_captioning')
 def run_vlm_captioning(file_path):
     # Heal path for 5090 context
@@ -79,20 +163,26 @@ def run_vlm_captioning(file_path):
     db = get_db()
     file_hash = calculate_content_hash(file_path)
     
-    # Check if already done
-    data = db.get_file_data(file_hash)
-    if data and data.get('caption_status') == 'COMPLETED':
+    # Claim the stage (None if already done)
+    data = db.begin_stage(file_hash, 'caption')
+    if data is None:
         return "SKIPPED_DONE"
 
-    # Fetch detection context if available
-    import json
-    det_results = {}
-    if data and data.get('detection_data'):
-        try:
-            det_results = json.loads(data['detection_data'])
-        except: pass
-
-    db.update_caption_result(file_hash, 'PROCESSING')
+    # Fetch detection context if available (Postgres JSONB returns dict, not string)
+    det_results = data.get('detection_data') or {}
+    if isinstance(det_results, str):
+        import json
+        det_results = json.loads(det_results)
+
+    # Burst shot / re-export / light edit of a captioned file? Copy its caption.
+    donor = find_reusable_result(db, file_hash, file_path, 'caption')
+    if donor:
+        print(f"♻️ Reusing caption of near-duplicate {donor['file_hash']} (distance {donor['distance']})")
+        ready = db.complete_stage(file_hash, 'caption', donor['data'], source=donor['file_hash'])
+        get_near_duplicate_index(db).add(file_hash)
+        if ready:
+            finalize_file.delay(file_hash)
+        return {"status": "REUSED", "file": file_path, "source": donor['file_hash']}
 
     # CRITICAL: Free VRAM by unloading detector before loading VLM
     global detector_instance
@@ -112,13 +202,11 @@ def run_vlm_captioning(file_path):
         print(f"⚠️ WARNING: No keywords generated for {os.path.basename(file_path)}. Adding fallback.")
         analysis['concepts'] = ["needs_review"]
     
-    # Save Results
-    db.update_caption_result(file_hash, 'COMPLETED', analysis)
+    # Save Results (True if detection already finished)
+    ready = db.complete_stage(file_hash, 'caption', analysis)
+    get_near_duplicate_index(db).add(file_hash)
 
-    # Check if we can finalize (if detection is already done)
-    # Re-fetch to get latest status
-    data = db.get_file_data(file_hash)
-    if data.get('detection_status') == 'COMPLETED':
+    if ready:
         finalize_file.delay(file_hash)
 
     return {"status": "COMPLETED", "file": file_path}
@@ -167,33 +255,42 @@ def finalize_file(file_hash):
 
 
 @app.task(name='photosynth.tasks.extract_faces_task')
-def extract_faces_task(file_path):
+def extract_faces_task(file_path, file_hash=None):
+    """`file_hash`, when the caller already has it, skips re-hashing and lets monitors see the outcome."""
+    try:
+        return _extract_faces(file_path, file_hash)
+    except Exception:
+        if file_hash: get_db().publish_progress(file_hash, harvest='ERROR')
+        raise
+
+
+def _extract_faces(file_path, file_hash):
     detector = get_detector()
-    result = detector._process_image(file_path)
+    frame = MediaFrame.load(file_path)
+    result = detector._process_image(file_path, frame)
     faces_embeddings = result.get('faces', [])
+    db = get_db()
 
     if not faces_embeddings:
+        if file_hash: db.publish_progress(file_hash, harvest='DONE', faces_found=0, faces_new=0)
         return "No faces"
 
     safe_path = heal_path(file_path)
-    file_hash = calculate_content_hash(safe_path)
+    file_hash = file_hash or calculate_content_hash(safe_path, frame=frame)
 
     manager = get_faiss_manager()
-    db = get_db()
     db.register_file(file_hash, safe_path)
 
-    faces_to_save = []
+    # All faces of the image in one search
+    embeddings = np.asarray(faces_embeddings, dtype=np.float32)
+    _, cluster_ids, _ = manager.search_faces(embeddings)
+    known = cluster_ids[:, 0] != -1
 
-    for emb in faces_embeddings:
-        np_emb = np.array(emb, dtype=np.float32)
+    for cluster_id in cluster_ids[known, 0]:
+        print(f"Identified known face (Cluster: {cluster_id}). Skipping embedding save.")
+    faces_to_save = embeddings[~known].tolist()
 
-        matched_id, cluster_id = manager.search_face(np_emb)
-
-        if cluster_id is not None and cluster_id != -1:
-            print(f"Identified known face (Cluster: {cluster_id}). Skipping embedding save.")
-
-        else:
-            faces_to_save.append(np_emb.tolist())
+    db.publish_progress(file_hash, harvest='DONE', faces_found=len(faces_embeddings), faces_new=len(faces_to_save))
 
     if faces_to_save:
         save_faces_task.apply_async(args=[file_hash, safe_path, faces_to_save], queue='db_queue')
@@ -204,16 +301,18 @@ def extract_faces_task(file_path):
 
 @app.task(name='photosynth.tasks.save_faces_task')
 def save_faces_task(file_hash, file_path, embeddings):
-    db = get_db()
-    db.register_file(file_hash, file_path)
-    count = 0
-    for emb in embeddings:
-        import numpy as np
-        arr = np.array(emb, dtype=np.float32)
-        db.add_face(file_hash, arr)
-        count += 1
-    print(f"💾 DB Saved: {count} new faces.")
-    return count
+    # Buffered across tasks; flushed with one binary COPY per FLUSH_SIZE faces / FLUSH_SECONDS.
+    # Acked once buffered: see FaceIngestBuffer for what a hard worker crash loses.
+    pending = get_face_buffer(get_db()).add(file_hash, file_path, embeddings)
+    print(f"💾 Buffered {len(embeddings)} new faces ({pending} pending).")
+    return len(embeddings)
+
+
+@worker_process_shutdown.connect
+def flush_face_buffer(**kwargs):
+    # Don't lose buffered faces on a clean worker shutdown
+    if face_buffer.face_buffer_instance is not None:
+        face_buffer.face_buffer_instance.flush()
 
 
 @app.task(name='photosynth.tasks.run_clustering_task')
@@ -222,12 +321,10 @@ def run_clustering_task(total_embeddings_count):
     db = get_db()
 
     # 1. Load Data
-    all_face_data = db.get_all_embeddings()
-    if not all_face_data:
+    face_ids, embeddings = db.load_embedding_matrix()
+    if len(face_ids) == 0:
         return "No faces to cluster."
 
-    embeddings = np.array([d[1] for d in all_face_data], dtype=np.float32)
-    face_ids = [d[0] for d in all_face_data]
     d = embeddings.shape[1]
     num_samples = len(embeddings)
 
@@ -253,18 +350,10 @@ def run_clustering_task(total_embeddings_count):
     # search() returns the distance (D) and the cluster index (I)
     D, I = kmeans.index.search(embeddings, 1)
 
-    # 5. Prepare Batch Update
-    cluster_map = []
-    for i, cluster_index in enumerate(I):
-        cluster_id = int(cluster_index[0])
-        face_id = face_ids[i]
-        cluster_map.append((cluster_id, face_id))
+    # 5. Update DB (one set-based write); the index is keyed by face_id, so it only needs
+    # faces saved since its last sync, not a rebuild
+    db.assign_clusters(face_ids, I[:, 0])
 
-    # 6. Update DB & Rebuild Index
-    db.update_clusters(cluster_map)
-
-    manager = get_faiss_manager()
-    manager.index = None
-    manager.build_index_if_missing()
+    get_faiss_manager().sync()
 
     return f"Clustered {num_samples} faces into {k} clusters."
\ No newline at end of file
@@ -0,0 +1,120 @@
+import time
+from contextlib import asynccontextmanager
+
+import asyncpg
+
+from photosynth.db import DB_HOST, DB_NAME, DB_USER, DB_PASS, POOL_MAX, POOL_TIMEOUT, HEALTHCHECK_IDLE
+
+# --- CONFIGURATION ---
+FACES_PER_CLUSTER = 10  # representative faces returned by /clusters
+
+
+# ---------------------
+
+class AsyncPhotoSynthDB:
+    """
+    asyncio data access for the FastAPI backend.
+    - One asyncpg pool per process, opened at app startup (open()) and closed on shutdown.
+    - Same size/timeout settings as the sync pool (database.* in settings.yaml).
+    - Endpoints await queries instead of blocking threadpool slots.
+    """
+
+    def __init__(self):
+        self.pool = None
+        self.acquires = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    async def open(self):
+        self.pool = await asyncpg.create_pool(
+            host=DB_HOST,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASS,
+            min_size=1,
+            max_size=POOL_MAX,
+            max_inactive_connection_lifetime=HEALTHCHECK_IDLE * 10,
+        )
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    @asynccontextmanager
+    async def connection(self):
+        start = time.perf_counter()
+        async with self.pool.acquire(timeout=POOL_TIMEOUT) as conn:
+            waited = time.perf_counter() - start
+            self.acquires += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            yield conn
+
+    async def get_clusters(self, per_cluster=FACES_PER_CLUSTER):
+        """[(cluster_id, name, [(face_id, file_path)])] in one round trip (LATERAL top-N per cluster)."""
+        async with self.connection() as conn:
+            rows = await conn.fetch('''
+                SELECT p.cluster_id, p.name, top.face_id, top.file_path
+                FROM people p
+                LEFT JOIN LATERAL (
+                    SELECT f.face_id, m.file_path
+                    FROM faces f
+                    JOIN media_files m ON f.file_hash = m.file_hash
+                    WHERE f.cluster_id = p.cluster_id
+                    LIMIT $1
+                ) top ON TRUE
+                ORDER BY p.cluster_id
+            ''', per_cluster)
+
+        clusters = {}
+        for row in rows:
+            _, _, faces = clusters.setdefault(row['cluster_id'], (row['cluster_id'], row['name'], []))
+            if row['face_id'] is not None:
+                faces.append((row['face_id'], row['file_path']))
+        return list(clusters.values())
+
+    async def tag_cluster(self, cluster_id, name):
+        """Renames a cluster, or merges it into the cluster that already has `name`."""
+        async with self.connection() as conn:
+            async with conn.transaction():
+                target_id = await conn.fetchval(
+                    "SELECT cluster_id FROM people WHERE name = $1 AND cluster_id != $2", name, cluster_id
+                )
+                if target_id is not None:
+                    await conn.execute("UPDATE faces SET cluster_id = $1 WHERE cluster_id = $2", target_id, cluster_id)
+                    await conn.execute("DELETE FROM people WHERE cluster_id = $1", cluster_id)
+                    return {"status": "merged", "target_id": target_id}
+
+                await conn.execute("UPDATE people SET name = $1 WHERE cluster_id = $2", name, cluster_id)
+                return {"status": "success"}
+
+    async def get_counters(self):
+        """Trigger-maintained counts (see PhotoSynthDB.get_counters): O(1) instead of COUNT(*) scans."""
+        async with self.connection() as conn:
+            rows = await conn.fetch("SELECT metric, value, SUM(count) AS n FROM pipeline_counters GROUP BY metric, value HAVING SUM(count) <> 0")
+        counters = {}
+        for row in rows:
+            counters.setdefault(row['metric'], {})[row['value']] = int(row['n'])
+        return counters
+
+    def metrics(self):
+        n = self.acquires or 1
+        return {
+            "max": self.pool.get_max_size() if self.pool else POOL_MAX,
+            "open": self.pool.get_size() if self.pool else 0,
+            "idle": self.pool.get_idle_size() if self.pool else 0,
+            "checkouts": self.acquires,
+            "wait_ms_avg": 1000 * self.wait_total / n,
+            "wait_ms_max": 1000 * self.wait_max,
+        }
+
+
+async_db_instance = None
+
+
+def get_async_db():
+    global async_db_instance
+    if async_db_instance is None:
+        async_db_instance = AsyncPhotoSynthDB()
+    return async_db_instance
@@ -0,0 +1,124 @@
+import threading
+import time
+
+# --- CONFIGURATION ---
+FLUSH_SIZE = 5000    # embeddings per COPY
+FLUSH_SECONDS = 5.0  # max age of a buffered embedding
+MAX_FLUSH_RETRIES = 5  # failed whole-buffer flushes (one per FLUSH_SECONDS) before writing file by file
+
+
+# ---------------------
+
+class FaceIngestBuffer:
+    """
+    Accumulates face embeddings from many save_faces_task calls (db_queue worker)
+    and writes them with one binary COPY when FLUSH_SIZE faces are pending or the
+    oldest is FLUSH_SECONDS old.
+    - Files are registered (batch upsert) before their faces, in the same flush.
+    - A failed flush keeps the rows buffered and is retried by the timer. After
+      MAX_FLUSH_RETRIES failures each file is written on its own; files that still
+      fail are dropped and logged, so one bad file cannot hold back the rest and the
+      buffer cannot grow without bound during an outage.
+    - save_faces_task is acked when its faces are buffered, not written: a worker that
+      dies without a clean shutdown (kill -9, OOM, power loss) loses up to flush_size
+      faces / FLUSH_SECONDS of tasks. Those files are already registered, so scan_faces
+      skips them; they need a re-harvest (delete their media_files rows and rescan).
+    """
+
+    def __init__(self, db, flush_size=FLUSH_SIZE, flush_seconds=FLUSH_SECONDS):
+        self.db = db
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self._files = {}  # file_hash -> file_path
+        self._faces = []  # [(file_hash, embedding)]
+        self._oldest = None
+        self._failures = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+
+    def add(self, file_hash, file_path, embeddings):
+        """Buffers embeddings for one file. Returns the number of faces now pending."""
+        with self._lock:
+            self._files[file_hash] = file_path
+            self._faces.extend((file_hash, emb) for emb in embeddings)
+            if self._oldest is None:
+                self._oldest = time.time()
+            pending = len(self._faces)
+
+        self._ensure_flusher()
+        # While flushes fail, only the timer retries (one attempt per flush_seconds)
+        if pending >= self.flush_size and not self._failures:
+            self.flush()
+        return pending
+
+    def flush(self):
+        """Writes everything pending. Returns the number of faces written."""
+        with self._flush_lock:
+            with self._lock:
+                files, faces = self._files, self._faces
+                self._files, self._faces, self._oldest = {}, [], None
+            if not files and not faces: return 0
+
+            try:
+                written = self._write(files, faces)
+            except Exception as e:
+                self._failures += 1
+                if self._failures < MAX_FLUSH_RETRIES:
+                    print(f"❌ Face flush failed ({len(faces)} faces kept, attempt {self._failures}/{MAX_FLUSH_RETRIES}): {e}")
+                    with self._lock:
+                        self._files = {**files, **self._files}
+                        self._faces = faces + self._faces
+                        self._oldest = self._oldest or time.time()
+                    return 0
+                print(f"❌ Face flush failed {self._failures} times, writing file by file: {e}")
+                written = self._write_per_file(files, faces)
+            self._failures = 0
+
+        print(f"💾 DB Saved: {written} new faces for {len(files)} files (COPY).")
+        return written
+
+    def _write(self, files, faces):
+        self.db.batch_register_files(list(files.items()))
+        return self.db.add_faces_bulk(faces)
+
+    def _write_per_file(self, files, faces):
+        """Writes each file's faces separately; drops (and logs) the files that fail."""
+        by_file = {}
+        for file_hash, emb in faces:
+            by_file.setdefault(file_hash, []).append((file_hash, emb))
+
+        written = 0
+        for file_hash, file_path in files.items():
+            rows = by_file.get(file_hash, [])
+            try:
+                written += self._write({file_hash: file_path}, rows)
+            except Exception as e:
+                print(f"❌ Dropped {len(rows)} faces of {file_path} ({file_hash}): {e}")
+        return written
+
+    def _ensure_flusher(self):
+        # Started lazily so each Celery prefork child runs its own timer
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._run, daemon=True)
+            self._flusher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(min(1.0, self.flush_seconds))
+            oldest = self._oldest
+            if oldest is not None and time.time() - oldest >= self.flush_seconds:
+                self.flush()
+
+    def pending(self):
+        return len(self._faces)
+
+
+face_buffer_instance = None
+
+
+def get_face_buffer(db):
+    global face_buffer_instance
+    if face_buffer_instance is None:
+        face_buffer_instance = FaceIngestBuffer(db)
+    return face_buffer_instance
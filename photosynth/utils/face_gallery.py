@@ -0,0 +1,111 @@
+import time
+
+import numpy as np
+
+from photosynth.db import PhotoSynthDB
+
+# --- CONFIGURATION ---
+MATCH_THRESHOLD = 0.55       # cosine similarity for a face to take a person's name
+MAX_EXEMPLARS = 32           # faces kept per person next to the centroid (spread over face_id order)
+VERSION_CHECK_SECONDS = 5.0  # identify() asks the DB for cluster_version at most this often
+
+
+# ---------------------
+
+def _unit_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def build_gallery(person_ids, embeddings, max_exemplars=MAX_EXEMPLARS):
+    """
+    Gallery rows for faces labelled with person_ids (int array, one per embedding).
+    Returns (matrix float32[rows, d] with unit rows, row_person int32[rows]): per person its
+    centroid plus up to max_exemplars of its faces, evenly spaced through the given order.
+    """
+    if len(person_ids) == 0:
+        return np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=np.int32)
+    embeddings = _unit_rows(embeddings)
+    order = np.argsort(person_ids, kind='stable')
+    people, starts = np.unique(person_ids[order], return_index=True)
+    ends = np.append(starts[1:], len(order))
+
+    rows, row_person = [], []
+    for person, start, end in zip(people.tolist(), starts.tolist(), ends.tolist()):
+        faces = embeddings[order[start:end]]
+        picks = np.unique(np.linspace(0, len(faces) - 1, min(len(faces), max_exemplars)).astype(np.int64))
+        rows.append(faces.mean(axis=0, keepdims=True))
+        rows.append(faces[picks])
+        row_person.append(np.full(1 + len(picks), person, dtype=np.int32))
+    return _unit_rows(np.concatenate(rows)), np.concatenate(row_person)
+
+
+class KnownFaceGallery:
+    """
+    Clustered people's faces in memory, for Detector._identify_faces.
+    - One matrix of unit rows (per person: centroid + exemplars, see build_gallery), so all
+      faces of an image or video frame are matched with one matrix multiply.
+    - Shared by every detection in the process; reloaded only when the DB's cluster_version
+      moved (re-clustering, UI merges and renames), checked at most every VERSION_CHECK_SECONDS.
+    """
+
+    def __init__(self, db=None):
+        self.db = db
+        self.version = None
+        self.last_check = 0.0
+        # (matrix, row_person, names): swapped as one tuple so a reload never tears a lookup
+        self._gallery = (np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=np.int32), [])
+
+    def __len__(self):
+        return len(self._gallery[1])
+
+    def refresh(self, force=False):
+        """Reloads from the DB if cluster_version changed. Returns True when it reloaded."""
+        now = time.time()
+        if not force and now - self.last_check < VERSION_CHECK_SECONDS:
+            return False
+        self.last_check = now
+        if self.db is None: self.db = PhotoSynthDB()
+        if not force and self.db.get_cluster_version() == self.version:
+            return False
+
+        cluster_names, cluster_ids, embeddings, version = self.db.load_known_faces()
+        # Keyed by name, not cluster: clusters that share a name are one person. Each unnamed
+        # cluster is its own person (name None): it can win a match but is never reported.
+        names, person_of_name, person_of_cluster = [], {}, {}
+        for c, n in sorted(cluster_names.items()):
+            if n is None or n == 'Unknown':
+                person_of_cluster[c] = len(names)
+                names.append(None)
+                continue
+            if n not in person_of_name:
+                person_of_name[n] = len(names)
+                names.append(n)
+            person_of_cluster[c] = person_of_name[n]
+        person_ids = np.fromiter((person_of_cluster[c] for c in cluster_ids.tolist()), dtype=np.int32, count=len(cluster_ids))
+        matrix, row_person = build_gallery(person_ids, embeddings)
+        self._gallery = (matrix, row_person, names)
+        self.version = version
+        return True
+
+    def identify(self, embeddings):
+        """Names of the named people among `embeddings` (one per detected face), in first-seen order."""
+        self.refresh()
+        matrix, row_person, names = self._gallery
+        if len(embeddings) == 0 or len(row_person) == 0:
+            return []
+        scores = _unit_rows(embeddings) @ matrix.T
+        best = scores.argmax(axis=1)
+        matched = scores[np.arange(len(best)), best] > MATCH_THRESHOLD
+        return list(dict.fromkeys(names[p] for p in row_person[best[matched]].tolist() if names[p] is not None))
+
+
+face_gallery_instance = None
+
+
+def get_face_gallery():
+    global face_gallery_instance
+    if face_gallery_instance is None:
+        face_gallery_instance = KnownFaceGallery()
+    return face_gallery_instance
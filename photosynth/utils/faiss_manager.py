@@ -1,114 +1,510 @@
 import faiss
+import fcntl
 import numpy as np
 import os
+import struct
+from contextlib import contextmanager
 from pathlib import Path
-from photosynth.db import PhotoSynthDB
+from photosynth.db import PhotoSynthDB, config
 import time
 
 # --- CONFIGURATION ---
 INDEX_DIR = Path(os.path.expanduser("~/.photosynth/"))
-INDEX_FILE = INDEX_DIR / "face_index.faiss"
-ID_MAP_FILE = INDEX_DIR / "face_id_map.npy"
-SIMILARITY_THRESHOLD = 0.7
+SNAPSHOT_GLOB = "face_index.*.faiss"  # face_index.<generation>.faiss, newest wins
+LOG_NAME = "face_index.log"           # adds/removes since the snapshot
+LOCK_NAME = "face_index.lock"         # serializes log appends and compaction across worker processes
+SYNC_SECONDS = 5.0     # search_face pulls newly saved faces at most this often
+COMPACT_MIN = 10000    # logged vectors before compaction is considered...
+COMPACT_RATIO = 0.25   # ...then compact once the log holds this fraction of the index
+# Query batches at least this large are scored with one BLAS matrix product (search_faces).
+# Recent FAISS builds default to 128000, which keeps per-image batches on the one-query-at-a-time path.
+BLAS_MIN_QUERIES = 20
+
+# Index type (settings.yaml face_index); see choose_index_type()
+_index_cfg = config.get('face_index', {})
+INDEX_TYPE = _index_cfg.get('type', 'auto')
+MEMORY_BUDGET = _index_cfg.get('memory_budget_mb', 4096) * 1024 * 1024
+FLAT_MAX = _index_cfg.get('flat_max', 200000)  # exact search up to this many faces
+NPROBE = _index_cfg.get('nprobe', 32)
+HNSW_M = _index_cfg.get('hnsw_m', 32)
+EF_SEARCH = _index_cfg.get('ef_search', 128)
+# Cosine similarity at which a new face counts as an already known (clustered) face
+SIMILARITY_THRESHOLD = _index_cfg.get('similarity_threshold', 0.55)
+TRAIN_PER_LIST = 64   # IVF k-means training sample per inverted list
+RETRAIN_GROWTH = 4    # retrain an IVF index once the right nlist is this multiple of its own
+
+LOG_HEADER = struct.Struct('<q')    # snapshot generation the log applies to
+LOG_RECORD = struct.Struct('<cII')  # op (b'A' add / b'R' remove), n, dim; then n int64 ids (+ n*dim float32)
 
 
 # ---------------------
 
+faiss.cvar.distance_compute_blas_threshold = BLAS_MIN_QUERIES
+
+
+def l2_normalized(vectors):
+    """float32 copy with unit-length rows, so inner product is cosine similarity."""
+    vectors = np.array(vectors, dtype=np.float32, order='C', ndmin=2)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def ivf_nlist(ntotal):
+    """Inverted lists for an IVF index of ntotal vectors: ~4*sqrt(N), a power of two, each trainable."""
+    nlist = 2 ** int(round(np.log2(4 * np.sqrt(max(ntotal, 1)))))
+    return int(max(1, min(nlist, 65536, ntotal // 39)))
+
+
+def bytes_per_vector(kind, dim):
+    """Approximate resident bytes per indexed face."""
+    return {
+        'flat': 4 * dim + 48,               # float32 vector + IndexIDMap2 id map and reverse map
+        'hnsw': 4 * dim + 8 * HNSW_M + 48,  # + ~2*M int32 graph links
+        'ivf_flat': 4 * dim + 8,            # float32 vector + id in its inverted list
+        'ivf_sq8': dim + 8,                 # one byte per dimension
+        'ivf_pq': dim // 4 + 8,             # one byte per 4-dimension subvector
+    }[kind]
+
+
+def choose_index_type(ntotal, dim, index_type=None, memory_budget=None):
+    """
+    Index kind for ntotal faces: the configured type, or for 'auto' exact flat search up
+    to FLAT_MAX faces, then the most accurate IVF variant that fits the memory budget.
+    """
+    index_type = index_type or INDEX_TYPE
+    if index_type != 'auto':
+        return index_type
+    budget = memory_budget or MEMORY_BUDGET
+    fits = lambda kind: ntotal * bytes_per_vector(kind, dim) <= budget
+    if ntotal <= FLAT_MAX and fits('flat'):
+        return 'flat'
+    return next((kind for kind in ('ivf_flat', 'ivf_sq8') if fits(kind)), 'ivf_pq')
+
+
+def index_spec(kind, dim, ntotal):
+    """faiss.index_factory string; flat and HNSW are wrapped in IDMap2, IVF keeps face_ids in its lists."""
+    if kind == 'flat':
+        return "IDMap2,Flat"
+    if kind == 'hnsw':
+        return f"IDMap2,HNSW{HNSW_M}"
+    nlist = ivf_nlist(ntotal)
+    return {
+        'ivf_flat': f"IVF{nlist},Flat",
+        'ivf_sq8': f"IVF{nlist},SQ8",
+        # 4-dim subvectors: at 8 dims, quantization noise flips ~1/3 of threshold decisions
+        'ivf_pq': f"IVF{nlist},PQ{dim // 4}",
+    }[kind]
+
+
+def index_kind(index):
+    """Kind of an index built by build_index() (or loaded from its snapshot)."""
+    if isinstance(index, faiss.IndexIDMap2):
+        index = faiss.downcast_index(index.index)
+    for cls, kind in ((faiss.IndexFlat, 'flat'), (faiss.IndexHNSWFlat, 'hnsw'), (faiss.IndexIVFFlat, 'ivf_flat'),
+                      (faiss.IndexIVFScalarQuantizer, 'ivf_sq8'), (faiss.IndexIVFPQ, 'ivf_pq')):
+        if isinstance(index, cls):
+            return kind
+    raise ValueError(f"Unsupported face index type: {type(index).__name__}")
+
+
+def tune_index(index):
+    """Applies the configured search-time parameters (nprobe / efSearch)."""
+    kind = index_kind(index)
+    if kind.startswith('ivf'):
+        faiss.ParameterSpace().set_index_parameter(index, 'nprobe', NPROBE)
+    elif kind == 'hnsw':
+        faiss.ParameterSpace().set_index_parameter(index, 'efSearch', EF_SEARCH)
+    return index
+
+
+def build_index(kind, embeddings, face_ids):
+    """
+    New index of `kind` holding (unit-length) embeddings keyed by face_id. IVF kinds are
+    trained on a random sample of TRAIN_PER_LIST vectors per inverted list.
+    """
+    dim = embeddings.shape[1]
+    index = faiss.index_factory(dim, index_spec(kind, dim, len(face_ids)), faiss.METRIC_INNER_PRODUCT)
+    if not index.is_trained:
+        n_train = min(len(embeddings), TRAIN_PER_LIST * faiss.extract_index_ivf(index).nlist)
+        sample = np.random.default_rng(0).choice(len(embeddings), n_train, replace=False)
+        index.train(embeddings[np.sort(sample)])
+    index.add_with_ids(embeddings, face_ids)
+    return tune_index(index)
+
+
+def index_ids(index):
+    """face_ids held by an index."""
+    if isinstance(index, faiss.IndexIDMap2):
+        return faiss.vector_to_array(index.id_map)
+    invlists = faiss.extract_index_ivf(index).invlists
+    ids = [faiss.rev_swig_ptr(invlists.get_ids(l), size).copy()
+           for l in range(invlists.nlist) if (size := invlists.list_size(l))]
+    return np.concatenate(ids) if ids else np.empty(0, dtype=np.int64)
+
+
 class FAISSManager:
-    def __init__(self):
+    """
+    Face search index (ids = faces.face_id, unit-length vectors so scores are cosine
+    similarity), kept current incrementally instead of rebuilt.
+    - The index type follows the face count (choose_index_type): exact flat search for
+      small libraries, IVF-Flat / SQ8 / PQ beyond FLAT_MAX or the memory budget. sync()
+      rebuilds into a new type (or retrains IVF lists) when the count outgrows the current one.
+    - add_faces() / remove_faces() update it in place and append to the log.
+    - sync() pulls faces saved elsewhere (db_queue workers) above a face_id watermark and
+      reconciles ids when the face counter shows a delete or a late commit below it.
+    - On disk: a snapshot plus the log since; startup loads the snapshot and replays the
+      log. compact() folds the log into a new snapshot once it is COMPACT_RATIO of the index.
+    - Searches use a GPU copy when one is available; adds go to both, removals re-upload it.
+    - face_id -> cluster_id lives in memory (cluster_of, a dense int32 array indexed by
+      face_id), so a match costs no DB round trip. sync() reloads it whenever the DB's
+      cluster_version moved (re-clustering, UI merges).
+    """
+
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_dir = Path(index_dir)
+        self.log_file = self.index_dir / LOG_NAME
         self.index = None
-        self.face_id_map = None
-        INDEX_DIR.mkdir(parents=True, exist_ok=True)
+        self.generation = 0
+        self.watermark = 0  # highest face_id in the index
+        self.last_sync = 0.0
+        self.cluster_of = np.empty(0, dtype=np.int32)
+        self.cluster_version = None
+        self._gpu_res = None
+        self._gpu_index = None
+        self.index_dir.mkdir(parents=True, exist_ok=True)
         self._load_index()
 
-    def _load_index(self):
-        """Loads the index and ID map from disk."""
-        if INDEX_FILE.exists() and ID_MAP_FILE.exists():
+    def _snapshot_path(self, generation):
+        return self.index_dir / f"face_index.{generation}.faiss"
+
+    def _disk_generation(self):
+        gens = [p.name.split('.')[1] for p in self.index_dir.glob(SNAPSHOT_GLOB)]
+        return max((int(g) for g in gens if g.isdigit()), default=0)
+
+    @contextmanager
+    def _locked(self):
+        with open(self.index_dir / LOCK_NAME, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
             try:
-                self.index = faiss.read_index(str(INDEX_FILE))
-                self.face_id_map = np.load(ID_MAP_FILE)
-
-                # Move index to GPU immediately upon loading (for the 5090 worker)
-                if faiss.get_num_gpus() > 0:
-                    res = faiss.StandardGpuResources()
-                    self.index = faiss.index_cpu_to_gpu(res, 0, self.index)
-                    print(f"FAISS index loaded and moved to GPU 0 (5090/3090).")
-
-                print(f"Loaded FAISS index with {self.index.ntotal} vectors.")
-                return True
-            except Exception as e:
-                print(f"Error loading FAISS index: {e}. Rebuilding...")
-                self.index = None
-                return False
-        return False
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _ids(self):
+        return index_ids(self.index)
+
+    def _load_index(self):
+        """Loads the newest snapshot and replays the log on top of it."""
+        try:
+            with self._locked():
+                generation = self._disk_generation()
+                if generation == 0:
+                    return False
+                index = faiss.read_index(str(self._snapshot_path(generation)))
+                if index_kind(index) == 'flat' and index.ntotal and \
+                        abs(np.linalg.norm(index.index.reconstruct(0)) - 1) > 1e-3:
+                    print("FAISS snapshot holds unnormalized embeddings. Rebuilding...")
+                    return False
+                self._use_snapshot(index, generation)
+                replayed = self._replay_log()
+        except Exception as e:
+            print(f"Error loading FAISS index: {e}. Rebuilding...")
+            self.index = None
+            return False
+
+        ids = self._ids()
+        self.watermark = int(ids.max()) if len(ids) else 0
+        print(f"Loaded FAISS index with {self.index.ntotal} vectors ({replayed} log entries replayed).")
+        return True
+
+    def _use_snapshot(self, index, generation):
+        self.index = tune_index(index)
+        self.generation = generation
+        self._gpu_index = None
+
+    def _catch_up(self):
+        """
+        Caller holds the lock. Takes in what sibling processes wrote: a newer snapshot
+        generation (their compact()) replaces the in-memory index, then the log is replayed.
+        Our own adds and removals are in that snapshot or log, so nothing is lost.
+        """
+        generation = self._disk_generation()
+        if generation > self.generation:
+            self._use_snapshot(faiss.read_index(str(self._snapshot_path(generation))), generation)
+        replayed = self._replay_log()
+        ids = self._ids()
+        self.watermark = max(self.watermark, int(ids.max()) if len(ids) else 0)
+        self._grow_cluster_map(self.watermark)
+        return replayed
+
+    def _replay_log(self):
+        """
+        Applies the log's net effect (last op per face_id wins; ids already in the snapshot
+        are skipped, since several worker processes may log the same faces). A log from an
+        older generation is reset, and a torn final record is truncated so appends stay aligned.
+        """
+        data = self.log_file.read_bytes() if self.log_file.exists() else b''
+        if len(data) < LOG_HEADER.size or LOG_HEADER.unpack_from(data)[0] != self.generation:
+            self.log_file.write_bytes(LOG_HEADER.pack(self.generation))
+            return 0
+
+        added, removed = {}, set()
+        pos = LOG_HEADER.size
+        while pos + LOG_RECORD.size <= len(data):
+            op, n, dim = LOG_RECORD.unpack_from(data, pos)
+            ids_at = pos + LOG_RECORD.size
+            end = ids_at + 8 * n + (4 * n * dim if op == b'A' else 0)
+            if end > len(data): break
+            ids = np.frombuffer(data, dtype='<i8', count=n, offset=ids_at)
+            if op == b'A':
+                vectors = np.frombuffer(data, dtype='<f4', count=n * dim, offset=ids_at + 8 * n).reshape(n, dim)
+                for face_id, vector in zip(ids.tolist(), vectors):
+                    added[face_id] = vector
+                    removed.discard(face_id)
+            else:
+                for face_id in ids.tolist():
+                    added.pop(face_id, None)
+                    removed.add(face_id)
+            pos = end
+        if pos < len(data):
+            with open(self.log_file, 'r+b') as f:
+                f.truncate(pos)
+
+        if removed:
+            self._remove_ids(np.fromiter(removed, dtype=np.int64, count=len(removed)))
+        if added:
+            ids = np.fromiter(added, dtype=np.int64, count=len(added))
+            ids = ids[~np.isin(ids, self._ids())]
+            if len(ids):
+                self.index.add_with_ids(np.stack([added[i] for i in ids.tolist()]), ids)
+        return len(added) + len(removed)
+
+    def _append_log(self, op, face_ids, embeddings=None):
+        dim = embeddings.shape[1] if embeddings is not None else 0
+        with self._locked():
+            with open(self.log_file, 'ab') as f:
+                if f.tell() == 0:
+                    f.write(LOG_HEADER.pack(self.generation))
+                f.write(LOG_RECORD.pack(op, len(face_ids), dim))
+                f.write(face_ids.astype('<i8').tobytes())
+                if embeddings is not None:
+                    f.write(embeddings.astype('<f4').tobytes())
+                log_bytes = f.tell()
+
+        logged = log_bytes // (8 + 4 * self.index.d)  # ~vectors in the log, from any process
+        if logged >= max(COMPACT_MIN, COMPACT_RATIO * self.index.ntotal):
+            self.compact()
+
+    def compact(self, catch_up=True):
+        """
+        Writes the in-memory index as a new snapshot generation and starts an empty log.
+        - catch_up: first fold in other processes' snapshot and log entries (see _catch_up),
+          so the snapshot doesn't drop their adds. rebuild() skips it: its index comes
+          straight from the DB.
+        """
+        if self.index is None: return
+        with self._locked():
+            if catch_up:
+                self._catch_up()
+            generation = max(self.generation, self._disk_generation()) + 1
+            snapshot = self._snapshot_path(generation)
+            tmp = snapshot.with_suffix('.tmp')
+            faiss.write_index(self.index, str(tmp))
+            os.replace(tmp, snapshot)
+            # A crash before this rewrite leaves an older-generation log, which load ignores
+            self.log_file.write_bytes(LOG_HEADER.pack(generation))
+            for path in self.index_dir.glob(SNAPSHOT_GLOB):
+                if path != snapshot:
+                    path.unlink(missing_ok=True)
+            self.generation = generation
+        print(f"FAISS Index saved to disk. Total faces: {self.index.ntotal}")
 
     def build_index_if_missing(self):
-        """Builds index from DB if index file doesn't exist or load fails."""
+        """Builds index from DB if no snapshot could be loaded."""
         if self.index:
             return
+        self.rebuild()
 
+    def rebuild(self):
+        """Builds the index from the DB, as the type chosen for the current face count, and snapshots it."""
         print("Starting FAISS index rebuild from PostgreSQL...")
         db = PhotoSynthDB()
-        face_data = db.get_all_embeddings()
+        face_ids, embeddings = db.load_embedding_matrix()
+        self.last_sync = time.time()
 
-        if not face_data:
+        if len(face_ids) == 0:
             print("No faces found in DB. Index not built.")
             return
 
-        self.face_id_map = np.array([d[0] for d in face_data], dtype=np.int64)
-        embeddings = np.array([d[1] for d in face_data], dtype=np.float32)
+        embeddings = l2_normalized(embeddings)
+        kind = choose_index_type(len(face_ids), embeddings.shape[1])
+        index = build_index(kind, embeddings, face_ids)
+        self.index = index
+        self._gpu_index = None
+        self.watermark = int(face_ids.max())
+        self.compact(catch_up=False)
+        print(f"FAISS Index successfully built with {index.ntotal} vectors ({index_spec(kind, index.d, index.ntotal)}).")
 
-        d = embeddings.shape[1]
-        index = faiss.IndexFlatIP(d)
+    def _outgrown(self):
+        """True when the face count calls for another index type, or for retrained IVF lists."""
+        kind = index_kind(self.index)
+        wanted = choose_index_type(self.index.ntotal, self.index.d)
+        if kind != wanted:
+            # Hysteresis: deletes alone don't send an IVF index back to flat
+            return not (wanted == 'flat' and self.index.ntotal > FLAT_MAX // 2)
+        if kind.startswith('ivf'):
+            return ivf_nlist(self.index.ntotal) >= RETRAIN_GROWTH * faiss.extract_index_ivf(self.index).nlist
+        return False
 
-        index.add(embeddings)
-        if faiss.get_num_gpus() > 0:
-            res = faiss.StandardGpuResources()
-            index = faiss.index_cpu_to_gpu(res, 0, index)
-            print(f"FAISS index built and moved to GPU 0.")
+    def add_faces(self, face_ids, embeddings):
+        """Adds vectors keyed by face_id (ids already indexed are skipped). Returns the number added."""
+        face_ids = np.asarray(face_ids, dtype=np.int64)
+        if len(face_ids) == 0: return 0
+        embeddings = l2_normalized(np.asarray(embeddings, dtype=np.float32).reshape(len(face_ids), -1))
+        if self.index is None:
+            self.index = faiss.index_factory(embeddings.shape[1], index_spec('flat', embeddings.shape[1], 0),
+                                             faiss.METRIC_INNER_PRODUCT)
+        elif face_ids.min() <= self.watermark:
+            keep = ~np.isin(face_ids, self._ids())
+            face_ids, embeddings = face_ids[keep], embeddings[keep]
+            if len(face_ids) == 0: return 0
 
-        self.index = index
-        self._save_index()
-        print(f"FAISS Index successfully built with {index.ntotal} vectors.")
+        self.index.add_with_ids(embeddings, face_ids)
+        if self._gpu_index is not None:
+            self._gpu_index.add_with_ids(embeddings, face_ids)
+        self.watermark = max(self.watermark, int(face_ids.max()))
+        self._grow_cluster_map(self.watermark)
+        self.cluster_of[face_ids] = -1  # new faces are unclustered until cluster_version says otherwise
+        self._append_log(b'A', face_ids, embeddings)
+        return len(face_ids)
 
-    def _save_index(self):
-        """Saves the index and ID map to disk."""
-        if self.index:
-            index_to_save = self.index
-            if faiss.get_num_gpus() > 0:
-                index_to_save = faiss.index_gpu_to_cpu(self.index)
+    def remove_faces(self, face_ids):
+        """Drops vectors of deleted faces. Returns the number removed."""
+        if self.index is None: return 0
+        face_ids = np.asarray(face_ids, dtype=np.int64)
+        removed = self._remove_ids(face_ids)
+        self.cluster_of[face_ids[face_ids < len(self.cluster_of)]] = -1
+        if removed:
+            self._gpu_index = None  # GPU indexes can't remove; re-uploaded on the next search
+            self._append_log(b'R', face_ids)
+        return removed
 
-            faiss.write_index(index_to_save, str(INDEX_FILE))
-            np.save(ID_MAP_FILE, self.face_id_map)
-            print(f"FAISS Index saved to disk. Total faces: {self.index.ntotal}")
+    def _remove_ids(self, face_ids):
+        if index_kind(self.index) != 'hnsw':
+            return self.index.remove_ids(face_ids)
+        # HNSW graphs can't drop nodes: rebuild from the stored vectors that remain
+        ids = self._ids()
+        keep = ~np.isin(ids, face_ids)
+        if keep.all():
+            return 0
+        vectors = self.index.index.reconstruct_n(0, self.index.ntotal)
+        self.index = build_index('hnsw', vectors[keep], ids[keep])
+        return int((~keep).sum())
 
-    def search_face(self, query_embedding, k=1):
+    def sync(self):
         """
-        Searches the index for the nearest neighbor.
-        Returns (matched_face_id, cluster_id) if similarity > threshold.
+        Catches up with faces saved or deleted, and clusters changed, since the last sync.
+        Returns vectors added/removed.
+        - Pulls faces above the watermark: O(new faces).
+        - If the index then disagrees with the trigger-kept face count (a delete, or an insert
+          that committed after a higher face_id was pulled), diffs ids: O(N) ids, no embeddings.
+        - Reloads the cluster map only if cluster_version changed.
         """
+        self.last_sync = time.time()
+        db = PhotoSynthDB()
         if self.index is None:
             self.build_index_if_missing()
-            if self.index is None: return None, None
+            changed = self.index.ntotal if self.index else 0
+        else:
+            face_ids, embeddings, total = db.load_faces_after(self.watermark)
+            changed = self.add_faces(face_ids, embeddings)
+            if self.index.ntotal != total:
+                changed += self._reconcile(db)
+            if self._outgrown():
+                self._reshape()
+
+        if db.get_cluster_version() != self.cluster_version:
+            self._load_clusters(db)
+        return changed
+
+    def _reshape(self):
+        # Another worker may already have rebuilt it: load its snapshot instead of rebuilding again
+        if self._disk_generation() > self.generation and self._load_index() and not self._outgrown():
+            return
+        self.rebuild()
 
-        query = query_embedding.astype(np.float32).reshape(1, -1)
-        D, I = self.index.search(query, k)
+    def _load_clusters(self, db):
+        face_ids, cluster_ids, version = db.get_cluster_assignments()
+        self.cluster_of = np.full(max(self.watermark, int(face_ids.max(initial=0))) + 1, -1, dtype=np.int32)
+        self.cluster_of[face_ids] = cluster_ids
+        self.cluster_version = version
 
-        similarity_score = D[0][0]
-        faiss_index = I[0][0]
+    def _grow_cluster_map(self, max_face_id):
+        if max_face_id >= len(self.cluster_of):
+            # Geometric growth: steady trickles of new faces don't copy the map every sync
+            grown = np.full(max(max_face_id + 1, 2 * len(self.cluster_of)), -1, dtype=np.int32)
+            grown[:len(self.cluster_of)] = self.cluster_of
+            self.cluster_of = grown
 
-        if faiss_index != -1 and similarity_score >= SIMILARITY_THRESHOLD:
-            matched_face_id = self.face_id_map[faiss_index]
+    def cluster_of_face(self, face_id):
+        """cluster_id of an indexed face from the in-memory map (-1 = unclustered)."""
+        face_id = int(face_id)
+        return int(self.cluster_of[face_id]) if 0 <= face_id < len(self.cluster_of) else -1
 
-            db = PhotoSynthDB()
-            conn = db.get_connection()
-            with conn.cursor() as c:
-                c.execute("SELECT cluster_id FROM faces WHERE face_id=%s", (matched_face_id,))
-                cluster_id = c.fetchone()[0]
-            conn.close()
+    def _reconcile(self, db):
+        db_ids = db.get_face_ids(max_face_id=self.watermark)
+        ours = self._ids()
+        extra = np.setdiff1d(ours, db_ids, assume_unique=True)
+        missing = np.setdiff1d(db_ids, ours, assume_unique=True)
+        removed = self.remove_faces(extra) if len(extra) else 0
+        added = 0
+        if len(missing):
+            face_ids, embeddings = db.load_embedding_matrix(face_ids=missing)
+            added = self.add_faces(face_ids, embeddings)
+        print(f"FAISS index reconciled: +{added} late faces, -{removed} deleted faces.")
+        return added + removed
 
-            return matched_face_id, cluster_id
+    def _searcher(self):
+        """GPU copy of the index when a GPU is available, else the index itself."""
+        # FAISS has no GPU HNSW, and GPU IVF-PQ stops at 96 sub-quantizers
+        if faiss.get_num_gpus() == 0 or index_kind(self.index) in ('hnsw', 'ivf_pq'):
+            return self.index
+        if self._gpu_index is None:
+            if self._gpu_res is None:
+                self._gpu_res = faiss.StandardGpuResources()
+            self._gpu_index = faiss.index_cpu_to_gpu(self._gpu_res, 0, self.index)
+        return self._gpu_index
 
+    def search_faces(self, queries, k=1):
+        """
+        Nearest indexed faces for many queries (all faces of an image, or of a batch of
+        images) in one FAISS call: one BLAS matrix product instead of a (1, d) search each.
+        Queries are L2-normalized, so scores are cosine similarities.
+        Returns (face_ids int64[n, k], cluster_ids int32[n, k], scores float32[n, k]);
+        neighbours below SIMILARITY_THRESHOLD have face_id and cluster_id -1.
+        """
+        queries = l2_normalized(queries)
+        n = len(queries)
+        if self.index is None or time.time() - self.last_sync > SYNC_SECONDS:
+            self.sync()
+        if self.index is None or n == 0:
+            return np.full((n, k), -1, dtype=np.int64), np.full((n, k), -1, dtype=np.int32), np.zeros((n, k), dtype=np.float32)
+
+        scores, face_ids = self._searcher().search(queries, k)
+        face_ids[scores < SIMILARITY_THRESHOLD] = -1
+        cluster_ids = np.full(face_ids.shape, -1, dtype=np.int32)
+        known = (face_ids >= 0) & (face_ids < len(self.cluster_of))
+        cluster_ids[known] = self.cluster_of[face_ids[known]]
+        return face_ids, cluster_ids, scores
+
+    def search_face(self, query_embedding, k=1):
+        """
+        Searches the index for the nearest neighbor (single-query form of search_faces).
+        Returns (matched_face_id, cluster_id) if similarity > threshold.
+        """
+        face_ids, cluster_ids, _ = self.search_faces(query_embedding, k)
+        if face_ids[0, 0] != -1:
+            return int(face_ids[0, 0]), int(cluster_ids[0, 0])
         return None, None
 
 
@@ -119,4 +515,4 @@ def get_faiss_manager():
     global faiss_manager_instance
     if faiss_manager_instance is None:
         faiss_manager_instance = FAISSManager()
-    return faiss_manager_instance
\ No newline at end of file
+    return faiss_manager_instance
@@ -0,0 +1,189 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from photosynth.utils.paths import make_relative
+
+# --- CONFIGURATION ---
+CACHE_DIR = Path(os.path.expanduser("~/.photosynth/"))
+CACHE_FILE = CACHE_DIR / "hash_cache.sqlite"
+LOOKUP_CHUNK = 500  # SQLite caps host parameters per statement
+
+
+# ---------------------
+
+class HashCache:
+    """
+    Local on-disk pHash cache keyed by file identity.
+    - Identity = (relative path, size, mtime_ns, inode).
+    - Any change to the file (ExifTool rewrite, replace, edit) is a miss.
+    - Relative paths let both nodes exchange entries via export_to/import_from.
+    """
+
+    def __init__(self, db_path=CACHE_FILE):
+        self.db_path = str(db_path)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._init_db()
+
+    def _get_connection(self):
+        # One connection per thread (and per process after a fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_db(self):
+        conn = self._get_connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS hash_cache (
+                rel_path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime_ns INTEGER,
+                inode INTEGER,
+                file_hash TEXT,
+                updated REAL
+            )
+        ''')
+        conn.commit()
+
+    @staticmethod
+    def identity(file_path, st=None):
+        """Returns the (rel_path, size, mtime_ns, inode) key for a file."""
+        if st is None:
+            st = os.stat(file_path)
+        return make_relative(str(file_path)), st.st_size, st.st_mtime_ns, st.st_ino
+
+    def _record(self, hits, misses):
+        with self._stats_lock:
+            self.hits += hits
+            self.misses += misses
+
+    def get(self, file_path, st=None):
+        """Returns the cached hash or None on a miss."""
+        try:
+            rel_path, size, mtime_ns, inode = self.identity(file_path, st)
+            row = self._get_connection().execute(
+                "SELECT size, mtime_ns, inode, file_hash FROM hash_cache WHERE rel_path=?",
+                (rel_path,)
+            ).fetchone()
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️ Hash cache lookup failed for {file_path}: {e}")
+            row = None
+
+        if row and row[:3] == (size, mtime_ns, inode):
+            self._record(1, 0)
+            return row[3]
+
+        self._record(0, 1)
+        return None
+
+    def put(self, file_path, file_hash, st=None):
+        if not file_hash: return
+        try:
+            key = self.identity(file_path, st)
+            conn = self._get_connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO hash_cache VALUES (?, ?, ?, ?, ?, ?)",
+                key + (file_hash, time.time())
+            )
+            conn.commit()
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️ Hash cache write failed for {file_path}: {e}")
+
+    def lookup_many(self, file_paths):
+        """
+        Bulk lookup. Returns {file_path: hash} for every path whose cached
+        identity still matches the file on disk. Missing keys are misses.
+        """
+        keyed = {}
+        for p in file_paths:
+            try:
+                keyed[self.identity(p)] = p
+            except OSError:
+                continue
+
+        by_rel = {key[0]: key for key in keyed}
+        rel_paths = list(by_rel)
+        found = {}
+        conn = self._get_connection()
+        for i in range(0, len(rel_paths), LOOKUP_CHUNK):
+            chunk = rel_paths[i:i + LOOKUP_CHUNK]
+            rows = conn.execute(
+                f"SELECT rel_path, size, mtime_ns, inode, file_hash FROM hash_cache "
+                f"WHERE rel_path IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            for rel_path, size, mtime_ns, inode, file_hash in rows:
+                key = by_rel[rel_path]
+                if key == (rel_path, size, mtime_ns, inode):
+                    found[keyed[key]] = file_hash
+
+        self._record(len(found), len(file_paths) - len(found))
+        return found
+
+    def put_many(self, entries):
+        """Stores a list of (file_path, hash) pairs in one transaction."""
+        rows = []
+        now = time.time()
+        for file_path, file_hash in entries:
+            if not file_hash: continue
+            try:
+                rows.append(self.identity(file_path) + (file_hash, now))
+            except OSError:
+                continue
+        conn = self._get_connection()
+        conn.executemany("INSERT OR REPLACE INTO hash_cache VALUES (?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
+
+    def export_to(self, dest_path):
+        """Copies every entry into another cache file (e.g. on the NAS) for the other node."""
+        other = HashCache(dest_path)
+        self._merge(self.db_path, other.db_path)
+
+    def import_from(self, src_path):
+        """Merges entries from another cache file, keeping the newest entry per path."""
+        self._merge(str(src_path), self.db_path)
+
+    @staticmethod
+    def _merge(src_path, dest_path):
+        conn = sqlite3.connect(dest_path, timeout=30)
+        try:
+            conn.execute("ATTACH DATABASE ? AS src", (src_path,))
+            conn.execute('''
+                INSERT OR REPLACE INTO main.hash_cache
+                SELECT s.* FROM src.hash_cache s
+                LEFT JOIN main.hash_cache m ON m.rel_path = s.rel_path
+                WHERE m.rel_path IS NULL OR s.updated > m.updated
+            ''')
+            conn.commit()
+            conn.execute("DETACH DATABASE src")
+        finally:
+            conn.close()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+hash_cache_instance = None
+
+
+def get_hash_cache():
+    global hash_cache_instance
+    if hash_cache_instance is None:
+        hash_cache_instance = HashCache()
+    return hash_cache_instance
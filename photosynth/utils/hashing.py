@@ -1,7 +1,9 @@
 import cv2
 import imagehash
+import io
 import os
-from PIL import Image, ImageFile
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from PIL import Image, ImageFile, ExifTags
 
 # --- CORRECTED HEIF REGISTRATION ---
 import pillow_heif # Ensure this is installed: uv pip install pillow-heif
@@ -15,45 +17,190 @@ ImageFile.LOAD_TRUNCATED_IMAGES = True
 Image.MAX_IMAGE_PIXELS = None
 # -----------------------------------
 
-from photosynth.utils.paths import heal_path
-def calculate_content_hash(file_path):
+from photosynth.utils.paths import config, heal_path
+from photosynth.utils.hash_cache import get_hash_cache
+from photosynth.utils.video import VIDEO_EXTENSIONS, is_video, midpoint_frame
+
+RAW_EXTENSIONS = ['.arw']
+
+# --- REDUCED-RESOLUTION DECODE ---
+# phash only ever looks at a 32x32 grayscale copy, so we ask the codec for the
+# smallest frame that is still >= DRAFT_SIZE instead of decoding 24-60 MP:
+# - JPEG: DCT scaling (1/2 .. 1/8) and luma-only decode via Image.draft
+# - HEIC: pillow-heif's draft picks the smallest embedded thumbnail >= DRAFT_SIZE
+# - ARW:  the embedded JPEG preview is read straight from its TIFF offset
+# scripts/bench_hashing.py compares both paths. Measured drift vs the full
+# decode is 0 bits for most photos and at most HASH_TOLERANCE_BITS (median
+# ties in the DCT), so consumers matching hashes should allow that radius.
+# Opt-in (processing.fast_hash_decode): the pHash is the media_files key, so switching
+# modes on an existing library re-keys the drifting files and duplicates their rows.
+FAST_DECODE = config.get('processing', {}).get('fast_hash_decode', False)
+DRAFT_SIZE = 256
+HASH_TOLERANCE_BITS = 4
+
+# --- BATCH HASHING ---
+HASH_WORKERS = os.cpu_count() or 4
+HASH_CHUNK_SIZE = 32  # files per pool task (amortizes IPC)
+MAX_CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+
+def calculate_content_hash(file_path, use_cache=True, frame=None):
     """
     Generates a 'Perceptual Hash' (pHash) of the visual content.
     - Ignores metadata/exif changes.
     - Stays constant even if file is modified by ExifTool.
     - Works on Images and Videos (by hashing the middle frame).
+    - Served from the local HashCache when the file identity is unchanged.
+    - frame: the task's MediaFrame of this image; a cache miss decodes its bytes instead of re-reading the file.
     """
+    file_path = heal_path(file_path)
+    if not use_cache:
+        return _compute_content_hash(file_path, frame=frame)
+
+    try:
+        st = os.stat(file_path)
+    except OSError as e:
+        print(f"⚠️ Hashing failed for {file_path}: {e}")
+        return None
+
+    cache = get_hash_cache()
+    cached = cache.get(file_path, st)
+    if cached: return cached
+
+    file_hash = _compute_content_hash(file_path, frame=frame)
+    cache.put(file_path, file_hash, st)
+    return file_hash
+
+
+def _compute_content_hash(file_path, fast=FAST_DECODE, frame=None):
+    """Decodes the file (or the frame's bytes) and computes its pHash (no cache)."""
     try:
-        file_path = heal_path(file_path)
         # Check file size first
         if os.path.getsize(file_path) == 0: return None
 
-        ext = os.path.splitext(file_path)[1].lower()
-        
         # --- VIDEO STRATEGY ---
-        if ext in ['.mp4', '.mov', '.avi', '.mkv', '.m4v']:
-            cap = cv2.VideoCapture(file_path)
-            if not cap.isOpened(): return None
-            
-            # Jump to 50% mark to avoid black start frames
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            if total_frames > 0:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, total_frames // 2)
-            
-            ret, frame = cap.read()
-            cap.release()
-            
-            if not ret: return None
+        if is_video(file_path):
+            # Exact 50% frame, not the nearest keyframe: the hash must not depend on the decoder
+            middle = midpoint_frame(file_path)
+            if middle is None: return None
             
             # Convert to PIL for hashing
-            img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            img = Image.fromarray(cv2.cvtColor(middle, cv2.COLOR_BGR2RGB))
             return str(imagehash.phash(img))
 
         # --- IMAGE STRATEGY ---
         else:
-            img = Image.open(file_path)
+            img = open_image_for_hash(file_path, fast, data=frame.data if frame is not None else None)
             return str(imagehash.phash(img))
             
     except Exception as e:
         print(f"⚠️ Hashing failed for {file_path}: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def open_image_for_hash(file_path, fast=FAST_DECODE, data=None):
+    """Opens an image at the smallest scale that still yields the same pHash (from `data` if given)."""
+    ext = os.path.splitext(file_path)[1].lower()
+    if fast and ext in RAW_EXTENSIONS:
+        preview = _raw_preview(file_path, data)
+        if preview is not None: return preview
+
+    img = Image.open(io.BytesIO(data) if data is not None else file_path)
+    if fast:
+        img.draft('L' if img.format == 'JPEG' else None, (DRAFT_SIZE, DRAFT_SIZE))
+    return img
+
+
+def raw_preview_bytes(file_path, data=None):
+    """
+    The largest embedded JPEG preview of a TIFF-based RAW (IFD0/IFD1
+    JPEGInterchangeFormat), read from the file or from its bytes. None if there is none.
+    """
+    try:
+        with Image.open(io.BytesIO(data) if data is not None else file_path) as raw:
+            exif = raw.getexif()
+            ifds = [exif, exif.get_ifd(ExifTags.IFD.IFD1)]
+        previews = [
+            (ifd.get(0x0202), ifd.get(0x0201)) for ifd in ifds
+            if ifd.get(0x0201) and ifd.get(0x0202)
+        ]
+        if not previews: return None
+
+        length, offset = max(previews)
+        if data is not None:
+            return data[offset:offset + length]
+        with open(file_path, 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+    except Exception:
+        return None
+
+
+def _raw_preview(file_path, data=None):
+    """raw_preview_bytes drafted down to DRAFT_SIZE. None if there is none."""
+    preview = raw_preview_bytes(file_path, data)
+    if preview is None: return None
+    try:
+        img = Image.open(io.BytesIO(preview))
+        img.draft('L', (DRAFT_SIZE, DRAFT_SIZE))
+        img.load()
+        return img
+    except Exception:
+        return None
+
+
+def hash_many(paths, workers=HASH_WORKERS, chunk_size=HASH_CHUNK_SIZE, use_cache=True):
+    """
+    Hashes many files on a process pool (decode + DCT hold the GIL, threads don't scale).
+    Yields (path, hash, error) as results complete, so callers can register/queue
+    while hashing is still running.
+    - Cache hits are yielded first, without touching the pool.
+    - Misses are submitted in chunks, with a bounded number of chunks in flight.
+    """
+    paths = [str(p) for p in paths]
+    if use_cache:
+        hits = get_hash_cache().lookup_many(paths)
+        for path, file_hash in hits.items():
+            yield path, file_hash, None
+        paths = [p for p in paths if p not in hits]
+    if not paths: return
+
+    max_in_flight = max(1, workers * MAX_CHUNKS_IN_FLIGHT_PER_WORKER)
+    chunks = (paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size))
+    pool = ProcessPoolExecutor(max_workers=workers)
+    in_flight = {}
+    try:
+        for chunk in chunks:
+            in_flight[pool.submit(_hash_chunk, chunk, use_cache)] = chunk
+            if len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                yield from _drain(done, in_flight)
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            yield from _drain(done, in_flight)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _drain(done, in_flight):
+    for future in done:
+        chunk = in_flight.pop(future)
+        try:
+            yield from future.result()
+        except Exception as e:
+            # Whole chunk lost (e.g. a worker died on a corrupt file)
+            for path in chunk:
+                yield path, None, str(e)
+
+
+def _hash_chunk(paths, use_cache):
+    """Pool worker: hashes one chunk, returning [(path, hash, error)]."""
+    results = []
+    for path in paths:
+        try:
+            file_hash = calculate_content_hash(path, use_cache=use_cache)
+            results.append((path, file_hash, None if file_hash else "unreadable or empty"))
+        except Exception as e:
+            results.append((path, None, str(e)))
+    return results
@@ -0,0 +1,55 @@
+import io
+import os
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+from photosynth.utils.hashing import RAW_EXTENSIONS, raw_preview_bytes  # also registers the HEIF opener
+from photosynth.utils.paths import heal_path
+
+
+class MediaFrame:
+    """
+    One still image for one task: read once, decoded once, shared by its consumers
+    (hashing, InsightFace, YOLO) instead of each opening the file again.
+    - data: the file bytes, read on first use (one NFS read; a hash-cache hit never reads).
+      Hashing re-opens them as calculate_content_hash does (draft scale only with
+      fast_hash_decode), so pHashes match it exactly.
+    - bgr: full-resolution uint8 decode, made on first use: cv2.imdecode (cv2.imread's
+      decoder and EXIF orientation), PIL for what OpenCV can't read (HEIC). RAWs decode
+      their largest embedded JPEG preview. InsightFace and YOLO resize it themselves.
+    """
+
+    def __init__(self, path, data=None):
+        self.path = path
+        self._data = data
+        self._bgr = None
+
+    @classmethod
+    def load(cls, file_path):
+        return cls(heal_path(str(file_path)))
+
+    @property
+    def data(self):
+        if self._data is None:
+            with open(self.path, 'rb') as f:
+                self._data = f.read()
+        return self._data
+
+    @property
+    def bgr(self):
+        if self._bgr is None:
+            self._bgr = self._decode()
+        return self._bgr
+
+    def _decode(self):
+        data = self.data
+        if os.path.splitext(self.path or '')[1].lower() in RAW_EXTENSIONS:
+            data = raw_preview_bytes(self.path, data) or data
+        bgr = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if bgr is not None:
+            return bgr
+        with Image.open(io.BytesIO(data)) as img:
+            rgb = np.asarray(ImageOps.exif_transpose(img).convert('RGB'))
+        return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
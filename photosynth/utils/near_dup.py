@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+
+import numpy as np
+import yaml
+
+from photosynth.utils.video import is_video
+
+# Load Configuration
+SETTINGS_PATH = os.path.join(os.path.dirname(__file__), '../../settings.yaml')
+with open(SETTINGS_PATH, 'r') as f:
+    config = yaml.safe_load(f)
+
+# --- CONFIGURATION ---
+# Max Hamming distance (of 64 bits) at which a completed file's results are reused.
+NEAR_DUP_RADIUS = config.get('processing', {}).get('near_duplicate_radius', 4)
+REFRESH_SECONDS = 300  # Pick up hashes completed on the other node
+PENDING_MERGE = 4096   # New hashes are scanned linearly until merged into the tables
+
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+# ---------------------
+
+def _to_int(file_hash):
+    try:
+        return int(file_hash, 16) if file_hash and len(file_hash) == 16 else None
+    except ValueError:
+        return None
+
+
+def hamming_distances(hashes, query):
+    """Hamming distance between a uint64 array and one uint64 value."""
+    x = np.bitwise_xor(hashes, np.uint64(query))
+    return _POPCOUNT[x.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+class HammingIndex:
+    """
+    Multi-index hashing over 64-bit pHashes.
+    - The hash is split into (max_radius + 1) substrings. By pigeonhole, any hash
+      within max_radius matches the query exactly on at least one substring.
+    - Each substring has a sorted table, so a lookup is (max_radius + 1) binary
+      searches plus a popcount over the candidate buckets.
+    """
+
+    def __init__(self, max_radius=NEAR_DUP_RADIUS):
+        self.max_radius = max_radius
+        chunks = min(max_radius + 1, 64)
+        widths = [64 // chunks + (1 if i < 64 % chunks else 0) for i in range(chunks)]
+        self._chunks = []
+        shift = 0
+        for w in widths:
+            self._chunks.append((np.uint64(shift), np.uint64((1 << w) - 1)))
+            shift += w
+
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self._tables = [(np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)) for _ in self._chunks]
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.hashes) + len(self._pending)
+
+    def add(self, file_hash):
+        self.add_many([file_hash])
+
+    def add_many(self, file_hashes):
+        values = [v for v in map(_to_int, file_hashes) if v is not None]
+        with self._lock:
+            self._pending.extend(values)
+            if len(self._pending) >= PENDING_MERGE:
+                self._merge()
+
+    def compact(self):
+        """Merges all pending hashes into the substring tables now."""
+        with self._lock:
+            self._merge()
+
+    def _merge(self):
+        """Folds pending hashes into the sorted substring tables (caller holds the lock)."""
+        if not self._pending: return
+        pending = np.array(self._pending, dtype=np.uint64)
+        self.hashes = np.unique(np.concatenate([self.hashes, pending]))
+        self._pending = []
+
+        tables = []
+        for shift, mask in self._chunks:
+            keys = (self.hashes >> shift) & mask
+            order = np.argsort(keys, kind='stable')
+            tables.append((keys[order], order))
+        self._tables = tables
+
+    def search(self, file_hash, radius=None):
+        """Returns [(hash, distance)] within radius, nearest first."""
+        radius = self.max_radius if radius is None else radius
+        query = _to_int(file_hash)
+        if query is None: return []
+        q = np.uint64(query)
+
+        with self._lock:
+            if radius > self.max_radius:
+                candidates = self.hashes
+            else:
+                buckets = []
+                for (keys, order), (shift, mask) in zip(self._tables, self._chunks):
+                    k = (q >> shift) & mask
+                    lo = np.searchsorted(keys, k, side='left')
+                    hi = np.searchsorted(keys, k, side='right')
+                    buckets.append(order[lo:hi])
+                idx = np.unique(np.concatenate(buckets))
+                candidates = self.hashes[idx]
+            pending = np.array(self._pending, dtype=np.uint64)
+
+        candidates = np.unique(np.concatenate([candidates, pending]))
+        if not len(candidates): return []
+
+        distances = hamming_distances(candidates, query)
+        within = np.nonzero(distances <= radius)[0]
+        within = within[np.argsort(distances[within], kind='stable')]
+        return [(f"{int(candidates[i]):016x}", int(distances[i])) for i in within]
+
+
+class NearDuplicateIndex(HammingIndex):
+    """HammingIndex over hashes that completed a pipeline stage, refreshed from Postgres."""
+
+    def __init__(self, db, max_radius=NEAR_DUP_RADIUS):
+        super().__init__(max_radius)
+        self.db = db
+        self.watermark = 0.0
+        self.last_refresh = 0.0
+        self.refresh()
+
+    def refresh(self):
+        """Loads hashes completed since the last refresh (from any node)."""
+        # Inclusive watermark: rows at it are pulled again; _merge's np.unique drops the repeats
+        rows = self.db.get_completed_hashes_since(self.watermark)
+        if rows:
+            self.add_many(h for h, _ in rows)
+            self.watermark = max(ts for _, ts in rows)
+        self.compact()
+        self.last_refresh = time.time()
+
+    def maybe_refresh(self):
+        if time.time() - self.last_refresh > REFRESH_SECONDS:
+            self.refresh()
+
+
+near_dup_index_instance = None
+
+
+def get_near_duplicate_index(db):
+    global near_dup_index_instance
+    if near_dup_index_instance is None:
+        near_dup_index_instance = NearDuplicateIndex(db)
+    near_dup_index_instance.maybe_refresh()
+    return near_dup_index_instance
+
+
+def find_reusable_result(db, file_hash, file_path, stage, radius=NEAR_DUP_RADIUS):
+    """
+    Finds the nearest near-duplicate that already COMPLETED `stage` ('detection'
+    or 'caption'), of the same media kind (image vs video).
+    Returns {'file_hash', 'file_path', 'data', 'distance'} or None.
+    Reused detection data has no 'face_ids': those rows belong to the donor
+    (detection_source points at it); face_count is kept.
+    """
+    if radius <= 0: return None
+    index = get_near_duplicate_index(db)
+    matches = [(h, d) for h, d in index.search(file_hash, radius) if h != file_hash]
+    if not matches: return None
+
+    donors = db.get_completed_results([h for h, _ in matches], stage)
+    video = is_video(file_path)
+    for h, distance in matches:
+        donor = donors.get(h)
+        if donor and is_video(donor['file_path'] or '') == video:
+            donor['distance'] = distance
+            if stage == 'detection' and donor['data']:
+                donor['data'] = {k: v for k, v in donor['data'].items() if k != 'face_ids'}
+            return donor
+    return None
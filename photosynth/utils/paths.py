@@ -1,39 +1,182 @@
 import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+import yaml
+
+# Load Configuration
+SETTINGS_PATH = os.path.join(os.path.dirname(__file__), '../../settings.yaml')
+with open(SETTINGS_PATH, 'r') as f:
+    config = yaml.safe_load(f)
+
+
+def _node_mount():
+    """NAS mount root for this machine: first paths.node_mounts key found in the hostname, else nas_mount."""
+    paths_cfg = config.get('paths', {})
+    hostname = socket.gethostname()
+    for key, mount in (paths_cfg.get('node_mounts') or {}).items():
+        if str(key) in hostname:
+            return os.path.expanduser(mount)
+    return os.path.expanduser(paths_cfg.get('nas_mount', "~/personal/nas"))
+
+
+NAS_ROOT = _node_mount().rstrip("/")
+
+# --- RESOLVER CACHE ---
+RESOLVE_CACHE_SIZE = 100_000
+POSITIVE_TTL = 600  # seconds an "exists" answer is trusted
+NEGATIVE_TTL = 30   # seconds a "missing" answer is trusted (files do appear)
 
-NAS_ROOT = os.path.expanduser("~/personal/nas")
 
 def make_relative(file_path):
     """
     Converts an absolute path to be relative to the NAS root.
     Example: /home/aditya/personal/nas/video/foo.mp4 -> video/foo.mp4
     """
+    if file_path.startswith(NAS_ROOT + "/"):
+        return file_path[len(NAS_ROOT):].strip("/")
     if "personal/nas" in file_path:
         return file_path.split("personal/nas")[-1].strip("/")
     return file_path
 
+
+class PathResolver:
+    """
+    Maps NAS paths from any node onto this node's mount, with as few NFS stats as possible.
+    - Relative paths and paths already under the local mount need no stat at all.
+    - Foreign absolute paths are stat'ed once; the answer is kept in an LRU with
+      separate TTLs for positive and negative entries.
+    - resolve_many() lists each parent directory once (scandir) instead of
+      stat'ing every file, and caches whether the resolved local paths exist.
+    """
+
+    def __init__(self, root=NAS_ROOT, max_entries=RESOLVE_CACHE_SIZE):
+        self.root = root.rstrip("/")
+        self.max_entries = max_entries
+        self._cache = OrderedDict()  # path -> (exists, checked_at)
+        self._lock = threading.Lock()
+        self.stat_calls = 0
+        self.stat_calls_saved = 0
+
+    def _rebase(self, file_path):
+        return os.path.join(self.root, make_relative(file_path))
+
+    def _needs_check(self, file_path):
+        """Only absolute paths outside the local mount can differ from their rebased form."""
+        return os.path.isabs(file_path) and not file_path.startswith(self.root + "/")
+
+    def _cached(self, file_path):
+        with self._lock:
+            entry = self._cache.get(file_path)
+            if entry is None: return None
+            exists, checked_at = entry
+            if time.time() - checked_at > (POSITIVE_TTL if exists else NEGATIVE_TTL):
+                del self._cache[file_path]
+                return None
+            self._cache.move_to_end(file_path)
+            self.stat_calls_saved += 1
+            return exists
+
+    def _store(self, file_path, exists):
+        with self._lock:
+            self._cache[file_path] = (exists, time.time())
+            self._cache.move_to_end(file_path)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def exists(self, file_path):
+        """Cached os.path.exists."""
+        exists = self._cached(file_path)
+        if exists is None:
+            with self._lock:
+                self.stat_calls += 1
+            exists = os.path.exists(file_path)
+            self._store(file_path, exists)
+        return exists
+
+    def resolve(self, file_path):
+        """
+        Returns a valid absolute path on this machine.
+        Accepts absolute paths from other machines (e.g. /home/other/personal/nas/...)
+        and relative paths (e.g. video/foo.mp4). If nothing exists, the rebased path is
+        returned as the best guess; callers that need the file should check.
+        """
+        file_path = str(file_path)
+        if not self._needs_check(file_path):
+            with self._lock:
+                self.stat_calls_saved += 1
+            return self._rebase(file_path) if not os.path.isabs(file_path) else file_path
+
+        if self.exists(file_path):
+            return file_path
+        return self._rebase(file_path)
+
+    def resolve_many(self, file_paths):
+        """
+        Resolves many paths, listing each uncached parent directory once. Existence of
+        the resolved local paths is cached from those listings too (relative DB paths are
+        checked at their rebased location), so exists() on the results needs no stat.
+        """
+        file_paths = [str(p) for p in file_paths]
+        # Foreign absolute paths first: the ones missing there resolve to their rebased form
+        self._list_parents([p for p in file_paths if self._needs_check(p)])
+        local = []
+        for p in file_paths:
+            if not os.path.isabs(p) or (self._needs_check(p) and not self._cached(p)):
+                p = self._rebase(p)
+            local.append(p)
+        self._list_parents(local)
+        return [self.resolve(p) for p in file_paths]
+
+    def _list_parents(self, paths):
+        """Caches existence of uncached `paths` (absolute) with one scandir per parent directory."""
+        by_dir = {}
+        for p in paths:
+            if self._cached(p) is None:
+                by_dir.setdefault(os.path.dirname(p), []).append(p)
+
+        for directory, dir_paths in by_dir.items():
+            try:
+                with os.scandir(directory) as it:
+                    names = {entry.name for entry in it}
+            except OSError:
+                names = set()
+            with self._lock:
+                self.stat_calls += 1
+            for p in dir_paths:
+                self._store(p, os.path.basename(p) in names)
+
+    def invalidate(self, file_path=None):
+        with self._lock:
+            if file_path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(str(file_path), None)
+
+    def metrics(self):
+        """stat_calls = NFS stats/scandirs issued; stat_calls_saved = resolutions answered without one."""
+        return {
+            "stat_calls": self.stat_calls,
+            "stat_calls_saved": self.stat_calls_saved,
+            "cached_entries": len(self._cache),
+        }
+
+
+path_resolver_instance = None
+
+
+def get_path_resolver():
+    global path_resolver_instance
+    if path_resolver_instance is None:
+        path_resolver_instance = PathResolver()
+    return path_resolver_instance
+
+
 def heal_path(file_path):
     """
     Heals a file path by ensuring it points to the correct location on the current machine.
-    Accepts:
-    - Absolute paths from other machines (e.g. /home/other/personal/nas/...)
-    - Relative paths (e.g. video/foo.mp4)
-    Returns:
-    - Valid absolute path on current machine (e.g. /home/me/personal/nas/video/foo.mp4)
+    See PathResolver.resolve.
     """
-    # 1. If it's already a valid absolute path, return it
-    if os.path.isabs(file_path) and os.path.exists(file_path):
-        return file_path
-
-    # 2. Extract relative path
-    relative = make_relative(file_path)
-    
-    # 3. Reconstruct absolute path on current machine
-    new_path = os.path.join(NAS_ROOT, relative)
-    
-    # 4. Return new path (even if it doesn't exist, we return the best guess)
-    # But if checking existence is critical, the caller should check.
-    # However, for 'healing', we usually want the one that works.
-    if os.path.exists(new_path):
-        return new_path
-        
-    return new_path # Return the reconstructed path as default best effort
+    return get_path_resolver().resolve(file_path)
@@ -0,0 +1,333 @@
+import cv2
+import hashlib
+import math
+import os
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import av  # PyAV: true keyframe seeks (no decode-forward to the exact frame)
+except ImportError:
+    av = None
+
+from photosynth.utils.paths import config, heal_path
+from photosynth.utils.hash_cache import HashCache
+
+# --- CONFIGURATION ---
+VIDEO_EXTENSIONS = ['.mp4', '.mov', '.avi', '.mkv', '.m4v']
+FRAME_CACHE_DIR = Path(os.path.expanduser("~/.photosynth/frames/"))
+FRAME_CACHE_PNG_COMPRESSION = 1  # lossless, fast to write
+FRAME_CACHE_MAX_MB = 2048         # least recently used frames are evicted beyond this
+MIDPOINT = (0.5,)  # 50% mark avoids black start frames
+# Detection samples: one frame every 1/2/5 s (by length), spread wider past the budget
+VIDEO_FRAME_BUDGET = config.get('processing', {}).get('video_frame_budget', 120)
+VIDEO_SAMPLE_BATCH = 8      # sampled frames handed to the detectors at once
+SEEK_MIN_GAP_SECONDS = 1.0  # nearer targets are reached with grab(); farther ones with a seek
+# Scene-aware selection (SceneSampler), distances 0..1 (see frame_signature)
+VIDEO_DETECTION_CAP = config.get('processing', {}).get('video_detection_cap', 40)
+SCENE_SIMILAR = 0.02      # thumbnail distance at which a sample repeats the last analyzed frame
+SCENE_CUT = 0.08          # color histogram distance at which consecutive samples straddle a cut (in-shot motion ~0.03)
+CUT_BISECT_DEPTH = 2      # extra samples per cut: up to 3, finding shots down to 1/4 of the interval
+
+
+# ---------------------
+
+def is_video(file_path):
+    return os.path.splitext(str(file_path))[1].lower() in VIDEO_EXTENSIONS
+
+
+def sample_video_frames(file_path, positions=MIDPOINT, use_cache=True):
+    """
+    Returns representative BGR frames at the given relative positions (0..1).
+    - Seeks by timestamp to the nearest preceding keyframe and decodes only that
+      frame, so a multi-GB file costs a few MB of NFS reads.
+    - Frames are cached on disk (lossless PNG) keyed by file identity, so repeated
+      captioning on the same node opens the video once; pruned to FRAME_CACHE_MAX_MB.
+    - The keyframe depends on the decoder (PyAV vs OpenCV), so content hashing uses
+      midpoint_frame instead.
+    Returns [] if the video cannot be read.
+    """
+    file_path = heal_path(str(file_path))
+    cache_paths = _cache_paths(file_path, positions) if use_cache else None
+
+    if cache_paths and all(p.exists() for p in cache_paths):
+        frames = [cv2.imread(str(p)) for p in cache_paths]
+        if all(f is not None for f in frames):
+            for p in cache_paths:
+                _touch(p)
+            return frames
+
+    frames = _sample_keyframes_av(file_path, positions) if av else None
+    if not frames:
+        frames = _sample_frames_cv2(file_path, positions)
+
+    if cache_paths and frames and len(frames) == len(cache_paths):
+        FRAME_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        for frame, p in zip(frames, cache_paths):
+            # Write then rename, so a concurrent reader never sees a partial file
+            tmp = p.with_name(f"{p.stem}.{os.getpid()}.tmp.png")
+            if cv2.imwrite(str(tmp), frame, [cv2.IMWRITE_PNG_COMPRESSION, FRAME_CACHE_PNG_COMPRESSION]):
+                os.replace(tmp, p)
+        _prune_frame_cache()
+    return frames
+
+
+def _touch(path):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _prune_frame_cache(max_bytes=FRAME_CACHE_MAX_MB * 2**20):
+    """Deletes least recently used cached frames (by mtime, refreshed on hits) beyond max_bytes."""
+    try:
+        entries = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in os.scandir(FRAME_CACHE_DIR) if e.is_file()]
+    except OSError:
+        return
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes: break
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # another process got it first
+        total -= size
+
+
+def _cache_paths(file_path, positions):
+    try:
+        key = HashCache.identity(file_path)
+    except OSError:
+        return None
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()
+    return [FRAME_CACHE_DIR / f"{digest}_{pos:.3f}.png" for pos in positions]
+
+
+def _sample_keyframes_av(file_path, positions):
+    """Keyframe-only decode via PyAV. Returns None on any failure (caller falls back)."""
+    try:
+        with av.open(file_path) as container:
+            stream = container.streams.video[0]
+            stream.codec_context.skip_frame = "NONKEY"
+
+            if stream.duration and stream.time_base:
+                duration = stream.duration
+            elif container.duration:
+                duration = int(container.duration / av.time_base / stream.time_base)
+            else:
+                duration = 0
+
+            start = stream.start_time or 0
+            frames = []
+            for pos in positions:
+                container.seek(start + int(duration * pos), stream=stream, backward=True, any_frame=False)
+                frame = next(container.decode(stream), None)
+                if frame is None: return None
+                frames.append(frame.to_ndarray(format='bgr24'))
+            return frames
+    except Exception:
+        return None
+
+
+def _sample_frames_cv2(file_path, positions):
+    """Fallback: timestamp seek via OpenCV (decodes forward from the previous keyframe)."""
+    cap = cv2.VideoCapture(file_path)
+    if not cap.isOpened(): return []
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    duration_ms = 1000.0 * total_frames / fps
+
+    frames = []
+    for pos in positions:
+        if duration_ms > 0:
+            cap.set(cv2.CAP_PROP_POS_MSEC, duration_ms * pos)
+        ret, frame = cap.read()
+        if not ret: break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def midpoint_frame(file_path):
+    """
+    The exact middle frame (BGR) for content hashing, or None if the video cannot be read.
+    Always decoded with OpenCV from frame total_frames // 2, so the pHash (the media_files
+    key) does not depend on whether PyAV is installed or where the keyframes are.
+    """
+    cap = cv2.VideoCapture(heal_path(str(file_path)))
+    if not cap.isOpened(): return None
+
+    # Jump to 50% mark to avoid black start frames
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if total_frames > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, total_frames // 2)
+
+    ret, frame = cap.read()
+    cap.release()
+    return frame if ret else None
+
+
+def detection_frame_indices(fps, total_frames, budget=VIDEO_FRAME_BUDGET):
+    """Frame numbers Detector analyzes: every 1/2/5 s as the video gets longer, at most `budget` of them."""
+    duration = total_frames / fps
+    if duration > 30: interval_sec = 5
+    elif duration > 5: interval_sec = 2
+    else: interval_sec = 1
+    step = max(1, int(fps * interval_sec), -(-total_frames // budget))
+    return range(0, total_frames, step)[:budget]
+
+
+def frame_signature(frame):
+    """
+    (thumbnail, histogram) for cheap change detection:
+    - 32x32 grayscale thumbnail (0..1): content and layout, moves with subjects and the camera;
+    - 16-bin per-channel color histogram (sums to 1 per channel): stable across pans and
+      motion within a shot, jumps at cuts.
+    """
+    step = max(1, min(frame.shape[:2]) // 256)  # decimate first: INTER_AREA over 4K costs more than the models' resize
+    small = cv2.resize(frame[::step, ::step], (32, 32), interpolation=cv2.INTER_AREA)
+    thumbnail = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.float32) / 255.0
+    histogram = np.stack([np.bincount(small[..., c].ravel() >> 4, minlength=16) for c in range(3)]) / (32 * 32)
+    return thumbnail, histogram
+
+
+def signature_distance(a, b):
+    """Mean |Δ| of the thumbnails, 0..1."""
+    return float(np.abs(a[0] - b[0]).mean())
+
+
+def cut_distance(a, b):
+    """Histogram change (half the L1 distance, averaged over channels), 0..1."""
+    return float(np.abs(a[1] - b[1]).sum() / 6)
+
+
+class VideoSampler:
+    """
+    Decodes only the frames Detector analyzes, instead of read() on every frame.
+    - Targets up to SEEK_MIN_GAP_SECONDS ahead are reached with grab() (no color conversion
+      or copy of skipped frames); others with a frame seek, which jumps to the preceding
+      keyframe, so most of a long video is never read from the NAS.
+    - batches() yields lists of up to VIDEO_SAMPLE_BATCH BGR frames, for batched detection.
+    - grabbed / seeks / retrieved count the work done (for benchmarks).
+    """
+
+    def __init__(self, file_path, budget=VIDEO_FRAME_BUDGET):
+        self.cap = cv2.VideoCapture(heal_path(str(file_path)))
+        self.budget = budget
+        raw_fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.fps = raw_fps if raw_fps > 0 else 30.0
+        self.seek_min_gap = max(1, int(self.fps * SEEK_MIN_GAP_SECONDS))
+        self.position = 0  # index of the next frame grab() returns
+        self.grabbed = self.seeks = self.retrieved = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cap.release()
+
+    def is_opened(self):
+        return self.cap.isOpened()
+
+    def frame_indices(self):
+        total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if total_frames <= 0:  # unknown length: one per second until the stream ends
+            return range(0, int(self.fps) * self.budget, max(1, int(self.fps)))
+        return detection_frame_indices(self.fps, total_frames, self.budget)
+
+    def read_at(self, index):
+        """BGR frame `index`, or None past the end (or if a backward seek fails)."""
+        gap = index - self.position
+        if not 0 <= gap <= self.seek_min_gap and self.cap.set(cv2.CAP_PROP_POS_FRAMES, index):
+            self.seeks += 1
+        elif gap < 0:
+            return None
+        else:
+            for _ in range(gap):
+                if not self.cap.grab(): return None
+                self.grabbed += 1
+        ok, frame = self.cap.read()
+        if not ok: return None
+        self.retrieved += 1
+        self.position = index + 1
+        return frame
+
+    def frames(self):
+        """Yields the sampled BGR frames in order."""
+        for index in self.frame_indices():
+            frame = self.read_at(index)
+            if frame is None: return
+            yield frame
+
+    def batches(self, batch_size=VIDEO_SAMPLE_BATCH):
+        batch = []
+        for frame in self.frames():
+            batch.append(frame)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+class SceneSampler(VideoSampler):
+    """
+    VideoSampler whose detection cost follows visual change instead of duration:
+    - a sample within SCENE_SIMILAR of the last analyzed frame (thumbnail) is skipped,
+      so a long static shot costs one model call;
+    - consecutive samples more than SCENE_CUT apart (histogram) straddle a cut: the gap between them is
+      bisected (CUT_BISECT_DEPTH levels) and frames matching neither side are analyzed too,
+      so a short shot between two samples is not missed;
+    - at most max_detections frames are yielded, paced over the video (by the i-th sample,
+      i/n of the cap) so a busy opening cannot use them all.
+    - analyzed: indices of the yielded frames; skipped / capped / cut_samples count the rest.
+    """
+
+    def __init__(self, file_path, budget=VIDEO_FRAME_BUDGET, max_detections=VIDEO_DETECTION_CAP):
+        super().__init__(file_path, budget)
+        self.max_detections = max_detections
+        self.analyzed = []
+        self.skipped = self.capped = self.cut_samples = 0
+
+    def frames(self):
+        indices = self.frame_indices()
+        last = None      # signature of the last analyzed frame
+        previous = None  # (index, signature) of the previous sample
+        for n, index in enumerate(indices):
+            frame = self.read_at(index)
+            if frame is None: return
+            sample = (index, frame_signature(frame))
+            candidates = []
+            if previous and cut_distance(previous[1], sample[1]) > SCENE_CUT:
+                candidates.extend(self._cut_samples(previous, sample, CUT_BISECT_DEPTH))
+            candidates.append((index, frame, sample[1]))
+            previous = sample
+
+            allowance = math.ceil(self.max_detections * (n + 1) / len(indices))
+            for candidate_index, candidate, signature in candidates:
+                if last is not None and signature_distance(last, signature) <= SCENE_SIMILAR:
+                    self.skipped += 1
+                elif len(self.analyzed) >= allowance:
+                    self.capped += 1
+                else:
+                    last = signature
+                    self.analyzed.append(candidate_index)
+                    yield candidate
+
+    def _cut_samples(self, lo, hi, depth):
+        """(index, frame, signature) of frames between samples lo and hi that look like neither."""
+        (lo_index, lo_sig), (hi_index, hi_sig) = lo, hi
+        mid_index = (lo_index + hi_index) // 2
+        if depth == 0 or mid_index == lo_index: return []
+        frame = self.read_at(mid_index)
+        if frame is None: return []
+        self.cut_samples += 1
+        mid = (mid_index, frame_signature(frame))
+        new = signature_distance(lo_sig, mid[1]) > SCENE_SIMILAR and signature_distance(mid[1], hi_sig) > SCENE_SIMILAR
+        found = [(mid_index, frame, mid[1])] if new else []
+        if cut_distance(lo_sig, mid[1]) > SCENE_CUT: found = self._cut_samples(lo, mid, depth - 1) + found
+        if cut_distance(mid[1], hi_sig) > SCENE_CUT: found += self._cut_samples(mid, hi, depth - 1)
+        return found
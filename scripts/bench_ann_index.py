@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Face index types: recall@1 against exact flat search, plus QPS, build time and size.
+
+Builds each index kind with the same builder FAISSManager uses (build_index) over N
+synthetic faces: unit vectors scattered around N / FACES_PER_PERSON identities. Queries
+are new faces of indexed identities, searched in batches as search_faces would. recall@1
+is the fraction of queries whose top hit matches exact flat search's top hit.
+
+Usage:
+    uv run python scripts/bench_ann_index.py [N_FACES] [KINDS...]
+
+KINDS default to flat ivf_flat ivf_sq8 ivf_pq hnsw. No database involved.
+"""
+import sys
+import time
+
+import faiss
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from photosynth.utils.faiss_manager import (
+    MEMORY_BUDGET, NPROBE, EF_SEARCH, SIMILARITY_THRESHOLD,
+    build_index, bytes_per_vector, choose_index_type, index_spec, l2_normalized,
+)
+
+EMBEDDING_DIM = 512
+FACES_PER_PERSON = 20
+NOISE = 0.6          # per-face offset from its identity: two faces of one person have cosine ~0.74
+N_QUERIES = 2000
+QUERY_BATCH = 64
+CHUNK = 100_000
+console = Console()
+
+
+def synthetic_faces(rng, centers, n):
+    people = rng.integers(0, len(centers), n)
+    faces = np.empty((n, EMBEDDING_DIM), dtype=np.float32)
+    for start in range(0, n, CHUNK):
+        p = people[start:start + CHUNK]
+        noise = rng.standard_normal((len(p), EMBEDDING_DIM)).astype(np.float32)
+        faces[start:start + CHUNK] = centers[p] + noise * (NOISE / np.sqrt(EMBEDDING_DIM))
+    return l2_normalized(faces)
+
+
+def timed_search(index, queries):
+    start = time.perf_counter()
+    results = [index.search(queries[i:i + QUERY_BATCH], 1) for i in range(0, len(queries), QUERY_BATCH)]
+    elapsed = time.perf_counter() - start
+    scores = np.concatenate([d for d, _ in results])[:, 0]
+    ids = np.concatenate([i for _, i in results])[:, 0]
+    return scores, ids, len(queries) / elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    kinds = sys.argv[2:] or ['flat', 'ivf_flat', 'ivf_sq8', 'ivf_pq', 'hnsw']
+    rng = np.random.default_rng(0)
+
+    console.print(f"[bold blue]🧪 {n:,} synthetic faces ({n // FACES_PER_PERSON:,} people), {N_QUERIES:,} queries...[/bold blue]")
+    centers = l2_normalized(rng.standard_normal((max(1, n // FACES_PER_PERSON), EMBEDDING_DIM)))
+    faces = synthetic_faces(rng, centers, n)
+    face_ids = np.arange(1, n + 1, dtype=np.int64)
+    queries = synthetic_faces(rng, centers, N_QUERIES)
+    console.print(f"   auto choice at this size (budget {MEMORY_BUDGET / 2**20:,.0f} MB): "
+                  f"[bold]{choose_index_type(n, EMBEDDING_DIM)}[/bold]; FAISS threads: {faiss.omp_get_max_threads()}")
+
+    truth = None
+    if 'flat' in kinds:  # ground truth first, so every other row compares against it
+        kinds = ['flat'] + [k for k in kinds if k != 'flat']
+    else:
+        flat = build_index('flat', faces, face_ids)
+        truth = timed_search(flat, queries)
+        del flat
+
+    table = Table(title=f"Face index types ({n:,} faces, batches of {QUERY_BATCH}, nprobe={NPROBE}, efSearch={EF_SEARCH})")
+    table.add_column("Kind")
+    table.add_column("Index")
+    table.add_column("Build (s)", justify="right")
+    table.add_column("Size (MB)", justify="right")
+    table.add_column("Est. (MB)", justify="right")
+    table.add_column("QPS", justify="right")
+    table.add_column("Recall@1", justify="right")
+    table.add_column("Match decision agrees", justify="right")
+    for kind in kinds:
+        start = time.perf_counter()
+        index = build_index(kind, faces, face_ids)
+        build_seconds = time.perf_counter() - start
+        size = faiss.serialize_index(index).nbytes
+        scores, ids, qps = timed_search(index, queries)
+        if truth is None:
+            truth = (scores, ids, qps)
+        true_scores, true_ids, _ = truth
+        recall = (ids == true_ids).mean()
+        # What extract_faces_task acts on: known face (above threshold) or new face
+        agrees = ((scores >= SIMILARITY_THRESHOLD) == (true_scores >= SIMILARITY_THRESHOLD)).mean()
+        table.add_row(kind, index_spec(kind, EMBEDDING_DIM, n), f"{build_seconds:.1f}", f"{size / 2**20:,.0f}",
+                      f"{n * bytes_per_vector(kind, EMBEDDING_DIM) / 2**20:,.0f}", f"{qps:,.0f}",
+                      f"{recall:.4f}", f"{agrees:.4f}")
+        del index
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Detection throughput: per-file run_detection_pass vs batched run_detection_batch (files/s).
+
+1. DB writes (always): per file begin_stage + store_face_embeddings + complete_stage vs
+   begin_stages + complete_detections for a whole batch, on N_FILES synthetic files
+   with FACES_PER_FILE faces each. Stored face_ids and detection_data must match.
+2. Models (with DIR; needs the detection models): per file MediaFrame + _process_image vs
+   DECODE_THREADS-threaded load + Detector.detect_images per batch. Face counts and
+   objects must match; embeddings must agree (cosine).
+
+Usage:
+    uv run python scripts/bench_detection_batch.py [DIR] [BATCH]
+
+Writes synthetic rows (file_hash prefix 'bench-') and deletes them afterwards.
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from photosynth.db import PhotoSynthDB
+from photosynth.tasks import DETECT_BATCH_SIZE, DECODE_THREADS
+from photosynth.utils.media import MediaFrame
+
+EXTENSIONS = ['.jpg', '.jpeg', '.png', '.heic']
+EMBEDDING_DIM = 512
+N_FILES = 2000
+FACES_PER_FILE = 2
+MAX_IMAGES = 256
+console = Console()
+
+
+def cleanup(db):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("DELETE FROM faces WHERE file_hash LIKE 'bench-%%'")
+            c.execute("DELETE FROM media_files WHERE file_hash LIKE 'bench-%%'")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def stored(db):
+    """{file_hash: (face count, detection_data)} for the bench rows."""
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("""
+                SELECT m.file_hash, m.detection_data, count(f.face_id)
+                FROM media_files m LEFT JOIN faces f ON f.file_hash = m.file_hash
+                WHERE m.file_hash LIKE 'bench-%%' AND m.detection_status = 'COMPLETED'
+                GROUP BY m.file_hash, m.detection_data
+            """)
+            return {h: (n, {k: v for k, v in (data or {}).items() if k != 'face_ids'}, len((data or {}).get('face_ids', [])))
+                    for h, data, n in c.fetchall()}
+    finally:
+        conn.close()
+
+
+def synthetic_results(rng, n):
+    return [(f"bench-{i:08d}",
+             {"status": "SUCCESS", "face_count": FACES_PER_FILE, "known_people": [], "objects": ["person", "dog"], "is_video": False},
+             list(rng.standard_normal((FACES_PER_FILE, EMBEDDING_DIM)).astype(np.float32)))
+            for i in range(n)]
+
+
+def db_per_file(db, results):
+    for file_hash, data, embeddings in results:
+        db.begin_stage(file_hash, 'detection')
+        data = dict(data)
+        data['face_ids'] = db.store_face_embeddings(file_hash, embeddings)
+        db.complete_stage(file_hash, 'detection', data)
+
+
+def db_batched(db, results, batch):
+    for start in range(0, len(results), batch):
+        chunk = results[start:start + batch]
+        db.begin_stages([h for h, _, _ in chunk], 'detection')
+        db.complete_detections([(h, dict(data), embeddings, None) for h, data, embeddings in chunk])
+
+
+def bench_db(db, batch):
+    rng = np.random.default_rng(0)
+    results = synthetic_results(rng, N_FILES)
+    rows = []
+    snapshots = []
+    for name, run in [("Per file", lambda: db_per_file(db, results)),
+                      (f"Batched ({batch})", lambda: db_batched(db, results, batch))]:
+        cleanup(db)
+        db.batch_register_files([(h, f"bench/{h}.jpg") for h, _, _ in results])
+        start = time.perf_counter()
+        run()
+        rows.append((name, N_FILES / (time.perf_counter() - start)))
+        snapshots.append(stored(db))
+    cleanup(db)
+    return rows, snapshots[0] == snapshots[1] and len(snapshots[0]) == N_FILES
+
+
+def collect(directory):
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(directory) if "@eaDir" not in root
+        for name in names if Path(name).suffix.lower() in EXTENSIONS
+    )[:MAX_IMAGES]
+
+
+def load(path):
+    frame = MediaFrame.load(path)
+    frame.bgr
+    return frame
+
+
+def bench_models(paths, batch):
+    from photosynth.pipeline.detector import Detector
+    detector = Detector()
+    detector._process_image(paths[0], MediaFrame.load(paths[0]))  # warm-up (CUDA init, cuDNN autotune)
+
+    start = time.perf_counter()
+    single = [detector._process_image(p, MediaFrame.load(p)) for p in paths]
+    t_single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = []
+    with ThreadPoolExecutor(DECODE_THREADS) as pool:
+        for i in range(0, len(paths), batch):
+            batched += detector.detect_images(list(pool.map(load, paths[i:i + batch])))
+    t_batched = time.perf_counter() - start
+
+    same, cosines = 0, []
+    for a, b in zip(single, batched):
+        same += a.get('face_count') == b.get('face_count') and set(a.get('objects', [])) == set(b.get('objects', []))
+        for x, y in zip(a.get('faces', []), b.get('faces', [])):
+            cosines.append(float(np.dot(x, y) / (np.linalg.norm(x) * np.linalg.norm(y))))
+    rows = [("Per file", len(paths) / t_single), (f"Batched ({batch})", len(paths) / t_batched)]
+    return rows, same, min(cosines, default=1.0)
+
+
+def report(title, rows):
+    table = Table(title=title)
+    table.add_column("Path")
+    table.add_column("Files/s", justify="right")
+    for name, rate in rows:
+        table.add_row(name, f"{rate:,.1f}")
+    console.print(table)
+    console.print(f"   Speedup: {rows[1][1] / rows[0][1]:.1f}x")
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].isdigit() else None
+    batch = int(sys.argv[-1]) if len(sys.argv) > 1 and sys.argv[-1].isdigit() else DETECT_BATCH_SIZE
+    db = PhotoSynthDB()
+    ok = True
+
+    console.print(f"[bold blue]🧪 DB writes: {N_FILES:,} files, {FACES_PER_FILE} faces each...[/bold blue]")
+    rows, same = bench_db(db, batch)
+    report("Detection result writes", rows)
+    console.print("[green]✅ Same faces and detection_data.[/green]" if same else "[red]❌ Stored results differ.[/red]")
+    ok &= same
+
+    if directory:
+        paths = collect(directory)
+        console.print(f"[bold blue]🧪 Models: {len(paths)} images from {directory}...[/bold blue]")
+        rows, same, min_cosine = bench_models(paths, batch)
+        report("Detection (decode + faces + YOLO)", rows)
+        console.print(f"   Same face count and objects on {same}/{len(paths)} images; min embedding cosine {min_cosine:.4f}")
+        ok &= same == len(paths) and min_cosine > 0.99
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
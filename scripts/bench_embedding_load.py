@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Embedding load: get_all_embeddings + np.array vs the streaming load_embedding_matrix.
+Reports wall time and peak Python/numpy heap (tracemalloc) relative to the matrix size.
+libpq's client-side result buffer is not traced, so the legacy fetchall() peak is understated.
+
+Usage:
+    uv run python scripts/bench_embedding_load.py [N_EMBEDDINGS]
+
+Writes synthetic rows (file_hash prefix 'bench-') and deletes them afterwards.
+Run against an otherwise empty faces table for clean numbers.
+"""
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from photosynth.db import PhotoSynthDB
+
+EMBEDDING_DIM = 512
+FACES_PER_FILE = 4
+console = Console()
+
+
+def cleanup(db):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("DELETE FROM faces WHERE file_hash LIKE 'bench-%%'")
+            c.execute("DELETE FROM media_files WHERE file_hash LIKE 'bench-%%'")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def legacy_load(db):
+    face_data = db.get_all_embeddings()
+    face_ids = np.array([d[0] for d in face_data], dtype=np.int64)
+    embeddings = np.array([d[1] for d in face_data], dtype=np.float32)
+    return face_ids, embeddings
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    db = PhotoSynthDB()
+    cleanup(db)
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((n, EMBEDDING_DIM)).astype(np.float32)
+    hashes = [f"bench-{i // FACES_PER_FILE:08d}" for i in range(n)]
+    db.batch_register_files([(h, f"bench/{h}.jpg") for h in sorted(set(hashes))])
+    db.add_faces_bulk(list(zip(hashes, embeddings)))
+    del embeddings
+
+    console.print(f"[bold blue]🧪 Loading {n:,} embeddings ({EMBEDDING_DIM}-d) both ways...[/bold blue]")
+    (old_ids, old_emb), old_t, old_peak = measure(lambda: legacy_load(db))
+    (new_ids, new_emb), new_t, new_peak = measure(db.load_embedding_matrix)
+    matrix_bytes = new_emb.nbytes + new_ids.nbytes
+
+    table = Table(title=f"Embedding load ({n:,} faces, matrix {matrix_bytes / 1e6:.0f} MB)")
+    table.add_column("Loader")
+    table.add_column("Time (s)", justify="right")
+    table.add_column("Peak heap (MB)", justify="right")
+    table.add_column("x matrix", justify="right")
+    for name, t, peak in (("get_all_embeddings + np.array", old_t, old_peak),
+                          ("load_embedding_matrix", new_t, new_peak)):
+        table.add_row(name, f"{t:.2f}", f"{peak / 1e6:.0f}", f"{peak / matrix_bytes:.2f}")
+    console.print(table)
+
+    order = np.argsort(old_ids)  # get_all_embeddings has no ORDER BY
+    if np.array_equal(old_ids[order], new_ids) and np.array_equal(old_emb[order], new_emb):
+        console.print("[green]✅ Both loaders return identical ids and embeddings.[/green]")
+    else:
+        console.print("[red]❌ Loader outputs differ.[/red]")
+
+    cleanup(db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Known-face identification (Detector._identify_faces): per-image reload + Python loop vs
+the cached KnownFaceGallery (photosynth/utils/face_gallery.py).
+
+Seeds N_KNOWN named faces for N_PEOPLE synthetic people, then for simulated images of
+FACES_PER_IMAGE faces (known people and strangers):
+1. Before: get_known_faces() and a per-face, per-known-face np.dot/norm loop, every image.
+2. After: one gallery load, then one matrix multiply per image.
+3. Names must agree with an exhaustive best-match over every known face. Every
+   UNKNOWN_EVERY-th person is left 'Unknown': matched like the others, never reported.
+4. A face of an 'Unknown' person must not take the name of a lookalike it is less
+   similar to, as with the old loop (which skipped Unknown only after the best match).
+5. Renaming a person must bump cluster_version and reach identify() after the reload.
+
+Usage:
+    uv run python scripts/bench_face_gallery.py [N_KNOWN] [N_PEOPLE]
+
+Writes synthetic rows (file_hash prefix 'bench-', cluster ids >= BENCH_CLUSTER_BASE) and deletes them afterwards.
+"""
+import sys
+import time
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from photosynth.db import PhotoSynthDB
+from photosynth.utils.face_gallery import KnownFaceGallery, MATCH_THRESHOLD
+
+EMBEDDING_DIM = 512
+EMBEDDING_NORM = 20.0  # InsightFace embeddings are not unit length
+NOISE = 0.8            # per-face offset from its identity: two faces of one person have cosine ~0.6
+FACES_PER_IMAGE = 3
+N_IMAGES = 1000
+LOOP_IMAGES = 2        # the old loop is timed on this many images only
+UNKNOWN_EVERY = 10     # people left unnamed ('Unknown', as clustering creates them)
+LOOKALIKE_FACES = 20
+BENCH_CLUSTER_BASE = 1_000_000_000
+console = Console()
+
+
+def cleanup(db):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("DELETE FROM faces WHERE file_hash LIKE 'bench-%%'")
+            c.execute("DELETE FROM media_files WHERE file_hash LIKE 'bench-%%'")
+            c.execute("DELETE FROM people WHERE cluster_id >= %s", (BENCH_CLUSTER_BASE,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def faces_of(rng, identities, people):
+    noise = rng.standard_normal((len(people), EMBEDDING_DIM)).astype(np.float32) * (NOISE / np.sqrt(EMBEDDING_DIM))
+    faces = identities[people] + noise
+    return EMBEDDING_NORM * faces / np.linalg.norm(faces, axis=1, keepdims=True)
+
+
+def seed(db, rng, identities, n_known):
+    people = rng.integers(0, len(identities), n_known)
+    hashes = [f"bench-{i // 4:08d}" for i in range(n_known)]
+    db.batch_register_files([(h, f"bench/{h}.jpg") for h in sorted(set(hashes))])
+    db.add_faces_bulk(list(zip(hashes, faces_of(rng, identities, people))))
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("SELECT face_id FROM faces WHERE file_hash LIKE 'bench-%%' ORDER BY face_id")
+            face_ids = np.array([r[0] for r in c.fetchall()])
+    finally:
+        conn.close()
+    db.assign_clusters(face_ids, BENCH_CLUSTER_BASE + people)
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("UPDATE people SET name = 'bench-person-' || (cluster_id - %s) WHERE cluster_id >= %s",
+                      (BENCH_CLUSTER_BASE, BENCH_CLUSTER_BASE))
+            c.execute("UPDATE people SET name = 'Unknown' WHERE cluster_id >= %s AND (cluster_id - %s) %% %s = 1",
+                      (BENCH_CLUSTER_BASE, BENCH_CLUSTER_BASE, UNKNOWN_EVERY))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def old_identify(db, faces):
+    """Detector._identify_faces before the gallery."""
+    known_faces = db.get_known_faces()
+    found_names = set()
+    for curr_emb in faces:
+        best_score, best_name = 0.0, None
+        for _, name, known_emb in known_faces:
+            score = np.dot(curr_emb, known_emb) / (np.linalg.norm(curr_emb) * np.linalg.norm(known_emb))
+            if score > MATCH_THRESHOLD and score > best_score:
+                best_score, best_name = score, name
+        if best_name and best_name != "Unknown":
+            found_names.add(best_name)
+    return found_names
+
+
+def blocks_lookalike(db, rng, gallery, identities):
+    """Faces of 'Unknown' cluster 1 next to a named lookalike: no name, old loop and gallery alike."""
+    lookalike = identities[1] + 0.5 * rng.standard_normal(EMBEDDING_DIM).astype(np.float32) / np.sqrt(EMBEDDING_DIM)
+    lookalike /= np.linalg.norm(lookalike)
+    hashes = [f"bench-lookalike-{i:04d}" for i in range(LOOKALIKE_FACES)]
+    db.batch_register_files([(h, f"bench/{h}.jpg") for h in hashes])
+    db.add_faces_bulk(list(zip(hashes, faces_of(rng, lookalike[None], np.zeros(LOOKALIKE_FACES, dtype=np.int64)))))
+    cluster = BENCH_CLUSTER_BASE + len(identities)
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("SELECT face_id FROM faces WHERE file_hash LIKE 'bench-lookalike-%%' ORDER BY face_id")
+            face_ids = np.array([r[0] for r in c.fetchall()])
+    finally:
+        conn.close()
+    db.assign_clusters(face_ids, np.full(len(face_ids), cluster))
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("UPDATE people SET name = 'bench-lookalike' WHERE cluster_id = %s", (cluster,))
+        conn.commit()
+    finally:
+        conn.close()
+
+    gallery.refresh(force=True)
+    probes = faces_of(rng, identities, np.ones(20, dtype=np.int64))
+    lookalike_probes = faces_of(rng, lookalike[None], np.zeros(5, dtype=np.int64))
+    # The lookalike must be a match on its own, or the check proves nothing
+    return (all(gallery.identify(p[None]) == [] and old_identify(db, p[None]) == set() for p in probes)
+            and gallery.identify(lookalike_probes) == ['bench-lookalike'])
+
+
+def main():
+    n_known = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_people = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    db = PhotoSynthDB()
+    cleanup(db)
+    rng = np.random.default_rng(0)
+    identities = rng.standard_normal((n_people * 2, EMBEDDING_DIM)).astype(np.float32)
+    identities /= np.linalg.norm(identities, axis=1, keepdims=True)  # second half: strangers
+
+    console.print(f"[bold blue]🧪 Seeding {n_known:,} known faces of {n_people:,} people...[/bold blue]")
+    seed(db, rng, identities[:n_people], n_known)
+    images = [faces_of(rng, identities, rng.integers(0, 2 * n_people, FACES_PER_IMAGE)) for _ in range(N_IMAGES)]
+
+    timings = []
+    start = time.perf_counter()
+    for faces in images[:LOOP_IMAGES]:
+        old_identify(db, faces)
+    timings.append(("Before: reload + Python loop, per image", (time.perf_counter() - start) / LOOP_IMAGES))
+
+    gallery = KnownFaceGallery(db)
+    start = time.perf_counter()
+    gallery.refresh(force=True)
+    timings.append((f"Gallery load ({len(gallery):,} rows), once per cluster_version", time.perf_counter() - start))
+    start = time.perf_counter()
+    found = [gallery.identify(faces) for faces in images]
+    timings.append(("After: gallery identify, per image", (time.perf_counter() - start) / N_IMAGES))
+
+    # Exhaustive reference: best match over every known face, as the old loop decides
+    names, cluster_ids, known, _ = db.load_known_faces()
+    known /= np.linalg.norm(known, axis=1, keepdims=True)
+    agree = 0
+    for faces, names_found in zip(images, found):
+        scores = (faces / np.linalg.norm(faces, axis=1, keepdims=True)) @ known.T
+        best = scores.argmax(axis=1)
+        expected = {names[int(cluster_ids[b])] for b, s in zip(best, scores[np.arange(len(best)), best]) if s > MATCH_THRESHOLD}
+        agree += expected - {None, 'Unknown'} == set(names_found)
+
+    # An 'Unknown' person (cluster 1) and a named lookalike of them: the Unknown match wins
+    unknown_ok = blocks_lookalike(db, rng, gallery, identities)
+
+    # A rename in the face tagger must reach the gallery on its next version check
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("UPDATE people SET name = 'bench-renamed' WHERE cluster_id = %s", (BENCH_CLUSTER_BASE,))
+        conn.commit()
+    finally:
+        conn.close()
+    probe = faces_of(rng, identities, np.zeros(1, dtype=np.int64))
+    gallery.last_check = 0.0
+    renamed = gallery.identify(probe) == ['bench-renamed']
+    cleanup(db)
+
+    table = Table(title=f"Known-face identification ({n_known:,} known faces, {FACES_PER_IMAGE} faces per image)")
+    table.add_column("Step")
+    table.add_column("Time (ms)", justify="right")
+    for name, t in timings:
+        table.add_row(name, f"{1000 * t:.2f}")
+    console.print(table)
+    console.print(f"   Speedup per image: {timings[0][1] / timings[2][1]:,.0f}x")
+    console.print(f"   Names agree with the exhaustive match on {agree}/{N_IMAGES} images")
+    console.print("[green]✅ Unknown person blocks their lookalike's name (as before).[/green]" if unknown_ok
+                  else "[red]❌ Unknown person differs from the old loop.[/red]")
+    console.print("[green]✅ Rename reached the gallery.[/green]" if renamed else "[red]❌ Rename not picked up.[/red]")
+    sys.exit(0 if renamed and unknown_ok and agree >= 0.99 * N_IMAGES else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Face-embedding ingestion: per-row add_face vs binary COPY (add_faces_bulk).
+
+Usage:
+    uv run python scripts/bench_face_ingest.py [N_EMBEDDINGS]
+
+Writes synthetic rows (file_hash prefix 'bench-') and deletes them afterwards.
+"""
+import sys
+import time
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from photosynth.db import PhotoSynthDB
+
+EMBEDDING_DIM = 512
+FACES_PER_FILE = 4
+console = Console()
+
+
+def cleanup(db):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("DELETE FROM faces WHERE file_hash LIKE 'bench-%%'")
+            c.execute("DELETE FROM media_files WHERE file_hash LIKE 'bench-%%'")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    db = PhotoSynthDB()
+    cleanup(db)
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((n, EMBEDDING_DIM)).astype(np.float32)
+    hashes = [f"bench-{i // FACES_PER_FILE:08d}" for i in range(n)]
+    db.batch_register_files([(h, f"bench/{h}.jpg") for h in sorted(set(hashes))])
+
+    console.print(f"[bold blue]🧪 Inserting {n:,} embeddings ({EMBEDDING_DIM}-d) both ways...[/bold blue]")
+
+    start = time.perf_counter()
+    for h, emb in zip(hashes, embeddings):
+        db.add_face(h, emb)
+    per_row = time.perf_counter() - start
+    cleanup(db)
+    db.batch_register_files([(h, f"bench/{h}.jpg") for h in sorted(set(hashes))])
+
+    start = time.perf_counter()
+    db.add_faces_bulk(list(zip(hashes, embeddings)))
+    bulk = time.perf_counter() - start
+
+    table = Table(title=f"Face ingestion ({n:,} embeddings)")
+    table.add_column("Path")
+    table.add_column("Total (s)", justify="right")
+    table.add_column("rows / s", justify="right")
+    for name, t in (("add_face (per row)", per_row), ("add_faces_bulk (COPY)", bulk)):
+        table.add_row(name, f"{t:.2f}", f"{n / t:,.0f}")
+    console.print(table)
+    console.print(f"   Speedup: [bold]{per_row / bulk:.1f}x[/bold]")
+
+    cleanup(db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Face search: per-face search_face loop vs one batched search_faces call, on CPU.
+
+Builds an in-memory FAISSManager index of N random unit vectors (no database) and
+queries it with noisy copies of indexed faces, as extract_faces_task would for the
+faces of one image (small batches) or of many images (large batches).
+
+Usage:
+    uv run python scripts/bench_face_search.py [N_INDEXED] [BATCH_SIZES...]
+
+The loop timing is measured on up to LOOP_SAMPLE queries and scaled to the batch size
+(every single-query search scans the whole index, so its cost is flat per query).
+"""
+import sys
+import tempfile
+import time
+
+import faiss
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from photosynth.utils.faiss_manager import FAISSManager
+
+EMBEDDING_DIM = 512
+BUILD_CHUNK = 100_000
+LOOP_SAMPLE = 8
+console = Console()
+
+
+def unit_vectors(rng, n):
+    v = rng.standard_normal((n, EMBEDDING_DIM)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def build_manager(index_dir, n, rng):
+    manager = FAISSManager(index_dir)
+    index = faiss.IndexIDMap2(faiss.IndexFlatIP(EMBEDDING_DIM))
+    for start in range(0, n, BUILD_CHUNK):
+        count = min(BUILD_CHUNK, n - start)
+        index.add_with_ids(unit_vectors(rng, count), np.arange(start + 1, start + count + 1, dtype=np.int64))
+    manager.index = index
+    manager.watermark = n
+    manager.cluster_of = rng.integers(0, 10_000, n + 1).astype(np.int32)
+    manager.last_sync = float('inf')  # benchmark the search only, no DB sync
+    return manager
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    batch_sizes = [int(b) for b in sys.argv[2:]] or [1, 4, 16, 64, 256]
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        console.print(f"[bold blue]🧪 Building a {n:,}-face index ({n * EMBEDDING_DIM * 4 / 1e9:.1f} GB)...[/bold blue]")
+        manager = build_manager(index_dir, n, rng)
+        console.print(f"   FAISS threads: {faiss.omp_get_max_threads()}")
+
+        table = Table(title=f"Face search on CPU ({n:,} indexed faces)")
+        table.add_column("Faces per call", justify="right")
+        table.add_column("Loop search_face (ms/face)", justify="right")
+        table.add_column("search_faces (ms/face)", justify="right")
+        table.add_column("Speedup", justify="right")
+        for batch in batch_sizes:
+            ids = rng.integers(1, n + 1, batch)
+            queries = np.stack([manager.index.reconstruct(int(i)) for i in ids])
+            queries += 0.02 * rng.standard_normal(queries.shape).astype(np.float32)
+
+            sample = queries[:LOOP_SAMPLE]
+            start = time.perf_counter()
+            loop_matches = [manager.search_face(q) for q in sample]
+            loop_per_face = (time.perf_counter() - start) / len(sample)
+
+            start = time.perf_counter()
+            face_ids, cluster_ids, _ = manager.search_faces(queries)
+            batch_per_face = (time.perf_counter() - start) / batch
+
+            # Same answers both ways
+            assert [m for m, _ in loop_matches] == face_ids[:LOOP_SAMPLE, 0].tolist()
+            assert [c for _, c in loop_matches] == cluster_ids[:LOOP_SAMPLE, 0].tolist()
+
+            table.add_row(f"{batch:,}", f"{1000 * loop_per_face:.1f}", f"{1000 * batch_per_face:.2f}",
+                          f"{loop_per_face / batch_per_face:.1f}x")
+        console.print(table)
+
+
+if __name__ == "__main__":
+    main()
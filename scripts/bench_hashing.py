@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Compares the full-resolution pHash decode against the reduced-resolution fast path.
+
+Usage:
+    uv run python scripts/bench_hashing.py [DIR ...]
+
+Without arguments a set of synthetic 24 MP JPEGs is generated in a temp dir.
+"""
+import os
+import sys
+import time
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+import cv2
+import imagehash
+import numpy as np
+from PIL import Image
+from rich.console import Console
+from rich.table import Table
+
+from photosynth.utils.hashing import (
+    _compute_content_hash, HASH_TOLERANCE_BITS, VIDEO_EXTENSIONS
+)
+
+EXTENSIONS = ['.jpg', '.jpeg', '.png', '.arw', '.heic']
+SYNTHETIC_COUNT = 20
+SYNTHETIC_SIZE = (6000, 4000)  # 24 MP
+
+console = Console()
+
+
+def make_synthetic(out_dir):
+    """Smooth blobs + shapes + sensor noise, saved as camera-sized JPEGs."""
+    rng = np.random.default_rng(0)
+    w, h = SYNTHETIC_SIZE
+    paths = []
+    for i in range(SYNTHETIC_COUNT):
+        base = (rng.random((h // 100, w // 100, 3)) * 255).astype(np.uint8)
+        img = cv2.resize(base, (w, h), interpolation=cv2.INTER_CUBIC)
+        for _ in range(30):
+            color = tuple(int(c) for c in rng.integers(0, 255, 3))
+            center = tuple(int(c) for c in rng.integers(0, min(w, h), 2))
+            cv2.circle(img, center, int(rng.integers(20, 600)), color, -1)
+        img = np.clip(img + rng.normal(0, 8, img.shape), 0, 255).astype(np.uint8)
+        path = os.path.join(out_dir, f"synthetic_{i:03d}.jpg")
+        Image.fromarray(img).save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def collect(dirs):
+    files = []
+    for d in dirs:
+        for root, _, names in os.walk(d):
+            if "@eaDir" in root: continue
+            for name in names:
+                ext = Path(name).suffix.lower()
+                if ext in EXTENSIONS or ext in VIDEO_EXTENSIONS:
+                    files.append(os.path.join(root, name))
+    return sorted(files)
+
+
+def timed(paths, fast):
+    hashes = {}
+    start = time.perf_counter()
+    for p in paths:
+        hashes[p] = _compute_content_hash(p, fast=fast)
+    return hashes, time.perf_counter() - start
+
+
+def main():
+    tmp = None
+    if len(sys.argv) > 1:
+        paths = collect(sys.argv[1:])
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        console.print(f"   Generating {SYNTHETIC_COUNT} synthetic {SYNTHETIC_SIZE[0]}x{SYNTHETIC_SIZE[1]} JPEGs...")
+        paths = make_synthetic(tmp.name)
+
+    if not paths:
+        console.print("[yellow]No files found.[/yellow]")
+        return
+
+    console.print(f"[bold blue]⏱️  Hashing {len(paths)} files with both decode paths...[/bold blue]")
+    full, t_full = timed(paths, fast=False)
+    fast, t_fast = timed(paths, fast=True)
+
+    distances = Counter()
+    for p in paths:
+        if full[p] and fast[p]:
+            d = imagehash.hex_to_hash(full[p]) - imagehash.hex_to_hash(fast[p])
+            distances[d] += 1
+
+    table = Table(title="pHash decode paths")
+    table.add_column("Path")
+    table.add_column("Total (s)", justify="right")
+    table.add_column("ms / file", justify="right")
+    table.add_column("files / s", justify="right")
+    for name, t in (("full", t_full), ("fast", t_fast)):
+        table.add_row(name, f"{t:.2f}", f"{1000 * t / len(paths):.1f}", f"{len(paths) / t:.1f}")
+    console.print(table)
+    console.print(f"   Speedup: [bold]{t_full / t_fast:.2f}x[/bold]")
+
+    compared = sum(distances.values())
+    identical = distances.get(0, 0)
+    worst = max(distances) if distances else 0
+    console.print(f"   Identical hashes: {identical}/{compared}")
+    console.print(f"   Hamming distance histogram: {dict(sorted(distances.items()))}")
+    if worst <= HASH_TOLERANCE_BITS:
+        console.print(f"[green]✅ Max drift {worst} bits (tolerance {HASH_TOLERANCE_BITS}).[/green]")
+    else:
+        console.print(f"[red]❌ Max drift {worst} bits exceeds tolerance {HASH_TOLERANCE_BITS}.[/red]")
+
+    if tmp: tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
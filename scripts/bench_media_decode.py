@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Image loading for one detection task: per-consumer reads vs one shared MediaFrame.
+
+Before, a task hashed the file (draft decode from disk), cv2.imread it for InsightFace
+and handed YOLO the path, which read and decoded it again before letterboxing to 640.
+After, MediaFrame reads the bytes once and decodes once; YOLO gets the decoded array.
+Both paths must give the same pHash; the decoded pixels are compared with cv2.imread.
+
+Usage:
+    uv run python scripts/bench_media_decode.py [DIR ...]
+
+Without arguments synthetic 24 MP JPEGs (and a HEIC) are generated in a temp dir.
+Bytes read come from /proc/self/io (rchar), so they count page-cache hits as NFS would not.
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+from rich.console import Console
+from rich.table import Table
+
+from photosynth.utils.hashing import _compute_content_hash
+from photosynth.utils.media import MediaFrame
+
+EXTENSIONS = ['.jpg', '.jpeg', '.png', '.arw', '.heic']
+SYNTHETIC_COUNT = 6
+SYNTHETIC_SIZE = (6000, 4000)  # 24 MP
+YOLO_INPUT = 640
+
+console = Console()
+
+
+def make_synthetic(out_dir):
+    """Smooth blobs + shapes + sensor noise, saved as camera-sized JPEGs, plus one HEIC."""
+    rng = np.random.default_rng(0)
+    w, h = SYNTHETIC_SIZE
+    paths = []
+    for i in range(SYNTHETIC_COUNT):
+        base = (rng.random((h // 100, w // 100, 3)) * 255).astype(np.uint8)
+        img = cv2.resize(base, (w, h), interpolation=cv2.INTER_CUBIC)
+        for _ in range(30):
+            color = tuple(int(c) for c in rng.integers(0, 255, 3))
+            center = tuple(int(c) for c in rng.integers(0, min(w, h), 2))
+            cv2.circle(img, center, int(rng.integers(20, 600)), color, -1)
+        img = np.clip(img + rng.normal(0, 8, img.shape), 0, 255).astype(np.uint8)
+        ext = '.heic' if i == SYNTHETIC_COUNT - 1 else '.jpg'
+        path = os.path.join(out_dir, f"synthetic_{i:03d}{ext}")
+        Image.fromarray(img).save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def collect(dirs):
+    return sorted(
+        os.path.join(root, name)
+        for d in dirs for root, _, names in os.walk(d) if "@eaDir" not in root
+        for name in names if Path(name).suffix.lower() in EXTENSIONS
+    )
+
+
+def bytes_read():
+    with open('/proc/self/io') as f:
+        return int(next(line for line in f if line.startswith('rchar')).split()[1])
+
+
+def letterbox(bgr):
+    """YOLO's resize of its input to YOLO_INPUT on the longer side."""
+    h, w = bgr.shape[:2]
+    ratio = YOLO_INPUT / max(h, w)
+    return cv2.resize(bgr, (round(w * ratio), round(h * ratio)), interpolation=cv2.INTER_LINEAR)
+
+
+def before(path):
+    file_hash = _compute_content_hash(path)
+    image = cv2.imread(path)                # InsightFace input (None for HEIC)
+    yolo = cv2.imread(path)                 # YOLO loads the path itself...
+    if yolo is not None: letterbox(yolo)    # ...and resizes the full frame
+    return file_hash, image
+
+
+def after(path):
+    frame = MediaFrame.load(path)
+    file_hash = _compute_content_hash(path, frame=frame)
+    image = frame.bgr
+    letterbox(image)
+    return file_hash, image
+
+
+def measure(fn, path):
+    start_bytes, start = bytes_read(), time.perf_counter()
+    result = fn(path)
+    return result, time.perf_counter() - start, bytes_read() - start_bytes
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        if len(sys.argv) > 1:
+            paths = collect(sys.argv[1:])
+        else:
+            console.print(f"[bold blue]🧪 Generating {SYNTHETIC_COUNT} synthetic 24 MP images...[/bold blue]")
+            paths = make_synthetic(tmp)
+
+        table = Table(title="Image loading per detection task")
+        table.add_column("File")
+        table.add_column("MB", justify="right")
+        table.add_column("Before (ms)", justify="right")
+        table.add_column("Before read (MB)", justify="right")
+        table.add_column("After (ms)", justify="right")
+        table.add_column("After read (MB)", justify="right")
+        table.add_column("Same pHash")
+        table.add_column("Pixels vs cv2.imread", justify="right")
+        totals = np.zeros(2)
+        ok = True
+        for path in paths:
+            (hash_before, image_before), t_before, read_before = measure(before, path)
+            (hash_after, image_after), t_after, read_after = measure(after, path)
+            same = hash_before == hash_after
+            ok &= same
+            if image_before is None:
+                pixels = "cv2 can't decode"
+            elif image_before.shape != image_after.shape:
+                pixels = f"shape {image_after.shape} vs {image_before.shape}"
+            else:
+                pixels = f"mean |Δ| {np.abs(image_before.astype(np.int16) - image_after).mean():.2f}"
+            totals += (t_before, t_after)
+            table.add_row(os.path.basename(path), f"{os.path.getsize(path) / 1e6:.1f}",
+                          f"{1000 * t_before:.0f}", f"{read_before / 1e6:.1f}",
+                          f"{1000 * t_after:.0f}", f"{read_after / 1e6:.1f}",
+                          "[green]✅[/green]" if same else "[red]❌[/red]", pixels)
+        console.print(table)
+        console.print(f"   Total: {totals[0]:.2f}s before, {totals[1]:.2f}s after ({totals[0] / totals[1]:.1f}x)")
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Lookup latency of the near-duplicate pHash index vs a brute-force scan.
+
+Usage:
+    uv run python scripts/bench_near_dup.py [N_HASHES] [RADIUS]
+"""
+import sys
+import time
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from photosynth.utils.near_dup import HammingIndex, hamming_distances, NEAR_DUP_RADIUS
+
+N_QUERIES = 1000
+console = Console()
+
+
+def perturb(rng, value, bits):
+    for b in rng.choice(64, size=bits, replace=False):
+        value ^= 1 << int(b)
+    return value
+
+
+def percentiles(samples):
+    arr = np.array(samples) * 1000
+    return np.percentile(arr, 50), np.percentile(arr, 99)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    radius = int(sys.argv[2]) if len(sys.argv) > 2 else NEAR_DUP_RADIUS
+    rng = np.random.default_rng(0)
+
+    console.print(f"[bold blue]🧪 Building index over {n:,} hashes (radius {radius})...[/bold blue]")
+    values = rng.integers(0, 2 ** 63, size=n, dtype=np.uint64) * np.uint64(2) + rng.integers(0, 2, size=n, dtype=np.uint64)
+    hex_hashes = [f"{int(v):016x}" for v in values]
+
+    index = HammingIndex(max_radius=radius)
+    start = time.perf_counter()
+    index.add_many(hex_hashes)
+    index.compact()
+    build = time.perf_counter() - start
+
+    # Half the queries are planted near-duplicates, half are random misses
+    queries = []
+    for i in range(N_QUERIES):
+        if i % 2 == 0:
+            base = int(values[rng.integers(0, n)])
+            queries.append(f"{perturb(rng, base, int(rng.integers(0, radius + 1))):016x}")
+        else:
+            queries.append(f"{int(rng.integers(0, 2 ** 63, dtype=np.uint64)) * 2:016x}")
+
+    mih_times, brute_times, misses = [], [], 0
+    for q in queries:
+        t = time.perf_counter()
+        found = {h for h, _ in index.search(q, radius)}
+        mih_times.append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        d = hamming_distances(index.hashes, int(q, 16))
+        expected = {f"{int(index.hashes[i]):016x}" for i in np.nonzero(d <= radius)[0]}
+        brute_times.append(time.perf_counter() - t)
+
+        misses += len(expected - found)
+
+    table = Table(title=f"Near-duplicate lookup @ {n:,} hashes, radius {radius}")
+    table.add_column("Method")
+    table.add_column("p50 (ms)", justify="right")
+    table.add_column("p99 (ms)", justify="right")
+    for name, samples in (("multi-index", mih_times), ("brute force", brute_times)):
+        p50, p99 = percentiles(samples)
+        table.add_row(name, f"{p50:.3f}", f"{p99:.3f}")
+    console.print(table)
+    console.print(f"   Build time: {build:.2f}s, index size: {index.hashes.nbytes / 1e6:.1f} MB of hashes")
+    if misses:
+        console.print(f"[red]❌ {misses} neighbours missed by the index.[/red]")
+    else:
+        console.print("[green]✅ Index results match brute force exactly.[/green]")
+
+
+if __name__ == "__main__":
+    main()
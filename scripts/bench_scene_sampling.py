@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Video detection frame selection: every sampled frame (VideoSampler) vs scene-aware
+selection (SceneSampler), on synthetic videos made of known shots.
+
+Model calls are what Detector._process_video spends per analyzed frame (InsightFace +
+YOLO); coverage is the number of shots with at least one analyzed frame. Selection
+time is decode + change detection, without the models.
+
+Usage:
+    uv run python scripts/bench_scene_sampling.py [--cap N]
+
+Needs PyAV for H.264 encoding (1 s keyframe interval), otherwise OpenCV's MPEG-4 is used.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from photosynth.utils.video import VIDEO_DETECTION_CAP, SceneSampler, VideoSampler
+
+try:
+    import av
+except ImportError:
+    av = None
+
+FPS = 30
+WIDTH, HEIGHT = 640, 360
+KINDS = ['static', 'motion', 'pan']
+console = Console()
+
+
+def vlog(rng):
+    """Mixed shot lengths (some shorter than the 5 s sampling interval) and kinds, ~3 minutes."""
+    shots, total = [], 0.0
+    while total < 180:
+        seconds = float(rng.choice([1.5, 3, 8, 15, 25]))
+        shots.append((seconds, str(rng.choice(KINDS))))
+        total += seconds
+    return shots
+
+
+VIDEOS = {  # name -> rng -> [(seconds, kind)]
+    "interview_5min": lambda rng: [(60, 'static'), (45, 'static'), (60, 'static'), (75, 'static'), (60, 'static')],
+    "vlog_3min": vlog,
+    "montage_1min": lambda rng: [(float(rng.choice([1, 1.5, 2.5])), 'motion') for _ in range(36)],
+}
+
+
+def shot_frames(rng, seconds, kind, noise):
+    base = cv2.resize((rng.random((HEIGHT // 40, WIDTH // 40, 3)) * 255).astype(np.uint8),
+                      (WIDTH, HEIGHT), interpolation=cv2.INTER_CUBIC)
+    color = tuple(int(c) for c in rng.integers(0, 255, 3))
+    for i in range(int(seconds * FPS)):
+        frame = np.roll(base, -4 * i, axis=1) if kind == 'pan' else base.copy()
+        if kind == 'motion':
+            cv2.circle(frame, (int(WIDTH * (0.2 + 0.6 * ((i * 5) % WIDTH) / WIDTH)), HEIGHT // 2), HEIGHT // 5, color, -1)
+        else:  # a head that moves a little while talking
+            cv2.circle(frame, (WIDTH // 2 + int(6 * np.sin(i / 10)), HEIGHT // 2), HEIGHT // 8, color, -1)
+        yield cv2.add(frame, noise[i % len(noise)])  # sensor noise
+
+
+def make_video(path, shots, rng):
+    noise = [rng.integers(0, 6, (HEIGHT, WIDTH, 3), dtype=np.uint8) for _ in range(8)]
+    frames = (f for seconds, kind in shots for f in shot_frames(rng, seconds, kind, noise))
+    if av:
+        with av.open(path, 'w') as container:
+            stream = container.add_stream('libx264', rate=FPS)
+            stream.width, stream.height, stream.pix_fmt = WIDTH, HEIGHT, 'yuv420p'
+            stream.options = {'g': str(FPS), 'preset': 'ultrafast', 'crf': '23'}
+            for frame in frames:
+                container.mux(stream.encode(av.VideoFrame.from_ndarray(frame, format='bgr24')))
+            container.mux(stream.encode())
+    else:
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), FPS, (WIDTH, HEIGHT))
+        for frame in frames:
+            writer.write(frame)
+        writer.release()
+
+
+def covered(shots, indices):
+    bounds = np.cumsum([0] + [int(seconds * FPS) for seconds, _ in shots])
+    hit = np.zeros(len(shots), dtype=bool)
+    hit[np.searchsorted(bounds, np.asarray(indices, dtype=np.int64), side='right') - 1] = True
+    return int(hit.sum())
+
+
+def run(sampler):
+    start = time.perf_counter()
+    with sampler:
+        n = sum(1 for _ in sampler.frames())
+    return n, time.perf_counter() - start
+
+
+def main():
+    cap = VIDEO_DETECTION_CAP
+    if '--cap' in sys.argv:
+        cap = int(sys.argv[sys.argv.index('--cap') + 1])
+    rng = np.random.default_rng(0)
+
+    table = Table(title=f"Video detection frame selection (cap {cap} model calls per video)")
+    table.add_column("Video")
+    table.add_column("Length (s)", justify="right")
+    table.add_column("Shots", justify="right")
+    table.add_column("Before: model calls", justify="right")
+    table.add_column("Before: shots covered", justify="right")
+    table.add_column("Before: select (s)", justify="right")
+    table.add_column("After: model calls", justify="right")
+    table.add_column("After: shots covered", justify="right")
+    table.add_column("After: select (s)", justify="right")
+    table.add_column("Skipped / capped / cut samples", justify="right")
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        console.print(f"[bold blue]🧪 Encoding {len(VIDEOS)} synthetic videos ({'H.264' if av else 'MPEG-4'})...[/bold blue]")
+        for name, make_shots in VIDEOS.items():
+            shots = make_shots(rng)
+            path = os.path.join(tmp, f"{name}.mp4")
+            make_video(path, shots, rng)
+
+            fixed = VideoSampler(path)
+            fixed_indices = list(fixed.frame_indices())
+            fixed_calls, t_fixed = run(fixed)
+            scene = SceneSampler(path, max_detections=cap)
+            scene_calls, t_scene = run(scene)
+            before_covered, after_covered = covered(shots, fixed_indices[:fixed_calls]), covered(shots, scene.analyzed)
+            ok &= scene_calls <= cap and after_covered >= min(before_covered, cap)
+            table.add_row(name, f"{sum(s for s, _ in shots):.0f}", str(len(shots)),
+                          str(fixed_calls), f"{before_covered}/{len(shots)}", f"{t_fixed:.2f}",
+                          str(scene_calls), f"{after_covered}/{len(shots)}", f"{t_scene:.2f}",
+                          f"{scene.skipped} / {scene.capped} / {scene.cut_samples}")
+    console.print(table)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
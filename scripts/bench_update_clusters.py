@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Cluster assignment write: per-face execute_batch (old update_clusters) vs the set-based
+assign_clusters (binary COPY -> temp table -> UPDATE ... FROM).
+
+Usage:
+    uv run python scripts/bench_update_clusters.py [N_FACES] [K]
+
+Writes synthetic rows (file_hash prefix 'bench-', people ids >= BENCH_CLUSTER_BASE)
+and deletes them afterwards.
+"""
+import sys
+import time
+
+import numpy as np
+import psycopg2.extras
+from rich.console import Console
+from rich.table import Table
+
+from photosynth.db import PhotoSynthDB
+
+EMBEDDING_DIM = 8  # Embedding size is irrelevant to the cluster write; keep setup fast
+FACES_PER_FILE = 4
+BENCH_CLUSTER_BASE = 1_000_000_000
+console = Console()
+
+
+def cleanup(db):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("DELETE FROM faces WHERE file_hash LIKE 'bench-%%'")
+            c.execute("DELETE FROM media_files WHERE file_hash LIKE 'bench-%%'")
+            c.execute("DELETE FROM people WHERE cluster_id >= %s", (BENCH_CLUSTER_BASE,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def legacy_update_clusters(db, cluster_map):
+    """The pre-COPY implementation: one UPDATE per face, one INSERT per cluster."""
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            psycopg2.extras.execute_batch(c, 'UPDATE faces SET cluster_id = %s WHERE face_id = %s', cluster_map)
+            for c_id in set(c_id for c_id, f_id in cluster_map if c_id != -1):
+                c.execute('INSERT INTO people (cluster_id) VALUES (%s) ON CONFLICT (cluster_id) DO NOTHING', (c_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def bench_face_ids(db):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("SELECT face_id FROM faces WHERE file_hash LIKE 'bench-%%' ORDER BY face_id")
+            return np.array([r[0] for r in c.fetchall()], dtype=np.int64)
+    finally:
+        conn.close()
+
+
+def stored_clusters(db, face_ids):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("SELECT cluster_id FROM faces WHERE face_id = ANY(%s) ORDER BY face_id", ([int(f) for f in face_ids],))
+            return np.array([r[0] for r in c.fetchall()], dtype=np.int64)
+    finally:
+        conn.close()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    db = PhotoSynthDB()
+    cleanup(db)
+
+    console.print(f"[bold blue]🧪 Inserting {n:,} synthetic faces...[/bold blue]")
+    hashes = [f"bench-{i // FACES_PER_FILE:08d}" for i in range(n)]
+    db.batch_register_files([(h, f"bench/{h}.jpg") for h in sorted(set(hashes))])
+    db.add_faces_bulk(list(zip(hashes, np.zeros((n, EMBEDDING_DIM), dtype=np.float32))))
+    face_ids = bench_face_ids(db)
+
+    rng = np.random.default_rng(0)
+    legacy_clusters = BENCH_CLUSTER_BASE + rng.integers(0, k, size=n)
+    bulk_clusters = BENCH_CLUSTER_BASE + rng.integers(0, k, size=n)
+
+    console.print(f"[bold blue]🧪 Writing k={k:,} assignments both ways...[/bold blue]")
+    start = time.perf_counter()
+    legacy_update_clusters(db, [(int(c), int(f)) for c, f in zip(legacy_clusters, face_ids)])
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    db.assign_clusters(face_ids, bulk_clusters)
+    bulk = time.perf_counter() - start
+
+    table = Table(title=f"Cluster assignment write ({n:,} faces, k={k:,})")
+    table.add_column("Path")
+    table.add_column("Total (s)", justify="right")
+    table.add_column("faces / s", justify="right")
+    for name, t in (("execute_batch + per-cluster INSERT", legacy), ("assign_clusters (COPY + UPDATE FROM)", bulk)):
+        table.add_row(name, f"{t:.2f}", f"{n / t:,.0f}")
+    console.print(table)
+    console.print(f"   Speedup: [bold]{legacy / bulk:.1f}x[/bold]")
+
+    sample = rng.choice(n, size=min(n, 10_000), replace=False)
+    sample.sort()
+    if np.array_equal(stored_clusters(db, face_ids[sample]), bulk_clusters[sample]):
+        console.print("[green]✅ Stored cluster ids match the assignment.[/green]")
+    else:
+        console.print("[red]❌ Stored cluster ids differ from the assignment.[/red]")
+
+    cleanup(db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Video frame sampling for detection: read() every frame vs VideoSampler (grab + seeks).
+
+Before, Detector._process_video decoded and color-converted every frame and kept one
+every 1/2/5 s. VideoSampler reaches near targets with grab() and far ones with a frame
+seek, so only the sampled frames are retrieved. Both must return the same frames.
+
+Usage:
+    uv run python scripts/bench_video_sampling.py [VIDEO ...] [--budget N]
+
+Without arguments synthetic H.264 videos (1 s keyframe interval, like phone cameras) are
+generated in a temp dir; that needs PyAV, otherwise OpenCV's MPEG-4 encoder is used.
+Bytes read come from /proc/self/io (rchar), so they count page-cache hits as NFS would not.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from photosynth.utils.video import VIDEO_FRAME_BUDGET, VideoSampler, detection_frame_indices
+
+try:
+    import av
+except ImportError:
+    av = None
+
+FPS = 30
+SYNTHETIC = [  # (name, width, height, seconds)
+    ("clip_1080p_20s", 1920, 1080, 20),
+    ("clip_1080p_3min", 1920, 1080, 180),
+    ("clip_4k_45s", 3840, 2160, 45),
+]
+console = Console()
+
+
+def synthetic_frames(width, height, seconds, rng):
+    base = cv2.resize((rng.random((height // 60, width // 60, 3)) * 255).astype(np.uint8),
+                      (width, height), interpolation=cv2.INTER_CUBIC)
+    for i in range(seconds * FPS):
+        frame = base.copy()
+        x = int((i * 7) % width)
+        cv2.circle(frame, (x, height // 2), height // 6, (40, 200, 240), -1)
+        cv2.putText(frame, f"{i:06d}", (40, height // 8), cv2.FONT_HERSHEY_SIMPLEX, height / 300, (255, 255, 255), 4)
+        yield frame
+
+
+def make_video(path, width, height, seconds, rng):
+    if av:
+        with av.open(path, 'w') as container:
+            stream = container.add_stream('libx264', rate=FPS)
+            stream.width, stream.height, stream.pix_fmt = width, height, 'yuv420p'
+            stream.options = {'g': str(FPS), 'preset': 'ultrafast', 'crf': '23'}
+            for frame in synthetic_frames(width, height, seconds, rng):
+                container.mux(stream.encode(av.VideoFrame.from_ndarray(frame, format='bgr24')))
+            container.mux(stream.encode())
+    else:
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), FPS, (width, height))
+        for frame in synthetic_frames(width, height, seconds, rng):
+            writer.write(frame)
+        writer.release()
+
+
+def bytes_read():
+    with open('/proc/self/io') as f:
+        return int(next(line for line in f if line.startswith('rchar')).split()[1])
+
+
+def before(path, budget):
+    """The old loop: read() every frame, keep every frame_interval-th (indices now capped by budget)."""
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    wanted = set(detection_frame_indices(fps, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), budget))
+    frames, decoded, frame_idx = [], 0, 0
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if not ret: break
+        decoded += 1
+        if frame_idx in wanted: frames.append(frame)
+        frame_idx += 1
+    cap.release()
+    return frames, decoded
+
+
+def after(path, budget):
+    with VideoSampler(path, budget) as sampler:
+        frames = [f for batch in sampler.batches() for f in batch]
+    return frames, (sampler.grabbed, sampler.seeks, sampler.retrieved)
+
+
+def measure(fn, *args):
+    start_bytes, start = bytes_read(), time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start, bytes_read() - start_bytes
+
+
+def main():
+    args = sys.argv[1:]
+    budget = VIDEO_FRAME_BUDGET
+    if '--budget' in args:
+        i = args.index('--budget')
+        budget = int(args[i + 1])
+        args = args[:i] + args[i + 2:]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = args
+        if not paths:
+            rng = np.random.default_rng(0)
+            console.print(f"[bold blue]🧪 Encoding {len(SYNTHETIC)} synthetic videos ({'H.264' if av else 'MPEG-4'})...[/bold blue]")
+            for name, width, height, seconds in SYNTHETIC:
+                paths.append(os.path.join(tmp, f"{name}.mp4"))
+                make_video(paths[-1], width, height, seconds, rng)
+
+        table = Table(title=f"Detection frame sampling (budget {budget} frames per video)")
+        table.add_column("Video")
+        table.add_column("MB", justify="right")
+        table.add_column("Sampled", justify="right")
+        table.add_column("Before (s)", justify="right")
+        table.add_column("Before decoded", justify="right")
+        table.add_column("Before read (MB)", justify="right")
+        table.add_column("After (s)", justify="right")
+        table.add_column("After grab / seek / retrieve", justify="right")
+        table.add_column("After read (MB)", justify="right")
+        table.add_column("Same frames")
+        totals = np.zeros(2)
+        ok = True
+        for path in paths:
+            (frames_before, decoded), t_before, read_before = measure(before, path, budget)
+            (frames_after, (grabbed, seeks, retrieved)), t_after, read_after = measure(after, path, budget)
+            same = len(frames_before) == len(frames_after) and all(
+                np.array_equal(a, b) for a, b in zip(frames_before, frames_after))
+            ok &= same
+            totals += (t_before, t_after)
+            table.add_row(os.path.basename(path), f"{os.path.getsize(path) / 1e6:.1f}", str(len(frames_after)),
+                          f"{t_before:.2f}", f"{decoded:,}", f"{read_before / 1e6:.1f}",
+                          f"{t_after:.2f}", f"{grabbed:,} / {seeks} / {retrieved}", f"{read_after / 1e6:.1f}",
+                          "[green]✅[/green]" if same else "[red]❌[/red]")
+        console.print(table)
+        console.print(f"   Total: {totals[0]:.2f}s before, {totals[1]:.2f}s after ({totals[0] / totals[1]:.1f}x)")
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
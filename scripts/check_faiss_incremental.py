@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Incremental FAISS index check + benchmark (photosynth/utils/faiss_manager.py).
+
+Against an index in a temporary directory:
+1. Full rebuild from N faces (the old path after every re-cluster).
+2. sync() after new faces are saved elsewhere: only the new rows are pulled.
+3. sync() after faces are deleted, and after an insert commits late (below the watermark).
+4. Restart: snapshot + log replay, then after compaction, then with a torn log tail.
+5. Cluster map: after assign_clusters and after a UI-style merge, sync() must reload the
+   in-memory face_id -> cluster_id map; lookups timed against the old per-match query.
+After each step the index ids must equal faces.face_id and every vector must find itself.
+
+Usage:
+    uv run python scripts/check_faiss_incremental.py [N_FACES] [N_NEW] [INDEX_TYPE]
+
+INDEX_TYPE overrides settings.yaml face_index.type (flat, ivf_flat, ivf_sq8, ivf_pq, hnsw).
+
+Writes synthetic rows (file_hash prefix 'bench-') and deletes them afterwards.
+"""
+import sys
+import tempfile
+import time
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from photosynth.db import PhotoSynthDB, encode_embedding, EMBEDDING_DTYPE
+from photosynth.utils import faiss_manager
+from photosynth.utils.faiss_manager import FAISSManager, index_kind, l2_normalized
+
+EMBEDDING_DIM = 512
+FACES_PER_FILE = 4
+console = Console()
+
+
+def cleanup(db):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("DELETE FROM faces WHERE file_hash LIKE 'bench-%%'")
+            c.execute("DELETE FROM media_files WHERE file_hash LIKE 'bench-%%'")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def random_embeddings(rng, n):
+    embeddings = rng.standard_normal((n, EMBEDDING_DIM)).astype(np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def save_faces(db, rng, start, n):
+    embeddings = random_embeddings(rng, n)
+    hashes = [f"bench-{(start + i) // FACES_PER_FILE:08d}" for i in range(n)]
+    db.batch_register_files([(h, f"bench/{h}.jpg") for h in sorted(set(hashes))])
+    db.add_faces_bulk(list(zip(hashes, embeddings)))
+
+
+def verify(db, manager, label, results):
+    ids = np.sort(manager._ids())
+    expected = db.get_face_ids()
+    ok = np.array_equal(ids, expected)
+    if ok:
+        # Every stored face must be its own best match (spot check; scores, so duplicates pass)
+        sample = np.random.default_rng(1).choice(ids, size=min(200, len(ids)), replace=False)
+        _, vectors = db.load_embedding_matrix(face_ids=sample)
+        D, _ = manager.index.search(l2_normalized(vectors), 1)
+        exact = index_kind(manager.index) in ('flat', 'ivf_flat', 'hnsw')
+        ok = np.allclose(D[:, 0], 1, atol=1e-4 if exact else 0.05)
+    results.append((label, manager.index.ntotal, ok))
+    return ok
+
+
+def verify_clusters(db, manager, label, results):
+    face_ids, cluster_ids, _ = db.get_cluster_assignments()
+    ok = np.array_equal(manager.cluster_of[face_ids], cluster_ids)
+    results.append((label, manager.index.ntotal, ok))
+    return ok
+
+
+def db_cluster_lookup(db, face_id):
+    """The old per-match round trip, for comparison."""
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("SELECT cluster_id FROM faces WHERE face_id=%s", (int(face_id),))
+            return c.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_new = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+    if len(sys.argv) > 3:
+        faiss_manager.INDEX_TYPE = sys.argv[3]
+    db = PhotoSynthDB()
+    cleanup(db)
+    rng = np.random.default_rng(0)
+    save_faces(db, rng, 0, n)
+
+    results, timings = [], []
+    with tempfile.TemporaryDirectory() as index_dir:
+        console.print(f"[bold blue]🧪 {n:,} faces, {n_new:,} saved incrementally...[/bold blue]")
+        manager = FAISSManager(index_dir)
+        _, t = timed(manager.build_index_if_missing)
+        timings.append((f"Full rebuild (load all + add + save), {index_kind(manager.index)}", t))
+        verify(db, manager, "rebuild", results)
+
+        save_faces(db, rng, n, n_new)
+        added, t = timed(manager.sync)
+        timings.append((f"sync() after {n_new:,} new faces", t))
+        verify(db, manager, "sync: new faces", results)
+
+        _, t = timed(manager.sync)
+        timings.append(("sync() with nothing new", t))
+
+        conn = db.get_connection()
+        try:
+            with conn.cursor() as c:
+                c.execute('''
+                    DELETE FROM faces WHERE face_id IN (
+                        SELECT face_id FROM faces WHERE file_hash LIKE 'bench-%%' ORDER BY face_id LIMIT 100
+                    )
+                ''')
+            conn.commit()
+        finally:
+            conn.close()
+        _, t = timed(manager.sync)
+        timings.append(("sync() after 100 deletes (id reconcile)", t))
+        verify(db, manager, "sync: deletes", results)
+
+        # Late commit: a lower face_id becomes visible after a higher one was synced
+        late = db.get_connection()
+        try:
+            with late.cursor() as c:
+                c.execute("INSERT INTO faces (file_hash, embedding, embedding_dtype) VALUES (%s, %s, %s)",
+                          ("bench-00000000", encode_embedding(random_embeddings(rng, 1)[0]), EMBEDDING_DTYPE))
+            save_faces(db, rng, n + n_new, 10)
+            manager.sync()
+            late.commit()
+        finally:
+            late.close()
+        manager.sync()
+        verify(db, manager, "sync: late commit", results)
+
+        restarted, t = timed(lambda: FAISSManager(index_dir))
+        timings.append(("Restart (snapshot + log replay)", t))
+        verify(db, restarted, "restart: replay log", results)
+
+        restarted.compact()
+        verify(db, FAISSManager(index_dir), "restart: after compaction", results)
+
+        # Another worker process logs new faces; this one, behind it, compacts: they must survive
+        sibling = FAISSManager(index_dir)
+        save_faces(db, rng, n + n_new + 10, 10)
+        sibling.sync()
+        restarted.compact()
+        verify(db, FAISSManager(index_dir), "compaction keeps a sibling's logged faces", results)
+
+        with open(restarted.log_file, 'ab') as f:
+            f.write(b'A\x05\x00')  # torn record from a crashed writer
+        save_faces(db, rng, n + n_new + 20, 10)  # saved while the worker was down
+        recovered = FAISSManager(index_dir)
+        recovered.sync()
+        verify(db, recovered, "restart: torn log tail", results)
+
+        face_ids = db.get_face_ids()
+        db.assign_clusters(face_ids, face_ids % 1000)
+        recovered.sync()
+        verify_clusters(db, recovered, "clusters: after assign_clusters", results)
+
+        conn = db.get_connection()
+        try:
+            with conn.cursor() as c:
+                c.execute("UPDATE faces SET cluster_id = 1 WHERE cluster_id = 2")  # ui/backend tag_cluster merge
+            conn.commit()
+        finally:
+            conn.close()
+        _, t = timed(recovered.sync)
+        timings.append(("sync() after a merge (cluster map reload)", t))
+        verify_clusters(db, recovered, "clusters: after merge", results)
+
+        # The lookup search_face does after a match (the flat search itself is unchanged)
+        _, t = timed(lambda: [recovered.cluster_of_face(i) for i in face_ids[:1000]])
+        timings.append(("1,000 match -> cluster lookups, in-memory map", t))
+        _, t = timed(lambda: [db_cluster_lookup(db, i) for i in face_ids[:1000]])
+        timings.append(("1,000 match -> cluster lookups, DB round trip (before)", t))
+
+    cleanup(db)
+
+    table = Table(title="Index maintenance")
+    table.add_column("Operation")
+    table.add_column("Time (s)", justify="right")
+    for name, t in timings:
+        table.add_row(name, f"{t:.3f}")
+    console.print(table)
+
+    table = Table(title="Consistency with faces table")
+    table.add_column("Step")
+    table.add_column("Vectors", justify="right")
+    table.add_column("OK")
+    for label, ntotal, ok in results:
+        table.add_row(label, f"{ntotal:,}", "[green]✅[/green]" if ok else "[red]❌[/red]")
+    console.print(table)
+    sys.exit(0 if all(ok for _, _, ok in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
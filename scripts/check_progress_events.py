@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Consistency check for push-based progress (photosynth/progress.py).
+
+Worker processes run stage transitions and face inserts for synthetic files while a
+ProgressSubscriber starts tracking them mid-flight. Once the workers finish and the
+events drain, the subscriber's in-memory state must match the database exactly
+(statuses and per-file face counts, with no delta counted twice or missed).
+
+Usage:
+    uv run python scripts/check_progress_events.py [N_FILES] [N_WORKERS]
+
+Writes synthetic rows (file_hash prefix 'bench-') and deletes them afterwards.
+"""
+import random
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+from rich.console import Console
+
+from photosynth.db import PhotoSynthDB
+from photosynth.progress import ProgressSubscriber, SNAPSHOT_CHUNK
+
+FACES_PER_FILE = 3
+console = Console()
+
+db_instance = None
+
+
+def cleanup(db):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("DELETE FROM faces WHERE file_hash LIKE 'bench-%%'")
+            c.execute("DELETE FROM media_files WHERE file_hash LIKE 'bench-%%'")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run_job(job):
+    global db_instance
+    if db_instance is None: db_instance = PhotoSynthDB()
+    file_hash, kind = job
+    if kind == 'faces':
+        db_instance.add_faces_bulk([(file_hash, np.zeros(8, dtype=np.float32))] * FACES_PER_FILE)
+    else:
+        db_instance.begin_stage(file_hash, kind)
+        if db_instance.complete_stage(file_hash, kind, {"stage": kind}):
+            db_instance.update_status(file_hash, 'COMPLETED')
+
+
+def actual_state(db, hashes):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute('''
+                SELECT m.file_hash, m.status, m.detection_status, m.caption_status,
+                       (SELECT COUNT(*) FROM faces f WHERE f.file_hash = m.file_hash)
+                FROM media_files m WHERE m.file_hash = ANY(%s)
+            ''', (hashes,))
+            return {r[0]: r[1:] for r in c.fetchall()}
+    finally:
+        conn.close()
+
+
+def main():
+    n_files = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    n_workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    db = PhotoSynthDB()
+    cleanup(db)
+
+    hashes = [f"bench-{i:08d}" for i in range(n_files)]
+    db.batch_register_files([(h, f"bench/{h}.jpg") for h in hashes])
+    jobs = [(h, kind) for h in hashes for kind in ('detection', 'caption', 'faces')]
+    random.Random(0).shuffle(jobs)
+
+    console.print(f"[bold blue]🧪 {len(jobs):,} writes for {n_files:,} files on {n_workers} workers, subscriber joins mid-flight...[/bold blue]")
+    progress = ProgressSubscriber()
+    with Pool(n_workers) as pool:
+        pending = pool.map_async(run_job, jobs, chunksize=16)
+        time.sleep(0.5)
+        progress.track(hashes)
+        events = 0
+        while not pending.ready():
+            events += len(progress.wait(timeout=0.2))
+        pending.get()
+    # Drain: stop once no event arrived for a second
+    while True:
+        changed = progress.wait(timeout=1.0)
+        if not changed: break
+        events += len(changed)
+    progress.close()
+
+    actual = actual_state(db, hashes)
+    mismatched = [
+        h for h in hashes
+        if (progress.files[h].get('status'), progress.files[h].get('detection_status'),
+            progress.files[h].get('caption_status'), progress.files[h]['faces']) != actual[h]
+    ]
+    cleanup(db)
+
+    console.print(f"   {events:,} file updates pushed; monitor queries: {-(-n_files // SNAPSHOT_CHUNK)} (vs 2/file per poll before)")
+    if mismatched:
+        console.print(f"[red]❌ {len(mismatched)} files differ from the database, e.g. {mismatched[0]}: "
+                      f"{progress.files[mismatched[0]]} vs {actual[mismatched[0]]}[/red]")
+        sys.exit(1)
+    console.print("[green]✅ Subscriber state matches the database for every file.[/green]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+EXPLAIN regression checks for the hot queries.
+
+Each query is planned with sequential scans disabled; a Seq Scan on the checked table
+means no index can serve it (e.g. a dropped index or a query rewritten out of shape).
+Planning only: nothing is executed, so this is safe against the live database.
+
+Usage:
+    uv run python scripts/check_query_plans.py
+"""
+import json
+import sys
+
+from rich.console import Console
+from rich.table import Table
+
+from photosynth.db import PhotoSynthDB
+
+console = Console()
+
+# (description, table that must not be seq-scanned, query, params)
+HOT_QUERIES = [
+    ("/clusters representative faces", "faces", '''
+        SELECT f.face_id, m.file_path FROM faces f
+        JOIN media_files m ON f.file_hash = m.file_hash
+        WHERE f.cluster_id = %s LIMIT 10
+    ''', (1,)),
+    ("cluster merge: move faces", "faces",
+     "UPDATE faces SET cluster_id = %s WHERE cluster_id = %s", (2, 1)),
+    ("cluster merge: name lookup", "people",
+     "SELECT cluster_id FROM people WHERE name = %s AND cluster_id != %s", ("Someone", 1)),
+    ("scan_faces monitor: faces per file", "faces",
+     "SELECT COUNT(*) FROM faces WHERE file_hash=%s", ("0" * 16,)),
+    ("/stats: processed files", "media_files",
+     "SELECT COUNT(*) FROM media_files WHERE status='COMPLETED'", ()),
+    ("pending detections", "media_files",
+     "SELECT file_hash FROM media_files WHERE detection_status='PENDING'", ()),
+    ("pending captions", "media_files",
+     "SELECT file_hash FROM media_files WHERE caption_status='PENDING'", ()),
+    ("file lookup by path", "media_files",
+     "SELECT file_hash FROM media_files WHERE file_path=%s", ("photos/x.jpg",)),
+    ("near-duplicate refresh: completed since watermark", "media_files", '''
+        SELECT file_hash, last_updated FROM media_files
+        WHERE last_updated >= %s
+          AND (detection_status='COMPLETED' OR caption_status='COMPLETED')
+    ''', (1.7e9,)),
+]
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def explain(conn, query, params):
+    with conn.cursor() as c:
+        c.execute("SET LOCAL enable_seqscan = off")
+        c.execute("EXPLAIN (FORMAT JSON) " + query, params)
+        plan = c.fetchone()[0]
+    conn.rollback()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return list(plan_nodes(plan[0]["Plan"]))
+
+
+def table_indexes(conn, relation):
+    with conn.cursor() as c:
+        c.execute("SELECT indexname FROM pg_indexes WHERE tablename=%s", (relation,))
+        names = {row[0] for row in c.fetchall()}
+    conn.rollback()
+    return names
+
+
+def main():
+    db = PhotoSynthDB()
+    table = Table(title="Hot query plans")
+    table.add_column("Query")
+    table.add_column("Table")
+    table.add_column("Access")
+    failures = 0
+
+    conn = db.get_connection()
+    try:
+        for description, relation, query, params in HOT_QUERIES:
+            nodes = explain(conn, query, params)
+            seq = [n for n in nodes if n["Node Type"] == "Seq Scan" and n.get("Relation Name") == relation]
+            # Bitmap Index Scan nodes carry no relation name, so match index names instead
+            indexes = sorted({n["Index Name"] for n in nodes if "Index Name" in n} & table_indexes(conn, relation))
+            if seq or not indexes:
+                failures += 1
+                table.add_row(description, relation, "[red]Seq Scan[/red]")
+            else:
+                table.add_row(description, relation, f"[green]{', '.join(indexes)}[/green]")
+    finally:
+        conn.close()
+
+    console.print(table)
+    if failures:
+        console.print(f"[red]❌ {failures} hot queries cannot use an index.[/red]")
+        sys.exit(1)
+    console.print("[green]✅ All hot queries are index-backed.[/green]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Known-face threshold check (FAISSManager.search_faces, settings.yaml face_index.similarity_threshold).
+
+Stores a few faces, then queries each with vectors at a known cosine similarity just
+above and just below SIMILARITY_THRESHOLD, both unit-length and at InsightFace's raw
+embedding scale. Above must match the stored face, below must not: the threshold is a
+cosine, independent of embedding norms.
+
+Usage:
+    uv run python scripts/check_similarity_threshold.py [INDEX_TYPE]
+
+Writes synthetic rows (file_hash prefix 'bench-') and deletes them afterwards.
+"""
+import sys
+import tempfile
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from photosynth.db import PhotoSynthDB
+from photosynth.utils import faiss_manager
+from photosynth.utils.faiss_manager import FAISSManager, SIMILARITY_THRESHOLD, index_kind
+
+EMBEDDING_DIM = 512
+N_FACES = 8
+MARGIN = 0.01
+RAW_NORM = 22.0  # typical |face.embedding| from InsightFace buffalo_l
+console = Console()
+
+
+def cleanup(db):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("DELETE FROM faces WHERE file_hash LIKE 'bench-%%'")
+            c.execute("DELETE FROM media_files WHERE file_hash LIKE 'bench-%%'")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def bench_face_ids(db):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("SELECT face_id FROM faces WHERE file_hash LIKE 'bench-%%' ORDER BY file_hash")
+            return np.array([r[0] for r in c.fetchall()], dtype=np.int64)
+    finally:
+        conn.close()
+
+
+def unit(v):
+    return v / np.linalg.norm(v, axis=-1, keepdims=True)
+
+
+def at_cosine(rng, face, cosine):
+    """A unit vector whose cosine similarity to `face` (unit) is exactly `cosine`."""
+    other = rng.standard_normal(face.shape).astype(np.float32)
+    other = unit(other - other.dot(face) * face)
+    return unit(cosine * face + np.sqrt(1 - cosine ** 2) * other)
+
+
+def main():
+    if len(sys.argv) > 1:
+        faiss_manager.INDEX_TYPE = sys.argv[1]
+    db = PhotoSynthDB()
+    cleanup(db)
+    rng = np.random.default_rng(0)
+    faces = unit(rng.standard_normal((N_FACES, EMBEDDING_DIM)).astype(np.float32))
+    hashes = [f"bench-{i:08d}" for i in range(N_FACES)]
+    db.batch_register_files([(h, f"bench/{h}.jpg") for h in hashes])
+    db.add_faces_bulk(list(zip(hashes, faces * RAW_NORM)))  # stored as the detector returns them
+    face_ids_of = bench_face_ids(db)
+
+    table = Table(title=f"search_faces at SIMILARITY_THRESHOLD {SIMILARITY_THRESHOLD} ± {MARGIN}")
+    table.add_column("Query")
+    table.add_column("Cosine", justify="right")
+    table.add_column("Matched", justify="right")
+    table.add_column("Expected", justify="right")
+    table.add_column("OK")
+    ok = True
+    try:
+        with tempfile.TemporaryDirectory() as index_dir:
+            manager = FAISSManager(index_dir)
+            manager.build_index_if_missing()
+            console.print(f"[bold blue]🧪 {manager.index.ntotal} faces in a {index_kind(manager.index)} index...[/bold blue]")
+            for label, cosine, expect in [("above", SIMILARITY_THRESHOLD + MARGIN, True),
+                                          ("below", SIMILARITY_THRESHOLD - MARGIN, False)]:
+                queries = np.stack([at_cosine(rng, face, cosine) for face in faces])
+                for scale, name in [(1.0, "unit"), (RAW_NORM, "raw scale")]:
+                    face_ids, _, _ = manager.search_faces(queries * scale)
+                    hit = face_ids[:, 0] != -1
+                    matched = int(hit.sum())
+                    # A match must be the face the query was built from
+                    right = np.array_equal(face_ids[hit, 0], face_ids_of[hit])
+                    passed = matched == (N_FACES if expect else 0) and right
+                    ok &= passed
+                    table.add_row(f"{label}, {name}", f"{cosine:.2f}", f"{matched}/{N_FACES}",
+                                  f"{N_FACES if expect else 0}/{N_FACES}",
+                                  "[green]✅[/green]" if passed else "[red]❌[/red]")
+    finally:
+        cleanup(db)
+    console.print(table)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
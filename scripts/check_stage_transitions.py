@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Concurrency check for the stage state machine (begin_stage / complete_stage).
+
+Many processes complete the detection and caption stages of the same files in random
+order, with every completion issued twice (simulating retried / duplicated tasks).
+Each file must be reported ready-to-finalize exactly once.
+
+Usage:
+    uv run python scripts/check_stage_transitions.py [N_FILES] [N_WORKERS]
+
+Writes synthetic rows (file_hash prefix 'bench-') and deletes them afterwards.
+"""
+import random
+import sys
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+from rich.console import Console
+
+from photosynth.db import PhotoSynthDB
+
+DUPLICATES = 2  # completions per (file, stage)
+console = Console()
+
+db_instance = None
+
+
+def cleanup(db):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("DELETE FROM media_files WHERE file_hash LIKE 'bench-%%'")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run_stage(job):
+    global db_instance
+    if db_instance is None: db_instance = PhotoSynthDB()
+    file_hash, stage = job
+    db_instance.begin_stage(file_hash, stage)
+    return file_hash, db_instance.complete_stage(file_hash, stage, {"stage": stage})
+
+
+def main():
+    n_files = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    n_workers = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    db = PhotoSynthDB()
+    cleanup(db)
+
+    hashes = [f"bench-{i:08d}" for i in range(n_files)]
+    db.batch_register_files([(h, f"bench/{h}.jpg") for h in hashes])
+
+    jobs = [(h, stage) for h in hashes for stage in ('detection', 'caption') for _ in range(DUPLICATES)]
+    random.Random(0).shuffle(jobs)
+
+    console.print(f"[bold blue]🧪 {len(jobs):,} stage completions for {n_files:,} files on {n_workers} workers...[/bold blue]")
+    start = time.perf_counter()
+    with Pool(n_workers) as pool:
+        results = pool.map(run_stage, jobs, chunksize=16)
+    elapsed = time.perf_counter() - start
+
+    ready = Counter(h for h, is_ready in results if is_ready)
+    never = [h for h in hashes if ready[h] == 0]
+    twice = [h for h in hashes if ready[h] > 1]
+
+    console.print(f"   {len(jobs) / elapsed:,.0f} transitions/s")
+    if never or twice:
+        console.print(f"[red]❌ {len(never)} files never ready, {len(twice)} files ready more than once.[/red]")
+    else:
+        console.print("[green]✅ Every file reported ready-to-finalize exactly once.[/green]")
+
+    cleanup(db)
+    sys.exit(1 if never or twice else 0)
+
+
+if __name__ == "__main__":
+    main()
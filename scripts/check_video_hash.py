@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Video content hash check (photosynth/utils/hashing.py).
+
+The pHash is the media_files key, so a video must hash the same on every node:
+with and without PyAV, with the captioner's keyframe already in the frame cache, and
+as the original implementation did (OpenCV, frame total_frames // 2). Synthetic
+H.264 clips with 1 s keyframes put the middle frame away from a keyframe, where a
+keyframe seek would hash a different picture.
+
+Usage:
+    uv run python scripts/check_video_hash.py
+
+Needs PyAV for the H.264 encode and the PyAV path; without it only OpenCV is checked.
+"""
+import os
+import sys
+import tempfile
+
+import cv2
+import imagehash
+import numpy as np
+from PIL import Image
+from rich.console import Console
+from rich.table import Table
+
+from photosynth.utils import video
+from photosynth.utils.hashing import _compute_content_hash
+
+FPS = 30
+CLIPS = [  # (name, width, height, frames)
+    ("clip_3s", 640, 360, 3 * FPS),
+    ("clip_7s_odd", 640, 360, 7 * FPS + 13),
+    ("clip_20s", 1280, 720, 20 * FPS),
+]
+console = Console()
+
+
+def synthetic_frames(width, height, n, rng):
+    base = cv2.resize((rng.random((height // 40, width // 40, 3)) * 255).astype(np.uint8),
+                      (width, height), interpolation=cv2.INTER_CUBIC)
+    for i in range(n):
+        frame = base.copy()
+        cv2.circle(frame, (int((i * 9) % width), height // 2), height // 4, (40, 200, 240), -1)
+        yield frame
+
+
+def make_video(path, width, height, n, rng):
+    if video.av:
+        with video.av.open(path, 'w') as container:
+            stream = container.add_stream('libx264', rate=FPS)
+            stream.width, stream.height, stream.pix_fmt = width, height, 'yuv420p'
+            stream.options = {'g': str(FPS), 'preset': 'ultrafast', 'crf': '23'}
+            for frame in synthetic_frames(width, height, n, rng):
+                container.mux(stream.encode(video.av.VideoFrame.from_ndarray(frame, format='bgr24')))
+            container.mux(stream.encode())
+    else:
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), FPS, (width, height))
+        for frame in synthetic_frames(width, height, n, rng):
+            writer.write(frame)
+        writer.release()
+
+
+def original_hash(path):
+    """The hash before the frame cache and PyAV: OpenCV, frame total_frames // 2."""
+    cap = cv2.VideoCapture(path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if total_frames > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, total_frames // 2)
+    ret, frame = cap.read()
+    cap.release()
+    return str(imagehash.phash(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))) if ret else None
+
+
+def keyframe_hash(path):
+    frames = video.sample_video_frames(path, use_cache=False)
+    return str(imagehash.phash(Image.fromarray(cv2.cvtColor(frames[0], cv2.COLOR_BGR2RGB)))) if frames else None
+
+
+def main():
+    pyav = video.av
+    rng = np.random.default_rng(0)
+    table = Table(title="Video content hash")
+    table.add_column("Clip")
+    table.add_column("Original")
+    table.add_column("PyAV installed")
+    table.add_column("OpenCV only")
+    table.add_column("Frame cache primed")
+    table.add_column("(Keyframe)")
+    table.add_column("Same")
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        video.FRAME_CACHE_DIR = video.Path(tmp) / "frames"
+        console.print(f"[bold blue]🧪 Encoding {len(CLIPS)} synthetic clips ({'H.264' if pyav else 'MPEG-4'})...[/bold blue]")
+        for name, width, height, n in CLIPS:
+            path = os.path.join(tmp, f"{name}.mp4")
+            make_video(path, width, height, n, rng)
+
+            expected = original_hash(path)
+            with_av = _compute_content_hash(path)
+            video.av = None
+            without_av = _compute_content_hash(path)
+            video.av = pyav
+            video.sample_video_frames(path)  # what the captioner leaves behind
+            cached = _compute_content_hash(path)
+
+            same = expected is not None and with_av == without_av == cached == expected
+            ok &= same
+            table.add_row(name, expected, with_av, without_av, cached, keyframe_hash(path),
+                          "[green]✅[/green]" if same else "[red]❌[/red]")
+    console.print(table)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,15 +17,13 @@ def main():
     # 1. Fetch ALL faces count (just to determine if work is needed)
     console.print("   Checking total face embeddings in DB...")
 
-    # Your db.get_all_embeddings returns a list, so we calculate the count here
-    all_face_data = db.get_all_embeddings()
+    # COUNT only; the worker streams the embeddings itself
+    total_embeddings_count = db.count_faces()
 
-    if not all_face_data:
+    if not total_embeddings_count:
         console.print("[yellow]No faces found to cluster. Run scan_faces.py first.[/yellow]")
         return
 
-    total_embeddings_count = len(all_face_data)
-
     console.print(f"   Found {total_embeddings_count} total embeddings.")
 
     # 2. Queue the heavy lifting task to the dedicated worker
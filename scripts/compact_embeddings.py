@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Backfill: shrinks embedding storage in existing rows and reports table sizes before/after.
+
+1. media_files.detection_data rows still holding "faces" (512 floats per face as JSON text)
+   get those embeddings moved into the faces table (binary, once per file) and replaced by
+   "face_ids" references. Files that already have faces just reference them.
+2. --float16: rewrites float32 faces.embedding rows as float16 (half the bytes).
+3. VACUUM (or VACUUM FULL with --vacuum-full, which locks the tables but returns the
+   space to the OS) so the sizes reflect the change.
+
+Usage:
+    uv run python scripts/compact_embeddings.py [--float16] [--vacuum-full] [--batch 500]
+"""
+import argparse
+import json
+
+import numpy as np
+import psycopg2.extras
+from rich.console import Console
+from rich.table import Table
+
+from photosynth.db import PhotoSynthDB, encode_embedding, EMBEDDING_DTYPE
+
+console = Console()
+TABLES = ("media_files", "faces")
+REPORT_ROWS = (
+    ("media_files", "media_files (heap + TOAST)"),
+    ("faces", "faces (heap + TOAST)"),
+    ("detection_data", "detection_data column (live)"),
+    ("faces.embedding", "faces.embedding column (live)"),
+)
+
+
+def table_sizes(db):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            sizes = {}
+            for t in TABLES:
+                c.execute("SELECT pg_table_size(%s), pg_indexes_size(%s)", (t, t))
+                sizes[t] = c.fetchone()
+            c.execute("SELECT COALESCE(SUM(pg_column_size(detection_data)), 0) FROM media_files")
+            sizes["detection_data"] = (c.fetchone()[0], 0)
+            c.execute("SELECT COALESCE(SUM(pg_column_size(embedding)), 0) FROM faces")
+            sizes["faces.embedding"] = (c.fetchone()[0], 0)
+        return sizes
+    finally:
+        conn.close()
+
+
+def move_detection_embeddings(db, batch):
+    """detection_data.faces -> faces rows + detection_data.face_ids. Returns (files, faces inserted)."""
+    files = inserted = 0
+    last_hash = ""
+    conn = db.get_connection()
+    try:
+        while True:
+            with conn.cursor() as c:
+                c.execute('''
+                    SELECT file_hash, detection_data->'faces' FROM media_files
+                    WHERE file_hash > %s AND detection_data ? 'faces'
+                    ORDER BY file_hash LIMIT %s
+                ''', (last_hash, batch))
+                rows = c.fetchall()
+                if not rows: break
+                last_hash = rows[-1][0]
+                hashes = [r[0] for r in rows]
+
+                c.execute('''
+                    SELECT file_hash, array_agg(face_id ORDER BY face_id) FROM faces
+                    WHERE file_hash = ANY(%s) GROUP BY file_hash
+                ''', (hashes,))
+                face_ids = dict(c.fetchall())
+
+                new_faces = [
+                    (file_hash, encode_embedding(emb), EMBEDDING_DTYPE)
+                    for file_hash, embeddings in rows if file_hash not in face_ids
+                    for emb in (embeddings or [])
+                ]
+                if new_faces:
+                    for file_hash, face_id in psycopg2.extras.execute_values(
+                        c, "INSERT INTO faces (file_hash, embedding, embedding_dtype) VALUES %s RETURNING file_hash, face_id",
+                        new_faces, page_size=1000, fetch=True
+                    ):
+                        face_ids.setdefault(file_hash, []).append(face_id)
+                    inserted += len(new_faces)
+
+                psycopg2.extras.execute_values(c, '''
+                    UPDATE media_files m
+                    SET detection_data = (m.detection_data - 'faces') || jsonb_build_object('face_ids', v.ids::jsonb)
+                    FROM (VALUES %s) AS v(file_hash, ids)
+                    WHERE m.file_hash = v.file_hash
+                ''', [(h, json.dumps(sorted(face_ids.get(h, [])))) for h in hashes], page_size=1000)
+            conn.commit()
+            files += len(rows)
+            console.print(f"   Compacted {files:,} detection rows ({inserted:,} faces moved)...", end="\r")
+    finally:
+        conn.close()
+    return files, inserted
+
+
+def convert_to_float16(db, batch):
+    """Rewrites float32 faces.embedding rows as float16. Returns rows converted."""
+    converted = 0
+    last_id = 0
+    conn = db.get_connection()
+    try:
+        while True:
+            with conn.cursor() as c:
+                c.execute('''
+                    SELECT face_id, embedding FROM faces
+                    WHERE face_id > %s AND embedding_dtype = 'float32'
+                    ORDER BY face_id LIMIT %s
+                ''', (last_id, batch))
+                rows = c.fetchall()
+                if not rows: break
+                last_id = rows[-1][0]
+                psycopg2.extras.execute_values(c, '''
+                    UPDATE faces f SET embedding = v.embedding, embedding_dtype = 'float16'
+                    FROM (VALUES %s) AS v(face_id, embedding)
+                    WHERE f.face_id = v.face_id
+                ''', [(face_id, encode_embedding(np.frombuffer(emb, dtype=np.float32), 'float16'))
+                      for face_id, emb in rows], page_size=1000)
+            conn.commit()
+            converted += len(rows)
+            console.print(f"   Converted {converted:,} embeddings to float16...", end="\r")
+    finally:
+        conn.close()
+    return converted
+
+
+def vacuum(db, full):
+    conn = db.get_connection()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as c:
+            for t in TABLES:
+                c.execute(f"VACUUM {'FULL ' if full else ''}ANALYZE {t}")
+    finally:
+        conn.autocommit = False
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--float16", action="store_true", help="also convert float32 embeddings to float16")
+    parser.add_argument("--vacuum-full", action="store_true", help="VACUUM FULL (exclusive lock) instead of VACUUM")
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    db = PhotoSynthDB()
+    before = table_sizes(db)
+
+    console.print("[bold blue]📦 Moving embeddings out of detection_data...[/bold blue]")
+    files, inserted = move_detection_embeddings(db, args.batch)
+    console.print(f"   Compacted {files:,} detection rows ({inserted:,} faces moved).      ")
+
+    if args.float16:
+        console.print("[bold blue]📦 Converting faces.embedding to float16...[/bold blue]")
+        converted = convert_to_float16(db, args.batch)
+        console.print(f"   Converted {converted:,} embeddings to float16.      ")
+
+    console.print(f"[bold blue]🧹 VACUUM{' FULL' if args.vacuum_full else ''}...[/bold blue]")
+    vacuum(db, args.vacuum_full)
+    after = table_sizes(db)
+
+    table = Table(title="Storage before / after")
+    table.add_column("Relation")
+    table.add_column("Before (MB)", justify="right")
+    table.add_column("After (MB)", justify="right")
+    for name, label in REPORT_ROWS:
+        table.add_row(label, f"{before[name][0] / 1e6:,.1f}", f"{after[name][0] / 1e6:,.1f}")
+        if name in TABLES:
+            table.add_row(f"{name} indexes", f"{before[name][1] / 1e6:,.1f}", f"{after[name][1] / 1e6:,.1f}")
+    console.print(table)
+    if not args.vacuum_full:
+        console.print("   [dim]Plain VACUUM makes freed space reusable but rarely shrinks files; use --vacuum-full to return it.[/dim]")
+
+
+if __name__ == "__main__":
+    main()
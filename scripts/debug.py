@@ -4,13 +4,10 @@ db = PhotoSynthDB()
 conn = db.get_connection()
 cursor = conn.cursor()
 
-# 1. Count total files processed
-cursor.execute("SELECT COUNT(*) FROM media_files")
-file_count = cursor.fetchone()[0]
-
-# 2. Count total faces
-cursor.execute("SELECT COUNT(*) FROM faces")
-face_count = cursor.fetchone()[0]
+# 1 & 2. Total files and faces (trigger-maintained counters, no table scans)
+counters = db.get_counters()
+file_count = counters.get('files', {}).get('', 0)
+face_count = counters.get('faces', {}).get('', 0)
 
 print(f"📊 DB Report: {file_count} Files Processed | {face_count} Faces Found")
 
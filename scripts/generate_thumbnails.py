@@ -3,7 +3,7 @@ import os
 import cv2
 from photosynth.db import PhotoSynthDB
 from photosynth.pipeline.detector import Detector
-from photosynth.utils.paths import heal_path
+from photosynth.utils.paths import get_path_resolver
 from tqdm import tqdm
 
 # Define output directory relative to project root
@@ -18,7 +18,13 @@ def main():
     detector = Detector(enable_yolo=False) 
     
     print("   Fetching clusters from DB...")
-    clusters = db.get_connection().execute("SELECT cluster_id FROM people").fetchall()
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("SELECT cluster_id FROM people")
+            clusters = c.fetchall()
+    finally:
+        conn.close()
     
     if not clusters:
         print("❌ No clusters found. Run cluster_faces.py first.")
@@ -36,15 +42,21 @@ def main():
             SELECT m.file_path 
             FROM faces f 
             JOIN media_files m ON f.file_hash = m.file_hash 
-            WHERE f.cluster_id = ? 
+            WHERE f.cluster_id = %s 
             LIMIT 5
         """
-        files = db.get_connection().execute(query, (cluster_id,)).fetchall()
-        
-        for f_row in files:
-            # 1. Path Healing
-            path = heal_path(f_row[0])
-            if not os.path.exists(path): continue
+        conn = db.get_connection()
+        try:
+            with conn.cursor() as c:
+                c.execute(query, (cluster_id,))
+                files = c.fetchall()
+        finally:
+            conn.close()
+
+        # 1. Path Healing (one directory listing per folder instead of a stat per file)
+        resolver = get_path_resolver()
+        for path in resolver.resolve_many([f_row[0] for f_row in files]):
+            if not resolver.exists(path): continue
             
             try:
                 # 2. Load Image
@@ -73,6 +85,7 @@ def main():
                 print(f"Error processing {path}: {e}")
 
     print(f"✅ Generated {generated_count} thumbnails.")
+    print(f"   NAS stats: {get_path_resolver().metrics()}")
     print("👉 Refresh the UI at http://10.0.0.230:8001")
 
 if __name__ == "__main__":
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Load test for the face-tagger backend: concurrent clients hitting /clusters, /stats and
+/tag/cluster, reporting p50/p99 latency and throughput per endpoint.
+
+Usage:
+    uv run uvicorn photosynth.ui.backend:app --port 8000   # in another shell
+    uv run python scripts/load_test_backend.py [BASE_URL] [CLIENTS] [REQUESTS_PER_CLIENT]
+
+Seeds synthetic people/faces (file_hash prefix 'bench-', cluster ids >= BENCH_CLUSTER_BASE)
+so the queries have data; /tag/cluster only renames those clusters. Cleaned up afterwards.
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from photosynth.db import PhotoSynthDB
+
+N_CLUSTERS = 500
+FACES_PER_CLUSTER = 20
+BENCH_CLUSTER_BASE = 1_000_000_000
+console = Console()
+
+
+def seed(db):
+    hashes = [f"bench-{i:08d}" for i in range(N_CLUSTERS * FACES_PER_CLUSTER)]
+    db.batch_register_files([(h, f"bench/{h}.jpg") for h in hashes])
+    db.add_faces_bulk([(h, np.zeros(8, dtype=np.float32)) for h in hashes])
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("SELECT face_id FROM faces WHERE file_hash LIKE 'bench-%%' ORDER BY face_id")
+            face_ids = [r[0] for r in c.fetchall()]
+    finally:
+        conn.close()
+    clusters = [BENCH_CLUSTER_BASE + i // FACES_PER_CLUSTER for i in range(len(face_ids))]
+    db.assign_clusters(face_ids, clusters)
+
+    # Fresh planner statistics, as autovacuum would have in steady state
+    conn = db.get_connection()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as c:
+            c.execute("ANALYZE faces, media_files, people")
+    finally:
+        conn.autocommit = False
+        conn.close()
+
+
+def cleanup(db):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("DELETE FROM faces WHERE file_hash LIKE 'bench-%%'")
+            c.execute("DELETE FROM media_files WHERE file_hash LIKE 'bench-%%'")
+            c.execute("DELETE FROM people WHERE cluster_id >= %s", (BENCH_CLUSTER_BASE,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+async def client(http, client_id, n_requests, samples):
+    for i in range(n_requests):
+        kind = ("clusters", "stats", "tag")[i % 3]
+        start = time.perf_counter()
+        if kind == "clusters":
+            r = await http.get("/clusters")
+        elif kind == "stats":
+            r = await http.get("/stats")
+        else:
+            cluster_id = BENCH_CLUSTER_BASE + (client_id * n_requests + i) % N_CLUSTERS
+            r = await http.post("/tag/cluster", json={"cluster_id": cluster_id, "name": f"bench-{cluster_id}"})
+        r.raise_for_status()
+        samples[kind].append(time.perf_counter() - start)
+
+
+async def run(base_url, clients, per_client):
+    samples = {"clusters": [], "stats": [], "tag": []}
+    limits = httpx.Limits(max_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as http:
+        await http.get("/stats")  # warm up the pool
+        start = time.perf_counter()
+        await asyncio.gather(*(client(http, i, per_client, samples) for i in range(clients)))
+        elapsed = time.perf_counter() - start
+    return samples, elapsed
+
+
+def main():
+    base_url = sys.argv[1] if len(sys.argv) > 1 else "http://127.0.0.1:8000"
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    per_client = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+
+    db = PhotoSynthDB()
+    cleanup(db)
+    seed(db)
+    try:
+        console.print(f"[bold blue]🧪 {clients} clients x {per_client} requests against {base_url}...[/bold blue]")
+        samples, elapsed = asyncio.run(run(base_url, clients, per_client))
+    finally:
+        cleanup(db)
+
+    table = Table(title=f"Backend latency ({clients} concurrent clients)")
+    table.add_column("Endpoint")
+    table.add_column("Requests", justify="right")
+    table.add_column("p50 (ms)", justify="right")
+    table.add_column("p99 (ms)", justify="right")
+    for name, endpoint in (("clusters", "GET /clusters"), ("stats", "GET /stats"), ("tag", "POST /tag/cluster")):
+        arr = np.array(samples[name]) * 1000
+        table.add_row(endpoint, f"{len(arr):,}", f"{np.percentile(arr, 50):.1f}", f"{np.percentile(arr, 99):.1f}")
+    console.print(table)
+    total = sum(len(s) for s in samples.values())
+    console.print(f"   Throughput: [bold]{total / elapsed:,.0f} req/s[/bold]")
+
+
+if __name__ == "__main__":
+    main()
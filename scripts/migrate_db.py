@@ -1,39 +1,23 @@
-import sqlite3
-import os
+#!/usr/bin/env python3
+"""
+Applies pending Postgres schema migrations (photosynth/migrations.py) and reports the version.
+PhotoSynthDB() also does this once per process; run this after deploying a schema change
+so workers don't block on index builds at startup.
+"""
+from photosynth.db import get_pool
+from photosynth.migrations import migrate, current_version
 
-# Shared NAS Path
-DB_PATH = os.path.expanduser("~/personal/nas/homes/photosynth.db")
 
-def migrate():
-    print(f"📂 Migrating database at {DB_PATH}...")
-    
-    if not os.path.exists(DB_PATH):
-        print("❌ Database not found!")
-        return
+def main():
+    print("📂 Migrating PhotoSynth database...")
+    with get_pool().connection() as conn:
+        applied = migrate(conn)
+        version = current_version(conn)
+    if applied:
+        print(f"✅ Applied migrations {applied}. Schema at version {version}.")
+    else:
+        print(f"✅ Already up to date (version {version}).")
 
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    columns = [
-        ("detection_status", "TEXT DEFAULT 'PENDING'"),
-        ("caption_status", "TEXT DEFAULT 'PENDING'"),
-        ("detection_data", "TEXT"),
-        ("caption_data", "TEXT")
-    ]
-    
-    for col_name, col_def in columns:
-        try:
-            print(f"   ➕ Adding column: {col_name}...")
-            c.execute(f"ALTER TABLE media_files ADD COLUMN {col_name} {col_def}")
-        except sqlite3.OperationalError as e:
-            if "duplicate column" in str(e):
-                print(f"      ⚠️ Column {col_name} already exists.")
-            else:
-                print(f"      ❌ Error adding {col_name}: {e}")
-
-    conn.commit()
-    conn.close()
-    print("✅ Migration Complete!")
 
 if __name__ == "__main__":
-    migrate()
+    main()
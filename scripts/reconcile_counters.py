@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Verifies the trigger-maintained pipeline_counters against real COUNT(*)s.
+
+Both sides are read in one REPEATABLE READ snapshot, so concurrent pipeline writes
+can't cause false mismatches. --fix rebuilds the counters under a lock that briefly
+blocks writers to media_files and faces.
+
+Usage:
+    uv run python scripts/reconcile_counters.py [--fix]
+"""
+import sys
+
+from rich.console import Console
+from rich.table import Table
+
+from photosynth.db import PhotoSynthDB
+
+console = Console()
+
+ACTUAL_QUERY = '''
+    SELECT 'files', '', COUNT(*) FROM media_files
+    UNION ALL SELECT 'status', COALESCE(status, ''), COUNT(*) FROM media_files GROUP BY 2
+    UNION ALL SELECT 'detection_status', COALESCE(detection_status, ''), COUNT(*) FROM media_files GROUP BY 2
+    UNION ALL SELECT 'caption_status', COALESCE(caption_status, ''), COUNT(*) FROM media_files GROUP BY 2
+    UNION ALL SELECT 'faces', '', COUNT(*) FROM faces
+'''
+
+
+def compare(db):
+    """[(metric, value, counter, actual)] for every key on either side."""
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+            c.execute("SELECT metric, value, SUM(count) FROM pipeline_counters GROUP BY metric, value")
+            counters = {(m, v): int(n) for m, v, n in c.fetchall()}
+            c.execute(ACTUAL_QUERY)
+            actual = {(m, v): int(n) for m, v, n in c.fetchall()}
+        conn.commit()
+    finally:
+        conn.close()
+    return [(m, v, counters.get((m, v), 0), actual.get((m, v), 0))
+            for m, v in sorted(set(counters) | set(actual))]
+
+
+def rebuild(db):
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as c:
+            c.execute("LOCK TABLE media_files, faces IN SHARE ROW EXCLUSIVE MODE")
+            c.execute("SELECT rebuild_pipeline_counters()")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main():
+    db = PhotoSynthDB()
+    rows = compare(db)
+
+    table = Table(title="Pipeline counters vs COUNT(*)")
+    table.add_column("Metric")
+    table.add_column("Value")
+    table.add_column("Counter", justify="right")
+    table.add_column("Actual", justify="right")
+    mismatches = 0
+    for metric, value, counter, actual in rows:
+        if counter == 0 and actual == 0: continue
+        ok = counter == actual
+        mismatches += not ok
+        style = "green" if ok else "red"
+        table.add_row(metric, value or "—", f"[{style}]{counter:,}[/{style}]", f"{actual:,}")
+    console.print(table)
+
+    if not mismatches:
+        console.print("[green]✅ Counters match.[/green]")
+        return
+    console.print(f"[red]❌ {mismatches} counters drifted.[/red]")
+    if "--fix" in sys.argv:
+        rebuild(db)
+        console.print("[green]🔧 Counters rebuilt from real counts.[/green]")
+    else:
+        console.print("   Run with --fix to rebuild them.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ def reset_db():
     db = PhotoSynthDB()
     conn = db.get_connection()
     
-    tables = ['faces', 'people', 'media_files']
+    tables = ['faces', 'people', 'media_files', 'pipeline_counters', 'cluster_version', 'schema_migrations']
     
     try:
         with conn.cursor() as c:
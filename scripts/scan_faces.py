@@ -1,16 +1,15 @@
 #!/usr/bin/env python3
 import os
 import sys
-import time
 from pathlib import Path
 from rich.console import Console
 from rich.table import Table
 from rich.live import Live
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from celery.result import AsyncResult
 from photosynth.db import PhotoSynthDB
+from photosynth.progress import ProgressSubscriber
 from photosynth.tasks import extract_faces_task
-from photosynth.utils.hashing import calculate_content_hash
+from photosynth.utils.hashing import hash_many
+from photosynth.utils.hash_cache import get_hash_cache
 
 ROOT_PATH = os.path.expanduser("~/personal/nas")
 SCAN_PATHS = [
@@ -19,46 +18,35 @@ SCAN_PATHS = [
 
 ]
 EXTENSIONS = ['.jpg', '.jpeg', '.png', '.arw', '.heic']
-HASH_WORKERS = 16
+HASH_WORKERS = os.cpu_count() or 4
+FLUSH_EVERY = 500  # Register + queue in batches while hashing continues
 
 console = Console()
 
 
-def generate_table(tasks):
-    # ... (generate_table function remains the same) ...
+def generate_table(tasks, files):
+    """Renders from the subscriber's in-memory state: no queries."""
     table = Table(title="Face Scanning Progress")
     table.add_column("File", style="cyan")
     table.add_column("Hash", style="blue")
     table.add_column("DB Faces", style="magenta")
-    table.add_column("Celery Status", style="yellow")
-
-    db = PhotoSynthDB()
+    table.add_column("Harvest", style="yellow")
 
     for t in tasks:
-        # Check if faces exist for this hash
-        conn = db.get_connection()
-        with conn.cursor() as c:
-            c.execute("SELECT COUNT(*) FROM faces WHERE file_hash=%s", (t['hash'],))
-            face_count = c.fetchone()[0]
-        conn.close()
-
+        state = files.get(t['hash'], {})
+        face_count = state.get('faces', 0)
         db_status = f"✅ {face_count} faces" if face_count > 0 else "⏳ Pending DB"
 
-        # Celery Status Check
-        celery_status = "N/A"
-        if t.get('task_id'):
-            result = AsyncResult(t['task_id'])
-            celery_status = str(result.status)
-            if result.status == 'SUCCESS':
-                celery_status = f"[green]{result.status}[/green]"
-            elif result.status == 'STARTED':
-                celery_status = f"[yellow]{result.status}[/yellow]"
-            elif result.status in ('PENDING', 'RECEIVED'):
-                celery_status = f"[cyan]{result.status}[/cyan]"
-            elif result.status in ('FAILURE', 'REVOKED'):
-                celery_status = f"[red]{result.status}[/red]"
-
-        table.add_row(t['name'], t['hash'][:16], db_status, celery_status)
+        # Published by extract_faces_task when it finishes
+        harvest = state.get('harvest')
+        if harvest == 'DONE':
+            harvest_status = f"[green]DONE ({state['faces_found']} found, {state['faces_new']} new)[/green]"
+        elif harvest == 'ERROR':
+            harvest_status = "[red]ERROR[/red]"
+        else:
+            harvest_status = "[cyan]QUEUED[/cyan]"
+
+        table.add_row(t['name'], t['hash'][:16], db_status, harvest_status)
 
     return table
 
@@ -66,6 +54,8 @@ def generate_table(tasks):
 def main():
     console.print("[bold blue]🚀 Starting Distributed Face Harvest...[/bold blue]")
     db = PhotoSynthDB()
+    # Listen before queuing so no harvest result is missed
+    progress = ProgressSubscriber()
 
     # 1. Load Cache
     console.print("   Loading DB index...")
@@ -112,77 +102,80 @@ def main():
     tasks_for_monitor = []
     files_to_register = []
     files_to_queue = []
+    queued_total = 0
 
     path_skipped = 0
     hash_skipped = 0
+    hash_failed = 0
+
+    def flush():
+        # --- BATCH DATABASE REGISTRATION ---
+        if files_to_register:
+            db.batch_register_files(files_to_register)
+            files_to_register.clear()
+
+        # --- TASK QUEUEING AND MONITOR SETUP ---
+        for f_hash, path_str in files_to_queue:
+            # Queue task with specific routing for the 5090 (face_queue)
+            extract_faces_task.apply_async(args=[path_str, f_hash], queue='face_queue')
+
+            # Prepare task entry for the monitoring table
+            tasks_for_monitor.append({
+                "name": Path(path_str).name,
+                "path": path_str,
+                "hash": f_hash,
+            })
+        progress.track([f_hash for f_hash, _ in files_to_queue])
+        queued = len(files_to_queue)
+        files_to_queue.clear()
+        return queued
+
+    # --- PROCESS-POOL HASHING (streams cache hits first, then computed hashes) ---
+    # Unchanged files (same path/size/mtime/inode) never get decoded again
+    cache = get_hash_cache()
+    for path_str, f_hash, error in hash_many(files, workers=HASH_WORKERS):
+        if error:
+            console.print(f"[red]⚠️ Hashing failed for {path_str}: {error}[/red]")
+            hash_failed += 1
+            continue
 
-    # --- PARALLEL HASHING AND FILTERING (Remains the same) ---
-    with ThreadPoolExecutor(max_workers=HASH_WORKERS) as executor:
-        # Submit all hash calculations to the thread pool
-        future_to_path = {
-            executor.submit(calculate_content_hash, str(p)): str(p)
-            for p in files
-        }
-
-        for future in as_completed(future_to_path):
-            path_str = future_to_path[future]
-
-            try:
-                f_hash = future.result()
-            except Exception as exc:
-                console.print(f"[red]⚠️ Hashing failed for {path_str}: {exc}[/red]")
-                f_hash = None
-
-            if not f_hash: continue
-
-            # Path check
-            if path_str in known_paths:
-                path_skipped += 1
-                continue
-
-            # Hash check: if hash is known, register the file (to update path) but skip the task
-            if f_hash in known_hashes:
-                files_to_register.append((f_hash, path_str))
-                hash_skipped += 1
-                continue
-
-            # New file/hash: Register and Queue
+        # Path check
+        if path_str in known_paths:
+            path_skipped += 1
+        # Hash check: if hash is known, register the file (to update path) but skip the task
+        elif f_hash in known_hashes:
+            files_to_register.append((f_hash, path_str))
+            hash_skipped += 1
+        # New file/hash: Register and Queue
+        else:
             files_to_register.append((f_hash, path_str))
             files_to_queue.append((f_hash, path_str))
 
-    # --- BATCH DATABASE REGISTRATION ---
-    if files_to_register:
-        console.print(f"💾 Batch registering/updating {len(files_to_register)} file paths...")
-        db.batch_register_files(files_to_register)
-
-    # --- TASK QUEUEING AND MONITOR SETUP ---
-    for f_hash, path_str in files_to_queue:
-        # Queue task with specific routing for the 5090 (face_queue)
-        task_result = extract_faces_task.apply_async(args=[path_str], queue='face_queue')
+        if len(files_to_register) >= FLUSH_EVERY:
+            queued_total += flush()
+            console.print(f"   💾 Registered batch, {queued_total} queued so far...")
 
-        # Prepare task entry for the monitoring table
-        tasks_for_monitor.append({
-            "name": Path(path_str).name,
-            "path": path_str,
-            "hash": f_hash,
-            "task_id": task_result.id
-        })
+    queued_total += flush()
 
-    console.print(f"[bold green]✅ Queued {len(files_to_queue)} files for processing[/bold green]")
-    console.print(f"⏩ Skipped (Path): {path_skipped}, Skipped (Hash): {hash_skipped}")
+    console.print(f"[bold green]✅ Queued {queued_total} files for processing[/bold green]")
+    console.print(f"⏩ Skipped (Path): {path_skipped}, Skipped (Hash): {hash_skipped}, Failed: {hash_failed}")
+    stats = cache.stats()
+    console.print(f"🗃️  Hash cache hit rate: {stats['hit_rate']:.1%} ({stats['hits']} hits / {stats['misses']} misses)")
 
     if not tasks_for_monitor:
         console.print("[yellow]No new files to process.[/yellow]")
+        progress.close()
         return
 
     # 3. Monitor Progress
     console.print("\n[bold blue]📊 Monitoring progress (Ctrl+C to exit)...[/bold blue]\n")
 
-    with Live(generate_table(tasks_for_monitor), refresh_per_second=2) as live:
+    # Redraws on pushed events only (face inserts, harvest results)
+    with progress, Live(generate_table(tasks_for_monitor, progress.files), refresh_per_second=2) as live:
         try:
             while True:
-                live.update(generate_table(tasks_for_monitor))
-                time.sleep(2)
+                if progress.wait(timeout=2.0):
+                    live.update(generate_table(tasks_for_monitor, progress.files))
         except KeyboardInterrupt:
             console.print("\n[yellow]Monitoring stopped. Tasks continue in background.[/yellow]")
 
@@ -1,15 +1,16 @@
 #!/usr/bin/env python3
 import os
 import sys
-import time
-import threading
+import datetime
 from pathlib import Path
 from rich.console import Console
 from rich.table import Table
 from rich.live import Live
-from photosynth.tasks import run_detection_pass
+from photosynth.tasks import run_detection_batch, DETECT_BATCH_SIZE
 from photosynth.db import PhotoSynthDB
-from photosynth.utils.hashing import calculate_content_hash
+from photosynth.progress import ProgressSubscriber
+from photosynth.utils.hashing import hash_many
+from photosynth.utils.hash_cache import get_hash_cache
 
 # Config
 TEST_DIR = Path(os.path.expanduser("~/personal/nas/video/TEST"))
@@ -24,16 +25,10 @@ def should_skip(path):
     if '#recycle' in p: return True
     return False
 
-def get_file_status(file_hash):
-    """Queries DB for current status of a file."""
-    try:
-        db = PhotoSynthDB()
-        status = db.check_status(file_hash)
-        return status if status else "QUEUED"
-    except:
-        return "UNKNOWN"
+DONE_STATUSES = ("COMPLETED", "SKIPPED", "ERROR_METADATA")
 
-def generate_table(tasks):
+def generate_table(tasks, files):
+    """Renders from the subscriber's in-memory state: no queries."""
     table = Table(title="PhotoSynth Pipeline Status")
     table.add_column("File", style="cyan")
     table.add_column("Status", style="magenta")
@@ -41,26 +36,18 @@ def generate_table(tasks):
     table.add_column("Cap", style="yellow")
     table.add_column("Last Update", style="blue")
 
-    db = PhotoSynthDB()
-    
     for t in tasks:
-        data = db.get_file_data(t['hash'])
-        
-        status = "PENDING"
-        det_status = "-"
-        cap_status = "-"
+        data = files.get(t['hash'], {})
+
+        status = data.get('status') or "PENDING"
+        det_status = data.get('detection_status') or "-"
+        cap_status = data.get('caption_status') or "-"
         last_update = "-"
-        
-        if data:
-            status = data.get('status', 'UNKNOWN')
-            det_status = data.get('detection_status', '-')
-            cap_status = data.get('caption_status', '-')
-            
-            ts = data.get('last_updated')
-            if ts:
-                import datetime
-                dt = datetime.datetime.fromtimestamp(ts)
-                last_update = dt.strftime("%H:%M:%S")
+
+        ts = data.get('last_updated')
+        if ts:
+            dt = datetime.datetime.fromtimestamp(ts)
+            last_update = dt.strftime("%H:%M:%S")
 
         # Color coding
         s_style = "white"
@@ -94,53 +81,55 @@ def main():
         console.print("[yellow]⚠️  No files found.[/yellow]")
         sys.exit(0)
 
-    # 2. Phase 1: Fast Scan, Hash & Register
+    # 2. Hash (process pool), Register & Queue as results stream in
     tasks = []
-    console.print(f"[bold blue]🚀 Phase 1: Hashing & Registering {len(files)} files...[/bold blue]")
+    console.print(f"[bold blue]🚀 Hashing, Registering & Queuing {len(files)} files...[/bold blue]")
     
-    from photosynth.db import PhotoSynthDB
+    from photosynth.tasks import run_vlm_captioning
     db = PhotoSynthDB()
-    
-    for f in files:
-        f_path = str(f)
-        f_hash = calculate_content_hash(f_path)
-        if not f_hash: continue
+    cache = get_hash_cache()
+    # Listen before queuing so no transition is missed
+    progress = ProgressSubscriber()
+
+    detect_batch = []
+    for f_path, f_hash, error in hash_many(files):
+        if error:
+            console.print(f"[red]⚠️ Hashing failed for {f_path}: {error}[/red]")
+            continue
         
         # Register upfront to prevent race conditions
         db.register_file(f_hash, f_path)
+
+        # Detection goes in groups so the GPU worker batches YOLO / face recognition
+        detect_batch.append(f_path)
+        if len(detect_batch) == DETECT_BATCH_SIZE:
+            run_detection_batch.delay(detect_batch)
+            detect_batch = []
+        run_vlm_captioning.delay(f_path)
         
         tasks.append({
-            "name": f.name,
+            "name": Path(f_path).name,
             "path": f_path,
             "hash": f_hash
         })
 
-    # 3. Phase 2: Queue GPU Tasks
-    console.print(f"[bold blue]📸 Phase 2: Queuing Detection...[/bold blue]")
-    for task in tasks:
-        run_detection_pass.delay(task['path'])
-
-    console.print(f"[bold blue]🤖 Phase 3: Queuing Captioning...[/bold blue]")
-    from photosynth.tasks import run_vlm_captioning
-    for task in tasks:
-        run_vlm_captioning.delay(task['path'])
-
-    # 3. Live Monitor Loop
-    with Live(generate_table(tasks), refresh_per_second=4) as live:
-        while True:
-            # Check if all are done
-            all_done = True
-            for task in tasks:
-                status = get_file_status(task['hash'])
-                if status not in ["COMPLETED", "SKIPPED", "ERROR_METADATA"]:
-                    all_done = False
-            
-            # Update Table
-            live.update(generate_table(tasks))
-            
-            if all_done:
-                break
-            time.sleep(0.5)
+    if detect_batch:
+        run_detection_batch.delay(detect_batch)
+
+    tasks.sort(key=lambda t: t['path'])
+    stats = cache.stats()
+    console.print(f"🗃️  Hash cache hit rate: {stats['hit_rate']:.1%} ({stats['hits']}/{len(files)})")
+    console.print(f"[bold blue]📸 Queued detection + captioning for {len(tasks)} files.[/bold blue]")
+
+    # 3. Live Monitor Loop (redraws on pushed events only)
+    progress.track([t['hash'] for t in tasks])
+    with progress, Live(generate_table(tasks, progress.files), refresh_per_second=4) as live:
+        pending = {h for h, f in progress.files.items() if f.get('status') not in DONE_STATUSES}
+        while pending:
+            changed = progress.wait(timeout=1.0)
+            if changed:
+                pending -= {h for h in changed if progress.files[h].get('status') in DONE_STATUSES}
+                live.update(generate_table(tasks, progress.files))
 
     console.print("\n[bold green]✨ All tasks finished![/bold green]")
 